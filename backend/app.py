@@ -2,13 +2,24 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from backend.models import db, Stop, TransitSystem, Line
+from backend.models import db, TransitSystem
 from backend.scraping import scrape_stops_for_system
 from backend.car_placement import CAR_PLACEMENT, normalize_station_name
+from backend.stop_cache import stop_cache
+from backend import circuit_breaker
+from backend.ingest import bulk_upsert_stops
+from backend.payloads import FastJSONProvider
 import os
 import requests
 from bs4 import BeautifulSoup
 from backend.routes import register_routes
+from backend.stop_sync import register_stop_sync
+from backend.gtfs import register_gtfs_import
+from backend.snapshot import register_snapshot
+from backend.journey import register_journey
+from backend.static_files import register_static
+from backend.metrics import register_metrics
+from backend.profiling import register_profiling
 
 def create_app(testing=False):
     static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend', 'build')
@@ -18,59 +29,65 @@ def create_app(testing=False):
     if db_url and db_url.startswith('postgres://'):
         db_url = db_url.replace('postgres://', 'postgresql://', 1)
         
-    app = Flask(__name__, static_folder=static_folder, static_url_path='')
+    # Flask's own static route is disabled; register_static serves the build
+    app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url or 'sqlite:///transitnav.db' if not testing else 'sqlite:///:memory:'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Scraped stops are cached per system; stale entries are served while refreshing
+    app.config['STOP_CACHE_TTL'] = int(os.environ.get('STOP_CACHE_TTL', 300))
+    app.config['STOP_CACHE_STALE_TTL'] = int(os.environ.get('STOP_CACHE_STALE_TTL', 3600))
+    stop_cache.configure(ttl=app.config['STOP_CACHE_TTL'], stale_ttl=app.config['STOP_CACHE_STALE_TTL'])
+    # Consecutive scrape failures before an upstream is skipped, and seconds before it is probed again
+    app.config['UPSTREAM_FAILURE_THRESHOLD'] = int(os.environ.get('UPSTREAM_FAILURE_THRESHOLD', 3))
+    app.config['UPSTREAM_RESET_TIMEOUT'] = int(os.environ.get('UPSTREAM_RESET_TIMEOUT', 60))
+    circuit_breaker.configure(
+        failure_threshold=app.config['UPSTREAM_FAILURE_THRESHOLD'],
+        reset_timeout=app.config['UPSTREAM_RESET_TIMEOUT'],
+    )
     db.init_app(app)
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+
+    # Seconds between scrape-and-persist runs of `flask sync-stops --loop`
+    app.config['STOP_SYNC_INTERVAL'] = int(os.environ.get('STOP_SYNC_INTERVAL', 900))
+    # Memory-mapped network snapshot built by `flask build-snapshot`
+    app.config['SNAPSHOT_PATH'] = None if testing else os.environ.get('SNAPSHOT_PATH')
+
+    # Journey planning timetable built by `flask build-timetable`
+    app.config['TIMETABLE_PATH'] = None if testing else os.environ.get('TIMETABLE_PATH')
+
+    # Prometheus latency metrics at /metrics
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+    register_metrics(app)
+    # Opt-in request profiling: requests sending PROFILE_TOKEN in X-Profile-Token,
+    # plus a random PROFILE_SAMPLE_RATE fraction, write collapsed stacks to PROFILE_DIR,
+    # which keeps the newest PROFILE_MAX_FILES of them
+    app.config['PROFILE_TOKEN'] = None if testing else os.environ.get('PROFILE_TOKEN')
+    app.config['PROFILE_SAMPLE_RATE'] = 0.0 if testing else float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+    app.config['PROFILE_MAX_FILES'] = int(os.environ.get('PROFILE_MAX_FILES', 200))
+    register_profiling(app)
+
+    register_snapshot(app)
+    register_journey(app)
 
     register_routes(app)
+    register_stop_sync(app)
+    register_gtfs_import(app)
 
     def add_transit_system_with_scrape(name, region=None):
         """
         Add a new TransitSystem to the DB, scrape its lines and stops, and populate the DB.
+        All rows are written in one bulk transaction; see ingest.bulk_upsert_stops.
         """
-        # Create the system
-        system = TransitSystem(name=name, region=region)
-        db.session.add(system)
-        db.session.commit()
-        # Scrape stops for this system
         stops = scrape_stops_for_system(name)
-        # Optionally, infer lines from stops (if available)
-        lines_seen = set()
-        for stop in stops:
-            line_name = stop.get('line', 'Unknown')
-            if line_name not in lines_seen:
-                line = Line(name=line_name, system_id=system.id)
-                db.session.add(line)
-                lines_seen.add(line_name)
-        db.session.commit()
-        # Add stops
-        for stop in stops:
-            line_obj = Line.query.filter_by(name=stop.get('line', 'Unknown'), system_id=system.id).first()
-            db.session.add(Stop(
-                name=stop['name'],
-                line=stop.get('line', 'Unknown'),
-                system=system.name,
-                lat=stop.get('lat'),
-                lon=stop.get('lon')
-            ))
-        db.session.commit()
-        return system
+        bulk_upsert_stops(name, stops, region=region)
+        return TransitSystem.query.filter_by(name=name).one()
 
     app.add_transit_system_with_scrape = add_transit_system_with_scrape
 
-    # Serve React frontend for all non-API routes
-    from flask import send_from_directory
-    @app.route('/', defaults={'path': ''})
-    @app.route('/<path:path>')
-    def serve_react_app(path):
-        # Normalize the path to prevent directory traversal
-        full_path = os.path.normpath(os.path.join(app.static_folder, path))
-        # Ensure the path is within the static folder
-        if full_path.startswith(app.static_folder) and os.path.exists(full_path):
-            return send_from_directory(app.static_folder, path)
-        return send_from_directory(app.static_folder, 'index.html')
+    # Serve the React build for all non-API routes
+    register_static(app, static_folder)
 
     return app
 
@@ -0,0 +1,176 @@
+# ASGI entry point: serve the Flask app under an event loop (e.g. uvicorn)
+import asyncio
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+from sqlalchemy.exc import SQLAlchemyError
+from backend import models
+from backend.scraping import AsyncScraper, canonical_system_name, scraper_key
+from backend.stop_cache import stop_cache
+
+# Threads running Flask views; requests waiting on upstreams hold none
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+
+
+def wsgi_environ(scope, body):
+    """
+    Build a WSGI environ for an ASGI HTTP scope and its request body.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def run_wsgi(wsgi_app, environ):
+    """
+    Call a WSGI app and collect its whole response as (status, headers, body).
+
+    The request and response are both buffered in memory, with no
+    streaming and no backpressure. That suits this API's JSON bodies and the
+    static files it serves, none of which are larger than a few megabytes.
+    It does not suit streamed or unbounded responses, such as server-sent
+    events or large downloads. Those would have to go through a streaming
+    adapter like asgiref's WsgiToAsgi or a2wsgi, which this project does
+    not depend on.
+    """
+    response = []
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [int(status.split(' ', 1)[0]), headers]
+        return chunks.append
+
+    result = wsgi_app(environ, start_response)
+    try:
+        for chunk in result:
+            chunks.append(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    status, headers = response
+    return status, headers, b''.join(chunks)
+
+
+class TransitNavASGI:
+    """
+    ASGI application wrapping the Flask app.
+
+    Flask views run on a bounded thread pool. The one path that waits on
+    upstream sites, /api/stops for a system that has not been synced yet,
+    is awaited on the event loop instead: the scrape runs on an
+    httpx.AsyncClient and fills the stop cache before the view runs, so
+    hundreds of requests can wait on slow upstreams while the threads stay
+    free for everything else.
+    """
+
+    def __init__(self, flask_app, max_threads=ASGI_THREADS, scraper=None):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+        self.scraper = scraper or AsyncScraper(executor=self.executor)
+        self._warming = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.scraper.aclose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        if scope['method'] in ('GET', 'HEAD') and scope['path'] == '/api/stops':
+            await self._warm_stop_cache(scope)
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(
+            self.executor, run_wsgi, self.flask_app.wsgi_app, wsgi_environ(scope, bytes(body)),
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+        })
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def _warm_stop_cache(self, scope):
+        """
+        Scrape a system's stops on the event loop when the view would
+        otherwise block a thread on the upstream site.
+        """
+        system = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('system', [None])[0]
+        key = scraper_key(system)
+        if not key or stop_cache.peek(system) is not None:
+            return
+        # Concurrent requests for one system share the DB check and scrape
+        task = self._warming.get(key)
+        if task is None:
+            task = self._warming[key] = asyncio.ensure_future(self._warm(system))
+            task.add_done_callback(lambda _: self._warming.pop(key, None))
+        await asyncio.shield(task)
+
+    async def _warm(self, system):
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(self.executor, self._has_persisted_stops, system):
+            return
+        stops = await self.scraper.scrape(system)
+        if stop_cache.peek(system) is None:
+            stop_cache.put(system, stops)
+
+    def _has_persisted_stops(self, system):
+        with self.flask_app.app_context():
+            try:
+                return models.db.session.query(
+                    models.Stop.query.filter_by(system=canonical_system_name(system)).exists()
+                ).scalar()
+            except SQLAlchemyError:
+                models.db.session.rollback()
+                return False
+
+
+def create_asgi_app(flask_app=None, **kwargs):
+    if flask_app is None:
+        from backend.app import app as flask_app
+    return TransitNavASGI(flask_app, **kwargs)
+
+
+app = create_asgi_app()
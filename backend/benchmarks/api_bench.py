@@ -0,0 +1,282 @@
+"""
+Benchmark suite for the backend API hot paths.
+
+Times /api/stops, /api/stops/search, /api/best_car, normalize_station_name
+and add_transit_system_with_scrape against synthetic networks of each size,
+runs a concurrent load test against a local server, and writes a JSON
+report. Given a baseline report, exits non-zero when any benchmark got
+slower by more than the threshold.
+
+    python -m backend.benchmarks.api_bench [--sizes 100 1000 10000 100000]
+        [--output report.json] [--baseline baseline.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from werkzeug.serving import WSGIRequestHandler, make_server
+from backend import car_placement
+from backend.app import create_app
+from backend.benchmarks.network import SIZES, fixture_upstreams, seed_network
+from backend.models import db
+
+FORMAT = 1
+# Minimum wall time of one timing round; fast calls are batched up to it
+MIN_ROUND_S = 0.01
+# Relative slowdown reported as a regression
+THRESHOLD = 0.2
+
+# Spellings users send for stations: exact, mixed case and decorated
+STATION_SPELLINGS = [
+    spelling
+    for name in car_placement.CAR_PLACEMENT
+    for spelling in (name, name.upper(), f"  {name.title()} Station ", f"{name}-stn")
+]
+
+# Curated-table and platform-geometry lookups
+BEST_CAR_PATHS = (
+    '/api/best_car?origin=Union%20Station&destination=front%20street',
+    '/api/best_car?origin=king&destination=king%20street%20east&direction=southbound&cars=4',
+)
+
+
+def measure(func, rounds=7):
+    """
+    Time `func` over `rounds` rounds of at least MIN_ROUND_S each and return
+    per-call statistics in seconds.
+    """
+    func()
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= MIN_ROUND_S:
+            break
+        number = max(number * 2, int(number * MIN_ROUND_S / max(elapsed, 1e-9)))
+    times = [t / number for t in timeit.repeat(func, number=number, repeat=rounds)]
+    return {
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'mean_s': statistics.fmean(times),
+        'stdev_s': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'rounds': rounds,
+        'calls_per_round': number,
+    }
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def load_test(app, paths, requests=500, concurrency=8):
+    """
+    Serve `app` on a threaded local server and send `requests` GETs cycling
+    through `paths` from `concurrency` client threads. Returns throughput
+    and latency percentiles.
+    """
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    try:
+        with httpx.Client(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=concurrency)) as client:
+            def one(i):
+                nonlocal errors
+                start = time.perf_counter()
+                status = client.get(paths[i % len(paths)]).status_code
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if status >= 400:
+                        errors += 1
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one, range(requests)))
+            wall = time.perf_counter() - started
+    finally:
+        server.shutdown()
+        thread.join()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'rps': requests / wall,
+        'p50_s': _percentile(latencies, 0.50),
+        'p95_s': _percentile(latencies, 0.95),
+        'p99_s': _percentile(latencies, 0.99),
+    }
+
+
+def create_bench_app(db_path):
+    """
+    A production-configured app on its own SQLite file, so the threaded load
+    test server gets one connection per thread.
+    """
+    previous = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    try:
+        app = create_app()
+    finally:
+        if previous is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = previous
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def bench_network(size, rounds=7, load_requests=500, concurrency=8):
+    """
+    Benchmarks that scale with the network: seed `size` stops and time the
+    stop endpoints. Returns {benchmark name: result}.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            stops = seed_network(size)
+        # A name from the middle of the network, so lookups cannot stop early
+        query = stops[size // 2]['name'].rsplit(' ', 1)[0]
+        client = app.test_client()
+        paths = {
+            'stops_system': '/api/stops?system=ttc',
+            'stops_name_filter': f"/api/stops?system=ttc&name={query.split()[1]}",
+            'stops_search': f"/api/stops/search?q={query}",
+        }
+        for name, path in paths.items():
+            assert client.get(path).status_code == 200, path
+            results[f"{name}[{size}]"] = measure(lambda path=path: client.get(path), rounds)
+        # The load mix is the cacheable read traffic; full-scan name filters
+        # are timed above
+        mix = [paths['stops_system'], paths['stops_search'], BEST_CAR_PATHS[0]]
+        results[f"load[{size}]"] = load_test(app, mix, load_requests, concurrency)
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    return results
+
+
+def bench_fixed(rounds=7):
+    """
+    Benchmarks that do not depend on the network size.
+    """
+    results = {}
+    results['normalize_station_name'] = measure(
+        lambda: [car_placement.normalize_station_name(s) for s in STATION_SPELLINGS], rounds,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_bench_app(os.path.join(tmp, 'bench.db'))
+        client = app.test_client()
+        curated, geometry = BEST_CAR_PATHS
+        assert client.get(curated).status_code == 200
+        assert client.get(geometry).status_code == 200
+        results['best_car'] = measure(lambda: client.get(curated), rounds)
+        results['best_car_geometry'] = measure(lambda: client.get(geometry), rounds)
+        # Re-scraping a system from the fixture pages and upserting unchanged rows,
+        # as every sync after the first does
+        with fixture_upstreams(), app.app_context():
+            results['add_transit_system_with_scrape'] = measure(
+                lambda: app.add_transit_system_with_scrape("TTC", region="Toronto"), rounds,
+            )
+            db.session.remove()
+            db.engine.dispose()
+    return results
+
+
+def run(sizes=SIZES, rounds=7, load_requests=500, concurrency=8):
+    """
+    Run the whole suite and return the report dict.
+    """
+    benchmarks = bench_fixed(rounds)
+    for size in sizes:
+        benchmarks.update(bench_network(size, rounds, load_requests, concurrency))
+    return {
+        'format': FORMAT,
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'sizes': list(sizes),
+        },
+        'benchmarks': benchmarks,
+    }
+
+
+def _primary(result):
+    # Timings compare medians; load tests compare tail latency
+    return result.get('median_s', result.get('p95_s'))
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    """
+    Benchmarks in both reports whose primary time grew by more than
+    `threshold` (0.2 = 20%), as [{'name', 'baseline_s', 'current_s', 'change'}].
+    """
+    regressions = []
+    for name, result in report['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if before is None:
+            continue
+        old, new = _primary(before), _primary(result)
+        if old and new is not None and new > old * (1 + threshold):
+            regressions.append({'name': name, 'baseline_s': old, 'current_s': new, 'change': new / old - 1})
+    return regressions
+
+
+def _format_result(name, result):
+    if 'rps' in result:
+        return (f"{name:<36} {result['rps']:>9.0f} req/s  p50 {result['p50_s'] * 1000:>8.2f} ms"
+                f"  p99 {result['p99_s'] * 1000:>8.2f} ms  errors {result['errors']}")
+    return f"{name:<36} {result['median_s'] * 1e6:>12.1f} us  (min {result['min_s'] * 1e6:.1f} us)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per load test.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output', default='benchmark-report.json')
+    parser.add_argument('--baseline', default=None, help='Report to compare against.')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.rounds, args.requests, args.concurrency)
+    for name, result in report['benchmarks'].items():
+        print(_format_result(name, result))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: {r['baseline_s'] * 1e6:.1f} us -> {r['current_s'] * 1e6:.1f} us "
+                  f"(+{r['change']:.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
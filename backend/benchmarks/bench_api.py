@@ -0,0 +1,65 @@
+"""
+pytest-benchmark versions of the API hot path benchmarks.
+
+Collected only when named explicitly, so the regular test run stays fast:
+
+    PYTHONPATH=. pytest backend/benchmarks/bench_api.py --benchmark-autosave
+    PYTHONPATH=. pytest backend/benchmarks/bench_api.py --benchmark-compare --benchmark-compare-fail=median:20%
+
+BENCH_SIZES (comma separated) overrides the network sizes.
+"""
+import os
+import pytest
+from backend import car_placement
+from backend.benchmarks.api_bench import BEST_CAR_PATHS, STATION_SPELLINGS, create_bench_app
+from backend.benchmarks.network import SIZES, fixture_upstreams, seed_network
+from backend.models import db
+
+pytest.importorskip('pytest_benchmark')
+
+BENCH_SIZES = [int(s) for s in os.environ.get('BENCH_SIZES', ','.join(map(str, SIZES))).split(',')]
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    return create_bench_app(tmp_path_factory.mktemp('bench') / 'bench.db')
+
+
+@pytest.fixture(scope='module', params=BENCH_SIZES, ids=lambda size: f"{size}stops")
+def network(request, tmp_path_factory):
+    app = create_bench_app(tmp_path_factory.mktemp('network') / 'bench.db')
+    with app.app_context():
+        stops = seed_network(request.param)
+    yield app.test_client(), stops[request.param // 2]['name'].rsplit(' ', 1)[0]
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_normalize_station_name(benchmark):
+    benchmark(lambda: [car_placement.normalize_station_name(s) for s in STATION_SPELLINGS])
+
+
+@pytest.mark.parametrize('path', BEST_CAR_PATHS, ids=['curated', 'geometry'])
+def test_best_car(benchmark, app, path):
+    client = app.test_client()
+    assert benchmark(client.get, path).status_code == 200
+
+
+def test_add_transit_system_with_scrape(benchmark, app):
+    with fixture_upstreams(), app.app_context():
+        benchmark(app.add_transit_system_with_scrape, "TTC", region="Toronto")
+
+
+def test_stops_system(benchmark, network):
+    client, _ = network
+    assert benchmark(client.get, '/api/stops?system=ttc').status_code == 200
+
+
+def test_stops_name_filter(benchmark, network):
+    client, query = network
+    assert benchmark(client.get, f"/api/stops?system=ttc&name={query.split()[1]}").status_code == 200
+
+
+def test_stops_search(benchmark, network):
+    client, query = network
+    assert benchmark(client.get, f"/api/stops/search?q={query}").status_code == 200
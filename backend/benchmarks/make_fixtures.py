@@ -0,0 +1,97 @@
+"""
+Generate the synthetic station pages in benchmarks/fixtures.
+
+The pages are not copies of the live sites. Each one uses the markup its
+scraper reads (TTC station cards, GO station headings, MTA line stops and
+BART station links) and wraps it in the weight typical of a real page: an
+inline script, a long navigation menu and a footer of legal text, which
+the strained parser skips and the full tree has to build. Names come from
+a seeded generator, so rerunning the script rewrites identical files.
+
+    python -m backend.benchmarks.make_fixtures
+"""
+import os
+import random
+from backend.benchmarks.network import FIXTURES_DIR
+
+# Stations per page, roughly the size of each system
+STATION_COUNTS = {'ttc': 75, 'go': 70, 'mta': 470, 'bart': 50}
+_WORDS = ('Bathurst', 'Bay', 'Bloor', 'Broadview', 'Chester', 'Christie', 'Clair', 'College', 'Coxwell',
+          'Davisville', 'Donlands', 'Dufferin', 'Dundas', 'Eglinton', 'Finch', 'Greenwood', 'Islington',
+          'Jane', 'Keele', 'King', 'Kipling', 'Lawrence', 'Main', 'Mills', 'Ossington', 'Pape', 'Queen',
+          'Royal', 'Runnymede', 'Sheppard', 'Spadina', 'St', 'Victoria', 'Warden', 'Wellesley', 'Woodbine',
+          'York')
+
+
+def _stations(key):
+    rng = random.Random(key)
+    return [f"{rng.choice(_WORDS)} {rng.choice(_WORDS)} {i}" for i in range(STATION_COUNTS[key])]
+
+
+def _ttc(names):
+    return ''.join(
+        f'<div class="station-card"><a class="station-link" href="/s/{i}">{name}</a>'
+        f'<span class="accessible">Accessible</span><ul><li>Line 1</li><li>Line 2</li></ul></div>'
+        for i, name in enumerate(names)
+    )
+
+
+def _go(names):
+    cards = ''.join(
+        f'<section class="card"><h3>{name} GO Station</h3><p>Parking <b>{i * 10}</b> spaces</p>'
+        f'<h4>Amenities</h4></section>'
+        for i, name in enumerate(names)
+    )
+    # Headings that are not stations, which the parser must skip
+    return cards + ''.join(f'<h3>Service update {i}</h3>' for i in range(20))
+
+
+def _mta(names):
+    return ''.join(
+        f'<div class="line-stop"><span class="bullet">{i % 7}</span><span>{name} Station</span>'
+        f'<span class="transfer">Transfer</span></div>'
+        for i, name in enumerate(names)
+    )
+
+
+def _bart(names):
+    return ''.join(
+        f'<li><a class="station" href="/stations/{i}">{name}</a> <a class="map" href="/m/{i}">map</a></li>'
+        for i, name in enumerate(names)
+    )
+
+
+BODIES = {'ttc': _ttc, 'go': _go, 'mta': _mta, 'bart': _bart}
+
+
+def render(key):
+    """
+    The synthetic station page for the system `key`.
+    """
+    nav = ''.join(
+        f'<li class="nav-item"><a href="/page/{i}" class="nav-link">Menu item {i}</a><span class="badge">{i}</span></li>'
+        for i in range(300)
+    )
+    footer = ''.join(
+        f'<p class="legal">Paragraph {i} <em>with</em> <strong>markup</strong> and <a href="/l/{i}">links</a>.</p>'
+        for i in range(300)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Stations</title>'
+        f'<script>{"var x=1;" * 400}</script><link rel="stylesheet" href="/a.css"></head>'
+        f'<body><header><nav><ul>{nav}</ul></nav></header>'
+        f'<main>{BODIES[key](_stations(key))}</main><footer>{footer}</footer></body></html>'
+    )
+
+
+def main():
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for key in BODIES:
+        path = os.path.join(FIXTURES_DIR, f'{key}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(render(key))
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
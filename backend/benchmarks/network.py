@@ -0,0 +1,74 @@
+"""
+Synthetic transit networks and offline scraper fixtures for the benchmarks.
+
+Networks are generated from a seed, so the same size always yields the
+same stops and benchmark runs on different machines measure the same work.
+"""
+import os
+import random
+from contextlib import contextmanager
+import httpx
+from backend import scraping
+from backend.ingest import bulk_upsert_stops
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Network sizes (stop counts) benchmarked by default
+SIZES = (100, 1000, 10000, 100000)
+
+_PREFIXES = ('North', 'South', 'East', 'West', 'Upper', 'Lower', 'Old', 'New', 'Port', 'Mount')
+_ROOTS = ('Bay', 'King', 'Queen', 'Dundas', 'College', 'Spadina', 'Bathurst', 'Yonge', 'Bloor', 'Union',
+          'Front', 'Wellesley', 'Sherbourne', 'Broadview', 'Pape', 'Danforth', 'Kipling', 'Islington')
+_SUFFIXES = ('Station', 'Street', 'Park', 'Square', 'Junction', 'Centre', 'Gardens', 'Heights')
+STOPS_PER_LINE = 40
+
+
+def synthetic_stops(count, system='TTC', seed=0):
+    """
+    `count` stops for `system` with unique, realistic-looking names spread
+    over lines of STOPS_PER_LINE stops around Toronto.
+    """
+    rng = random.Random(f"{system}:{seed}")
+    stops = []
+    for i in range(count):
+        name = f"{rng.choice(_PREFIXES)} {rng.choice(_ROOTS)} {rng.choice(_SUFFIXES)} {i}"
+        stops.append({
+            'name': name,
+            'line': f"Line {i // STOPS_PER_LINE + 1}",
+            'system': system,
+            'lat': round(43.6 + rng.uniform(-0.3, 0.3), 6),
+            'lon': round(-79.4 + rng.uniform(-0.4, 0.4), 6),
+        })
+    return stops
+
+
+def seed_network(count, system='TTC', seed=0):
+    """
+    Write a synthetic network into the current app's database. Must be
+    called inside an application context. Returns the stops written.
+    """
+    stops = synthetic_stops(count, system, seed)
+    bulk_upsert_stops(system, stops)
+    return stops
+
+
+def load_fixture(key):
+    with open(os.path.join(FIXTURES_DIR, f'{key}.html'), encoding='utf-8') as f:
+        return f.read()
+
+
+@contextmanager
+def fixture_upstreams():
+    """
+    Serve the synthetic station pages in place of the live sites for the
+    duration of the block, so scrape-and-ingest timings need no network.
+    """
+    pages = {info['url']: load_fixture(key) for key, info in scraping.SCRAPERS.items()}
+    client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, text=pages[str(request.url)])))
+    original = scraping._client, scraping._validators
+    scraping._client, scraping._validators = client, {}
+    try:
+        yield
+    finally:
+        scraping._client, scraping._validators = original
+        client.close()
@@ -0,0 +1,50 @@
+"""
+Micro-benchmark for the scraper HTML parsing path.
+
+Parses the synthetic station pages in benchmarks/fixtures with the
+original full html.parser tree and with the configured parser backend plus
+the per-system strainer, and reports the speedup for each system. The
+pages are written by make_fixtures.py and are not copies of the live
+sites, so the speedups show the parser cost on page-sized markup, not on
+the real pages.
+
+    python -m backend.benchmarks.parse_bench [--repeat 20]
+"""
+import argparse
+import timeit
+from backend import scraping
+from backend.benchmarks.network import load_fixture
+
+def bench_system(key, repeat):
+    html = load_fixture(key)
+    def baseline():
+        return scraping.parse_stops(key, html, parser='html.parser', strained=False)
+    def optimized():
+        return scraping.parse_stops(key, html)
+    # Both paths must agree before their timings mean anything
+    assert baseline() == optimized(), f'{key}: parser backends disagree'
+    base = min(timeit.repeat(baseline, number=1, repeat=repeat))
+    fast = min(timeit.repeat(optimized, number=1, repeat=repeat))
+    return {
+        'system': key,
+        'stops': len(optimized()),
+        'bytes': len(html),
+        'baseline_ms': base * 1000,
+        'optimized_ms': fast * 1000,
+        'speedup': base / fast,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+    print(f'parser backend: {scraping.HTML_PARSER}')
+    print(f"{'system':<6} {'stops':>5} {'KiB':>6} {'full ms':>9} {'fast ms':>9} {'speedup':>8}")
+    results = [bench_system(key, args.repeat) for key in scraping.SCRAPERS]
+    for r in results:
+        print(f"{r['system']:<6} {r['stops']:>5} {r['bytes'] / 1024:>6.0f} "
+              f"{r['baseline_ms']:>9.2f} {r['optimized_ms']:>9.2f} {r['speedup']:>7.1f}x")
+    return results
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 # Car placement data and normalization logic
+import hashlib
+import json
+import sys
 
 CAR_PLACEMENT = {
     "union station": {
@@ -43,19 +46,90 @@ CAR_PLACEMENT = {
     }
 }
 
+# Alternate spellings for each station, keyed by its CAR_PLACEMENT or
+# PLATFORM_GEOMETRY name. Variants are matched after normalization, so case,
+# periods, hyphens and underscores do not need their own entries.
+STATION_ALIASES = {
+    "st george": ["st george station"],
+    "union station": ["union"],
+    "underconstruction": ["under construction"],
+    "bloor-yonge": ["bloor yonge station"],
+    "king": ["king station"],
+}
+
+# Alternate spellings for exits, keyed by station then canonical exit name
+EXIT_ALIASES = {
+    "union station": {
+        "front street": ["front st"],
+    },
+}
+
+def _clean(name):
+    return name.lower().replace('.', '').replace('-', ' ').replace('_', ' ').strip()
+
+def build_station_lookup(placements, aliases):
+    """
+    Map every known spelling of a station, both as typed (lowercased) and
+    cleaned, to its canonical CAR_PLACEMENT key.
+    """
+    lookup = {}
+    for canonical in set(placements) | set(aliases):
+        canonical = sys.intern(canonical)
+        for variant in (canonical, *aliases.get(canonical, ())):
+            lookup[variant.lower().strip()] = canonical
+            lookup[_clean(variant)] = canonical
+    return lookup
+
+def build_placement_lookup(placements, exit_aliases, station_lookup):
+    """
+    Map (canonical station, normalized exit spelling) to (canonical exit, info).
+    Exit names are normalized like station names, since callers pass both
+    through normalize_station_name.
+    """
+    lookup = {}
+    for station, exits in placements.items():
+        station = sys.intern(station)
+        for exit_name, info in exits.items():
+            exit_name = sys.intern(exit_name)
+            variants = (exit_name, *exit_aliases.get(station, {}).get(exit_name, ()))
+            for variant in variants:
+                cleaned = _clean(variant)
+                key = station_lookup.get(variant.lower().strip(), station_lookup.get(cleaned, cleaned))
+                lookup[(station, key)] = (exit_name, info)
+    return lookup
+
+STATION_LOOKUP = {}
+PLACEMENT_LOOKUP = {}
+# Content hash of the placement and alias tables, used for HTTP validators
+PLACEMENT_VERSION = None
+
+def rebuild_lookups():
+    """
+    Recompile the lookup tables from CAR_PLACEMENT and the alias tables.
+    Runs at import; call again after changing any of them.
+    """
+    global STATION_LOOKUP, PLACEMENT_LOOKUP, PLACEMENT_VERSION
+    station_lookup = build_station_lookup(CAR_PLACEMENT, STATION_ALIASES)
+    PLACEMENT_LOOKUP = build_placement_lookup(CAR_PLACEMENT, EXIT_ALIASES, station_lookup)
+    STATION_LOOKUP = station_lookup
+    blob = json.dumps([CAR_PLACEMENT, STATION_ALIASES, EXIT_ALIASES], sort_keys=True, default=str)
+    PLACEMENT_VERSION = hashlib.sha1(blob.encode()).hexdigest()[:12]
+
 def normalize_station_name(name):
     if not name:
         return None
-    name = name.lower().replace('.', '').replace('-', ' ').replace('_', ' ').strip()
-    # Simple typo/variant handling
-    if name in ("st george", "st george station", "st. george", "st. george station"):
-        return "st george"
-    if name in ("union", "union station"):
-        return "union station"
-    if name in ("multioption", ):
-        return "multioption"
-    if name in ("underconstruction", "under construction"):
-        return "underconstruction"
-    if name in ("bloor-yonge", "bloor yonge", "bloor yonge station"):
-        return "bloor-yonge"
-    return name
+    # Exact spellings hit the table without any string rewriting
+    canonical = STATION_LOOKUP.get(name.lower().strip())
+    if canonical is not None:
+        return canonical
+    cleaned = _clean(name)
+    return STATION_LOOKUP.get(cleaned, cleaned)
+
+def lookup_placement(station, exit_name):
+    """
+    Resolve a normalized (station, exit) pair to (canonical exit, info), or
+    None when the station has no such exit.
+    """
+    return PLACEMENT_LOOKUP.get((station, exit_name))
+
+rebuild_lookups()
@@ -0,0 +1,144 @@
+# Per-upstream circuit breakers for the stop scrapers
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Consecutive failures that open a breaker
+FAILURE_THRESHOLD = 3
+# Seconds an open breaker waits before letting one probe through; doubled
+# after every failed probe up to MAX_RESET_TIMEOUT
+RESET_TIMEOUT = 60
+MAX_RESET_TIMEOUT = 900
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of one upstream site.
+
+    Closed, every call goes through. After `failure_threshold` consecutive
+    failures the breaker opens and callers skip the upstream entirely, so a
+    dead site costs nothing instead of a full timeout per request. Once the
+    reset timeout passes, the breaker turns half-open and lets a single probe
+    through: success closes it, failure opens it again for twice as long.
+    A probe that never reports back (its caller was cancelled) is given up
+    on after the same wait, and the next caller becomes the probe.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT, clock=time.monotonic, wall_clock=time.time):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.last_success = None
+        self.last_failure = None
+        self.last_error = None
+        self._opened_at = None
+        self._probe_at = None
+        self._wait = reset_timeout
+
+    def allow(self):
+        """
+        Whether the caller may contact the upstream now. A True from a
+        half-open breaker is the probe; the caller must report its outcome.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            # Open: the reset timeout passed. Half-open: the last probe
+            # never reported back within the same wait.
+            since = self._opened_at if self.state == OPEN else self._probe_at
+            if now - since >= self._wait:
+                self.state = HALF_OPEN
+                self._probe_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.last_success = self.wall_clock()
+            self._wait = self.reset_timeout
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_failure = self.wall_clock()
+            self.last_error = str(error) if error is not None else None
+            if self.state == HALF_OPEN:
+                self._wait = min(self._wait * 2, self.max_reset_timeout)
+                self._open()
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        # Caller holds self._lock.
+        self.state = OPEN
+        self._opened_at = self.clock()
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, round(self._opened_at + self._wait - self.clock(), 1))
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "last_success": self.last_success,
+                "last_failure": self.last_failure,
+                "last_error": self.last_error,
+                "retry_in": retry_in,
+            }
+
+
+# --- Process-wide breakers, one per upstream ---
+
+_lock = threading.Lock()
+_breakers = {}
+_settings = {"failure_threshold": FAILURE_THRESHOLD, "reset_timeout": RESET_TIMEOUT}
+
+
+def configure(failure_threshold=None, reset_timeout=None):
+    """
+    Change the settings of every breaker, existing and future.
+    """
+    with _lock:
+        if failure_threshold is not None:
+            _settings["failure_threshold"] = failure_threshold
+        if reset_timeout is not None:
+            _settings["reset_timeout"] = reset_timeout
+        for breaker in _breakers.values():
+            breaker.failure_threshold = _settings["failure_threshold"]
+            breaker.reset_timeout = _settings["reset_timeout"]
+
+
+def get_breaker(name):
+    with _lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **_settings)
+        return breaker
+
+
+def breaker_stats():
+    with _lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+def reset():
+    with _lock:
+        _breakers.clear()
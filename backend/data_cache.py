@@ -0,0 +1,46 @@
+# Process-wide values derived from a versioned data set
+import threading
+from backend import models
+
+
+class VersionedCache:
+    """
+    One process-wide value built from the database and kept until the
+    DataVersion it was built from changes.
+
+    The version is read on every get(), so writes made by another process
+    (e.g. `flask sync-stops`) are picked up on the next request and an
+    unchanged data set is never rebuilt. The lock is held while building,
+    so concurrent callers wait for one rebuild instead of each starting
+    their own. `build(version, *args)` returns the new value; `signal`, when
+    given, drops the value as soon as this process writes the data.
+    """
+
+    def __init__(self, name, build, signal=None):
+        self.name = name
+        self.build = build
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        if signal is not None:
+            signal.connect(self._on_changed, weak=False)
+
+    def _on_changed(self, sender, **kw):
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+    def get(self, *args):
+        """
+        The current value, rebuilt first if the data version moved on. Must
+        be called inside an application context.
+        """
+        version = models.get_data_version(self.name)
+        with self._lock:
+            # An unreadable version keeps whatever was built last
+            if self._value is None or (version is not None and version != self._version):
+                self._value = self.build(version, *args)
+                self._version = version
+            return self._value
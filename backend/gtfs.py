@@ -0,0 +1,310 @@
+import csv
+import hashlib
+import io
+import posixpath
+import zipfile
+import click
+from sqlalchemy import delete
+from backend.ingest import IngestReport, INSERTED, UPDATED, UNCHANGED, LOOKUP_CHUNK, bulk_upsert_stops
+from backend.models import db, Stop, Line, TransitSystem, GtfsManifest, bump_data_version
+from backend.signals import stops_changed
+
+# Stops written per bulk_upsert_stops call; bounds statement size and memory
+IMPORT_CHUNK = 5000
+REQUIRED_FILES = ('stops.txt', 'routes.txt', 'trips.txt', 'stop_times.txt')
+HASH_BLOCK = 1 << 20
+DELETED = "deleted"
+
+
+class GtfsError(ValueError):
+    pass
+
+
+class GtfsReport(IngestReport):
+    """
+    IngestReport plus feed details: stop_times rows streamed, whether the
+    import was skipped because no file changed, and deleted rows.
+    """
+
+    def __init__(self, system):
+        super().__init__(system)
+        self.stop_times = 0
+        self.skipped = False
+
+    def counts(self):
+        counts = {INSERTED: 0, UPDATED: 0, UNCHANGED: 0, DELETED: 0}
+        for _, _, status in self.rows:
+            counts[status] += 1
+        return counts
+
+
+def _member(feed, filename):
+    # Some feeds nest their files in a top-level folder inside the zip
+    for name in feed.namelist():
+        if posixpath.basename(name) == filename:
+            return name
+    raise GtfsError(f"GTFS feed is missing {filename}")
+
+
+def iter_rows(feed, filename, columns):
+    """
+    Stream rows of one CSV file inside an open GTFS zip without extracting
+    it, yielding tuples of the requested columns (None where a column is
+    absent from the file).
+    """
+    with feed.open(_member(feed, filename)) as raw:
+        # utf-8-sig drops the BOM many agencies publish with
+        reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+        header = [h.strip() for h in next(reader, [])]
+        positions = [header.index(c) if c in header else None for c in columns]
+        width = len(header)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row = row + [''] * (width - len(row))
+            yield tuple(row[p].strip() if p is not None else None for p in positions)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_routes(feed):
+    """
+    route_id -> line name, preferring the short name ("1") over the long one.
+    """
+    routes = {}
+    for route_id, short_name, long_name in iter_rows(feed, 'routes.txt', ('route_id', 'route_short_name', 'route_long_name')):
+        routes[route_id] = short_name or long_name or route_id
+    return routes
+
+
+def read_trips(feed, route_index):
+    """
+    trip_id -> index into the route list. Ints instead of route_id strings
+    keep this map small on feeds with hundreds of thousands of trips.
+    """
+    trips = {}
+    for trip_id, route_id in iter_rows(feed, 'trips.txt', ('trip_id', 'route_id')):
+        idx = route_index.get(route_id)
+        if idx is not None:
+            trips[trip_id] = idx
+    return trips
+
+
+def read_stations(feed):
+    """
+    Return (stations, stop_to_station): one (name, lat, lon) per station and
+    a map from every stop_id to its station's index. Platforms and boarding
+    areas are folded into their parent station, so a stop served on several
+    platforms is one Stop row per line.
+    """
+    raw = {}
+    for stop_id, name, lat, lon, parent in iter_rows(feed, 'stops.txt', ('stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'parent_station')):
+        raw[stop_id] = (name, _float(lat), _float(lon), parent or None)
+
+    def root(stop_id):
+        seen = set()
+        while raw[stop_id][3] in raw and stop_id not in seen:
+            seen.add(stop_id)
+            stop_id = raw[stop_id][3]
+        return stop_id
+
+    stations, station_index, stop_to_station = [], {}, {}
+    for stop_id in raw:
+        station_id = root(stop_id)
+        if station_id not in station_index:
+            station_index[station_id] = len(stations)
+            stations.append(raw[station_id][:3])
+        stop_to_station[stop_id] = station_index[station_id]
+    return stations, stop_to_station
+
+
+def served_pairs(feed, trips, stop_to_station):
+    """
+    Stream stop_times.txt and collect the distinct (station, route) pairs it
+    mentions. Memory grows with the number of pairs, not with stop_times rows.
+    """
+    pairs = set()
+    rows = 0
+    for trip_id, stop_id in iter_rows(feed, 'stop_times.txt', ('trip_id', 'stop_id')):
+        rows += 1
+        route = trips.get(trip_id)
+        station = stop_to_station.get(stop_id)
+        if route is not None and station is not None:
+            pairs.add((station, route))
+    return pairs, rows
+
+
+def read_stop_rows(feed):
+    """
+    Derive the Stop rows a feed describes: {(line, name): (lat, lon)} plus
+    the number of stop_times rows streamed. Each route becomes a Line and
+    each station served by a route becomes a Stop on that line.
+    """
+    routes = read_routes(feed)
+    route_ids = list(routes)
+    trips = read_trips(feed, {route_id: i for i, route_id in enumerate(route_ids)})
+    stations, stop_to_station = read_stations(feed)
+    pairs, stop_times = served_pairs(feed, trips, stop_to_station)
+    rows = {}
+    for station, route in sorted(pairs, key=lambda p: (p[1], p[0])):
+        name, lat, lon = stations[station]
+        rows[(routes[route_ids[route]], name)] = (lat, lon)
+    return rows, stop_times
+
+
+def file_hashes(feed):
+    """
+    SHA-256 of each required feed file, read in blocks from the zip.
+    """
+    hashes = {}
+    for filename in REQUIRED_FILES:
+        digest = hashlib.sha256()
+        with feed.open(_member(feed, filename)) as raw:
+            for block in iter(lambda: raw.read(HASH_BLOCK), b''):
+                digest.update(block)
+        hashes[filename] = digest.hexdigest()
+    return hashes
+
+
+def _row_key(line, name):
+    return f"{line}\x1f{name}"
+
+
+def _row_hash(lat, lon):
+    return hashlib.blake2b(repr((lat, lon)).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def import_gtfs(source, system_name, region=None, chunk_size=IMPORT_CHUNK, incremental=False):
+    """
+    Load a GTFS static feed (path or file object of the zip) into the
+    TransitSystem, Line and Stop tables.
+
+    Rows are written through bulk_upsert_stops in chunks of `chunk_size`
+    inside one transaction, so a failed import leaves the database
+    untouched. Every import records a GtfsManifest; rows the previous import
+    loaded that are gone from the feed are deleted, along with lines left
+    without stops.
+
+    With incremental=True the feed is compared with that manifest instead of
+    the Stop table: an unchanged feed returns immediately (report.skipped)
+    and otherwise only rows whose hash changed are written. This assumes the
+    imported rows were not edited by hand since the last import.
+    Returns a GtfsReport.
+    """
+    report = GtfsReport(system_name)
+    with zipfile.ZipFile(source) as feed:
+        for filename in REQUIRED_FILES:
+            _member(feed, filename)
+        hashes = file_hashes(feed)
+        manifest = db.session.get(GtfsManifest, system_name)
+        if incremental and manifest is not None and manifest.file_hashes == hashes:
+            report.skipped = True
+            return report
+        rows, report.stop_times = read_stop_rows(feed)
+
+    previous = dict(manifest.row_hashes) if manifest is not None else {}
+    current = {_row_key(line, name): _row_hash(lat, lon) for (line, name), (lat, lon) in rows.items()}
+    diff_only = incremental and manifest is not None
+    changed = False
+    try:
+        chunk = []
+        for (line, name), (lat, lon) in rows.items():
+            key = _row_key(line, name)
+            if diff_only and previous.get(key) == current[key]:
+                report.add(line, name, UNCHANGED)
+                continue
+            chunk.append({'name': name, 'line': line, 'lat': lat, 'lon': lon})
+            if len(chunk) >= chunk_size:
+                changed |= _write_chunk(report, system_name, chunk, region)
+                chunk = []
+        if chunk:
+            changed |= _write_chunk(report, system_name, chunk, region)
+        removed = [tuple(key.split('\x1f', 1)) for key in previous if key not in current]
+        if removed:
+            _delete_rows(report, system_name, removed, {line for line, _ in rows})
+            bump_data_version('stops')
+            changed = True
+        if manifest is None:
+            manifest = GtfsManifest(system=system_name)
+            db.session.add(manifest)
+        manifest.file_hashes = hashes
+        manifest.row_hashes = current
+        manifest.imported_at = db.func.now()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if changed:
+        stops_changed.send(system_name)
+    return report
+
+
+def _write_chunk(report, system_name, chunk, region):
+    rows = bulk_upsert_stops(system_name, chunk, region=region, commit=False).rows
+    report.rows.extend(rows)
+    return any(status != UNCHANGED for _, _, status in rows)
+
+
+def _delete_rows(report, system_name, removed, live_lines):
+    """
+    Delete Stop rows dropped from the feed, then any of their lines that no
+    longer have stops in this system.
+    """
+    wanted = set(removed)
+    names = sorted({name for _, name in removed})
+    ids = []
+    for i in range(0, len(names), LOOKUP_CHUNK):
+        matches = db.session.query(Stop.id, Stop.line, Stop.name).filter(
+            Stop.system == system_name, Stop.name.in_(names[i:i + LOOKUP_CHUNK])
+        )
+        ids.extend(row.id for row in matches if (row.line, row.name) in wanted)
+    for i in range(0, len(ids), LOOKUP_CHUNK):
+        db.session.execute(delete(Stop).where(Stop.id.in_(ids[i:i + LOOKUP_CHUNK])))
+    for line, name in removed:
+        report.add(line, name, DELETED)
+
+    dropped = {line for line, _ in removed} - live_lines
+    if dropped:
+        still_used = {
+            line for (line,) in db.session.query(Stop.line).filter(
+                Stop.system == system_name, Stop.line.in_(dropped)
+            ).distinct()
+        }
+        system = TransitSystem.query.filter_by(name=system_name).first()
+        if system is not None and dropped - still_used:
+            db.session.execute(delete(Line).where(
+                Line.system_id == system.id, Line.name.in_(dropped - still_used)
+            ))
+
+
+def register_gtfs_import(app):
+    """
+    Register the `flask import-gtfs` command.
+    """
+
+    @app.cli.command('import-gtfs')
+    @click.argument('feed', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--system', 'system_name', required=True, help='TransitSystem name to load the feed into.')
+    @click.option('--region', default=None, help='Region recorded on a newly created TransitSystem.')
+    @click.option('--incremental', is_flag=True, help='Apply only what changed since the last import of this system.')
+    def import_gtfs_command(feed, system_name, region, incremental):
+        """Import stops and lines from a GTFS static feed zip."""
+        try:
+            report = import_gtfs(feed, system_name, region=region, incremental=incremental)
+        except (GtfsError, zipfile.BadZipFile) as e:
+            raise click.ClickException(str(e))
+        if report.skipped:
+            click.echo(f"{system_name}: feed unchanged since last import")
+            return
+        counts = report.counts()
+        click.echo(
+            f"{system_name}: {report.stop_times} stop_times rows, {len(report) - counts[DELETED]} stops "
+            f"({counts[INSERTED]} inserted, {counts[UPDATED]} updated, "
+            f"{counts[UNCHANGED]} unchanged, {counts[DELETED]} deleted)"
+        )
@@ -0,0 +1,54 @@
+import functools
+import hashlib
+from flask import current_app, make_response, request
+
+
+def make_etag(endpoint, version, args, encoding=''):
+    """
+    Strong validator for one endpoint + query string at a given data version.
+    Each content encoding is a distinct representation and gets its own tag.
+    """
+    query = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    return hashlib.sha1(f"{endpoint}|{version}|{query}|{encoding}".encode()).hexdigest()[:20]
+
+
+def _accepted_encodings():
+    return ",".join(e for e in ('br', 'gzip') if request.accept_encodings[e])
+
+
+def cached_endpoint(version, max_age, stale_while_revalidate=0, vary_encoding=False):
+    """
+    Decorate a read-only view with ETag/Cache-Control handling.
+
+    `version` is called per request and returns the version of the data the
+    view reads (or None to skip caching). A matching If-None-Match is
+    answered with 304 before the view runs; 200 responses get the ETag and
+    `Cache-Control: public, max-age=..., stale-while-revalidate=...`.
+    Bumping the version invalidates every cached response for the endpoint.
+    Set vary_encoding for views that may send compressed bodies.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            current = version()
+            if current is None:
+                return view(*args, **kwargs)
+            encoding = _accepted_encodings() if vary_encoding else ''
+            etag = make_etag(request.endpoint, current, request.args, encoding)
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                # Errors and responses the view marked no-cache are left alone
+                if response.status_code != 200 or response.cache_control.no_cache:
+                    return response
+            response.set_etag(etag)
+            if vary_encoding:
+                response.vary.add('Accept-Encoding')
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            if stale_while_revalidate:
+                response.cache_control.stale_while_revalidate = stale_while_revalidate
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,110 @@
+from sqlalchemy import insert, update
+from backend.models import db, Stop, TransitSystem, Line, bump_data_version
+from backend.signals import stops_changed
+
+INSERTED = "inserted"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+
+class IngestReport:
+    """
+    Outcome of a bulk upsert: one (line, name, status) tuple per distinct stop.
+    """
+
+    def __init__(self, system):
+        self.system = system
+        self.rows = []
+
+    def add(self, line, name, status):
+        self.rows.append((line, name, status))
+
+    def counts(self):
+        counts = {INSERTED: 0, UPDATED: 0, UNCHANGED: 0}
+        for _, _, status in self.rows:
+            counts[status] += 1
+        return counts
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _get_or_create_system(system_name, region):
+    system = TransitSystem.query.filter_by(name=system_name).first()
+    if system is None:
+        system = TransitSystem(name=system_name, region=region)
+        db.session.add(system)
+        db.session.flush()
+    return system
+
+
+def _ensure_lines(system, line_names):
+    existing = {
+        name for (name,) in db.session.query(Line.name).filter(Line.system_id == system.id)
+    }
+    missing = sorted(set(line_names) - existing)
+    if missing:
+        db.session.execute(insert(Line), [{"name": name, "system_id": system.id} for name in missing])
+
+
+def _existing_stops(system_name, names):
+    existing = {}
+    names = sorted(names)
+    for i in range(0, len(names), LOOKUP_CHUNK):
+        rows = db.session.query(Stop.id, Stop.line, Stop.name, Stop.lat, Stop.lon).filter(
+            Stop.system == system_name, Stop.name.in_(names[i:i + LOOKUP_CHUNK])
+        )
+        for row in rows:
+            existing[(row.line, row.name)] = row
+    return existing
+
+
+def bulk_upsert_stops(system_name, stops, region=None, commit=True):
+    """
+    Insert or update stops for one system in a single transaction.
+
+    Lines are resolved in one query and missing ones inserted together; stops
+    are matched on (line, name) and written with executemany-style bulk
+    INSERT/UPDATE statements. Works on SQLite and Postgres. Pass commit=False
+    to leave the transaction open for the caller (e.g. chunked imports); the
+    caller then owns sending stops_changed. Returns an IngestReport.
+    """
+    # Collapse duplicates in the input; the last occurrence wins
+    incoming = {}
+    for stop in stops:
+        line_name = stop.get('line') or 'Unknown'
+        incoming[(line_name, stop['name'])] = (stop.get('lat'), stop.get('lon'))
+
+    report = IngestReport(system_name)
+    try:
+        system = _get_or_create_system(system_name, region)
+        _ensure_lines(system, {line for line, _ in incoming})
+        existing = _existing_stops(system_name, {name for _, name in incoming})
+        inserts, updates = [], []
+        for (line_name, name), (lat, lon) in incoming.items():
+            row = existing.get((line_name, name))
+            if row is None:
+                inserts.append({"name": name, "line": line_name, "system": system_name, "lat": lat, "lon": lon})
+                report.add(line_name, name, INSERTED)
+            elif (row.lat, row.lon) != (lat, lon):
+                updates.append({"id": row.id, "lat": lat, "lon": lon})
+                report.add(line_name, name, UPDATED)
+            else:
+                report.add(line_name, name, UNCHANGED)
+        if inserts:
+            db.session.execute(insert(Stop), inserts)
+        if updates:
+            db.session.execute(update(Stop), updates)
+        if inserts or updates:
+            bump_data_version('stops')
+        if commit:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    if commit and (inserts or updates):
+        stops_changed.send(system_name)
+    return report
@@ -0,0 +1,256 @@
+# Journey planning over GTFS schedules with the Connection Scan Algorithm
+import array
+import bisect
+import os
+import zipfile
+import click
+import numpy as np
+from backend import gtfs
+from backend.models import normalize_stop_name
+
+# Minimum time to change trains at a station
+MIN_TRANSFER_S = 120
+# Journeys are searched at most this long after the requested departure
+MAX_JOURNEY_S = 4 * 3600
+INF = 1 << 30
+
+
+def parse_time(value):
+    """
+    GTFS "HH:MM:SS" (hours may exceed 24) to seconds after midnight, or None.
+    """
+    if not value:
+        return None
+    try:
+        h, m, s = value.split(':')
+        return int(h) * 3600 + int(m) * 60 + int(s)
+    except ValueError:
+        return None
+
+
+def parse_clock_time(value):
+    """
+    A time of day given as "HH:MM" or "HH:MM:SS" to seconds after midnight,
+    or None unless every field is in range.
+    """
+    parts = value.split(':') if value else []
+    if len(parts) not in (2, 3) or not all(p.isdigit() and len(p) <= 2 for p in parts):
+        return None
+    h, m, s = (int(p) for p in parts + ['0'] * (3 - len(parts)))
+    if h > 23 or m > 59 or s > 59:
+        return None
+    return h * 3600 + m * 60 + s
+
+
+def format_time(seconds):
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _station_key(name):
+    key = normalize_stop_name(name)
+    return key[:-len(' station')] if key.endswith(' station') else key
+
+
+class Timetable:
+    """
+    Compact array timetable: one row per connection (a train running
+    between two consecutive stations), sorted by departure time.
+
+    Connections live in parallel int32 arrays; stations, trips and routes
+    are referred to by index. Queries scan the connection arrays with the
+    Connection Scan Algorithm, starting at the requested departure (found
+    by bisection) and stopping as soon as no later connection can improve
+    the arrival, so a query touches only the connections in its time window.
+    """
+
+    ARRAYS = ('station_names', 'station_lat', 'station_lon', 'route_names', 'trip_route',
+              'dep_stop', 'arr_stop', 'dep_time', 'arr_time', 'trip')
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        # Python lists scan much faster than NumPy scalar indexing
+        self._dep_stop = self.dep_stop.tolist()
+        self._arr_stop = self.arr_stop.tolist()
+        self._dep_time = self.dep_time.tolist()
+        self._arr_time = self.arr_time.tolist()
+        self._trip = self.trip.tolist()
+        self._by_name = {}
+        for idx, name in enumerate(self.station_names.tolist()):
+            self._by_name.setdefault(_station_key(name), []).append(idx)
+
+    def __len__(self):
+        return len(self._dep_time)
+
+    @classmethod
+    def from_gtfs(cls, source):
+        """
+        Build a timetable from a GTFS zip, streaming stop_times.txt. Platforms
+        are folded into their parent stations and stop_times rows without
+        times are skipped. Service calendars are not applied: every trip is
+        assumed to run on the day being planned.
+        """
+        with zipfile.ZipFile(source) as feed:
+            routes = gtfs.read_routes(feed)
+            route_ids = list(routes)
+            trips = gtfs.read_trips(feed, {route_id: i for i, route_id in enumerate(route_ids)})
+            stations, stop_to_station = gtfs.read_stations(feed)
+            trip_ids = {trip_id: i for i, trip_id in enumerate(trips)}
+            cols = {name: array.array('i') for name in ('trip', 'seq', 'station', 'arr', 'dep')}
+            for trip_id, stop_id, seq, arr, dep in gtfs.iter_rows(
+                feed, 'stop_times.txt', ('trip_id', 'stop_id', 'stop_sequence', 'arrival_time', 'departure_time')
+            ):
+                trip = trip_ids.get(trip_id)
+                station = stop_to_station.get(stop_id)
+                arr_s, dep_s = parse_time(arr), parse_time(dep)
+                if trip is None or station is None or (arr_s is None and dep_s is None):
+                    continue
+                cols['trip'].append(trip)
+                cols['seq'].append(int(seq or 0))
+                cols['station'].append(station)
+                cols['arr'].append(dep_s if arr_s is None else arr_s)
+                cols['dep'].append(arr_s if dep_s is None else dep_s)
+        trip, seq, station, arr, dep = (np.frombuffer(cols[c], dtype=np.int32) for c in ('trip', 'seq', 'station', 'arr', 'dep'))
+        order = np.lexsort((seq, trip))
+        trip, station, arr, dep = trip[order], station[order], arr[order], dep[order]
+        # Consecutive rows of the same trip form a connection
+        same = trip[:-1] == trip[1:]
+        conn = {
+            'dep_stop': station[:-1][same], 'arr_stop': station[1:][same],
+            'dep_time': dep[:-1][same], 'arr_time': arr[1:][same], 'trip': trip[:-1][same],
+        }
+        by_departure = np.lexsort((conn['arr_time'], conn['dep_time']))
+        return cls(
+            station_names=np.array([s[0] for s in stations], dtype=str),
+            station_lat=np.array([np.nan if s[1] is None else s[1] for s in stations], dtype=float),
+            station_lon=np.array([np.nan if s[2] is None else s[2] for s in stations], dtype=float),
+            route_names=np.array([routes[r] for r in route_ids], dtype=str),
+            trip_route=np.fromiter(trips.values(), dtype=np.int32, count=len(trips)),
+            **{name: values[by_departure].astype(np.int32) for name, values in conn.items()},
+        )
+
+    def save(self, path):
+        # Writing through a file object stops NumPy from appending .npz
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in cls.ARRAYS})
+
+    def stations_named(self, name):
+        return self._by_name.get(_station_key(name or ''), [])
+
+    def earliest_arrival(self, origins, destinations, depart_at, min_transfer=MIN_TRANSFER_S):
+        """
+        Connection Scan for the earliest arrival at any of `destinations`
+        leaving any of `origins` no earlier than `depart_at` (seconds).
+        Returns a list of legs, or None when no journey exists within
+        MAX_JOURNEY_S.
+        """
+        if not origins or not destinations:
+            return None
+        destinations = set(destinations)
+        ready = {station: depart_at for station in origins}
+        arrival = {}
+        boarded = {}
+        via = {}
+        best = INF
+        horizon = depart_at + MAX_JOURNEY_S
+        dep_stop, arr_stop, dep_time, arr_time, trips = (
+            self._dep_stop, self._arr_stop, self._dep_time, self._arr_time, self._trip,
+        )
+        for i in range(bisect.bisect_left(dep_time, depart_at), len(dep_time)):
+            departs = dep_time[i]
+            if departs >= best or departs > horizon:
+                break
+            trip = trips[i]
+            if trip not in boarded:
+                if ready.get(dep_stop[i], INF) > departs:
+                    continue
+                boarded[trip] = i
+            arrives, stop = arr_time[i], arr_stop[i]
+            if arrives < arrival.get(stop, INF):
+                arrival[stop] = arrives
+                ready[stop] = min(ready.get(stop, INF), arrives + min_transfer)
+                via[stop] = (boarded[trip], i)
+                if stop in destinations:
+                    best = min(best, arrives)
+        reached = [s for s in destinations if s in via]
+        if not reached:
+            return None
+        stop = min(reached, key=lambda s: arrival[s])
+        legs = []
+        while stop in via and stop not in origins:
+            enter, exit_ = via[stop]
+            legs.append(self._leg(enter, exit_))
+            stop = dep_stop[enter]
+        legs.reverse()
+        return legs
+
+    def _leg(self, enter, exit_):
+        trip = self._trip[enter]
+        # The segment into the alighting station gives the travel direction there
+        last_dep = self._dep_stop[exit_]
+        return {
+            'from': str(self.station_names[self._dep_stop[enter]]),
+            'to': str(self.station_names[self._arr_stop[exit_]]),
+            'line': str(self.route_names[self.trip_route[trip]]),
+            'depart': format_time(self._dep_time[enter]),
+            'arrive': format_time(self._arr_time[exit_]),
+            'heading': compass_direction(
+                (self.station_lat[last_dep], self.station_lon[last_dep]),
+                (self.station_lat[self._arr_stop[exit_]], self.station_lon[self._arr_stop[exit_]]),
+            ),
+        }
+
+
+def compass_direction(origin, destination):
+    """
+    "northbound"/"southbound"/"eastbound"/"westbound" for travel between two
+    (lat, lon) points, by the dominant axis; None without coordinates.
+    """
+    (lat1, lon1), (lat2, lon2) = origin, destination
+    if any(v is None or np.isnan(v) for v in (lat1, lon1, lat2, lon2)):
+        return None
+    d_lat = lat2 - lat1
+    d_lon = (lon2 - lon1) * np.cos(np.radians((lat1 + lat2) / 2))
+    if abs(d_lat) >= abs(d_lon):
+        return 'northbound' if d_lat > 0 else 'southbound'
+    return 'eastbound' if d_lon > 0 else 'westbound'
+
+
+def load_timetable(path):
+    """
+    Load the timetable at `path`, or return None when it is missing or unreadable.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return Timetable.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[load_timetable] Error loading {path}: {e}")
+        return None
+
+
+def register_journey(app):
+    """
+    Register the `flask build-timetable` command and load TIMETABLE_PATH, if
+    it exists, as app.timetable.
+    """
+
+    @app.cli.command('build-timetable')
+    @click.argument('feed', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--output', default=None, help='Timetable file to write (defaults to TIMETABLE_PATH).')
+    def build_timetable_command(feed, output):
+        """Compile a GTFS feed's schedules into a journey planning timetable."""
+        path = output or app.config.get('TIMETABLE_PATH') or 'timetable.npz'
+        try:
+            timetable = Timetable.from_gtfs(feed)
+        except (gtfs.GtfsError, zipfile.BadZipFile) as e:
+            raise click.ClickException(str(e))
+        timetable.save(path)
+        click.echo(f"Wrote {len(timetable)} connections between {len(timetable.station_names)} stations to {path}")
+
+    app.timetable = load_timetable(app.config.get('TIMETABLE_PATH'))
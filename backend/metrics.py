@@ -0,0 +1,137 @@
+# Prometheus latency metrics for requests, DB queries, scraping and JSON encoding
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Metrics live in their own registry so they can be exported without the
+# process collectors and registered once however many apps are created
+REGISTRY = CollectorRegistry()
+
+# With several server processes (gunicorn workers), each must write its
+# samples to this directory so /metrics can sum every worker rather than
+# report whichever one answered. It must exist and be emptied before the
+# server starts; prometheus_client reads it at import time.
+MULTIPROC_DIR_ENV = 'PROMETHEUS_MULTIPROC_DIR'
+
+# Request latencies span cached 304s (well under 1 ms) to cold scrapes
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REQUEST_SECONDS = Histogram(
+    'transitnav_request_seconds', 'Time spent handling HTTP requests.',
+    ['endpoint', 'method', 'status'], buckets=REQUEST_BUCKETS, registry=REGISTRY,
+)
+DB_QUERY_SECONDS = Histogram(
+    'transitnav_db_query_seconds', 'Time spent executing SQL statements.',
+    ['operation'], buckets=FAST_BUCKETS, registry=REGISTRY,
+)
+SCRAPE_SECONDS = Histogram(
+    'transitnav_scrape_seconds', 'Time spent fetching and parsing upstream station pages.',
+    ['system', 'phase'], buckets=REQUEST_BUCKETS, registry=REGISTRY,
+)
+JSON_SECONDS = Histogram(
+    'transitnav_json_serialize_seconds', 'Time spent serializing JSON response bodies.',
+    buckets=FAST_BUCKETS, registry=REGISTRY,
+)
+
+# Statement kinds reported separately; anything else is "other"
+DB_OPERATIONS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'COMMIT', 'ROLLBACK'}
+
+_listening = False
+_listen_lock = threading.Lock()
+
+
+@contextmanager
+def timed(histogram, *labels):
+    """
+    Observe the duration of the `with` block on `histogram`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric = histogram.labels(*labels) if labels else histogram
+        metric.observe(time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('metrics_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    # Only the leading keyword is needed; bulk statements can be long
+    words = statement[:16].split(None, 1)
+    operation = words[0].upper() if words else ''
+    DB_QUERY_SECONDS.labels(operation.lower() if operation in DB_OPERATIONS else 'other').observe(elapsed)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('metrics_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def listen_for_queries():
+    """
+    Time every SQL statement on every engine. Safe to call repeatedly.
+    """
+    global _listening
+    with _listen_lock:
+        if _listening:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listening = True
+
+
+def register_metrics(app):
+    """
+    Time every request by endpoint, method and status, time SQL statements,
+    and export everything at /metrics in the Prometheus text format.
+    Disabled when METRICS_ENABLED is false. Set PROMETHEUS_MULTIPROC_DIR
+    when running more than one worker process.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    listen_for_queries()
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            REQUEST_SECONDS.labels(
+                request.endpoint or 'unmatched', request.method, str(response.status_code),
+            ).observe(time.perf_counter() - started)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(generate_latest(export_registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def export_registry():
+    """
+    The registry /metrics exports: REGISTRY for a single process, or every
+    process's samples merged from PROMETHEUS_MULTIPROC_DIR when it is set.
+    """
+    if not os.environ.get(MULTIPROC_DIR_ENV):
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
@@ -0,0 +1,54 @@
+"""stop lookup indexes and normalized name
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from backend.models import normalize_stop_name
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('stop') as batch_op:
+        batch_op.add_column(sa.Column('name_normalized', sa.String(length=128), nullable=True))
+
+    # Backfill in Python so every dialect gets exactly normalize_stop_name()
+    bind = op.get_bind()
+    stop = sa.table('stop', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                    sa.column('name_normalized', sa.String))
+    rows = [{'stop_id': id_, 'normalized': normalize_stop_name(name)}
+            for id_, name in bind.execute(sa.select(stop.c.id, stop.c.name))]
+    if rows:
+        bind.execute(
+            stop.update().where(stop.c.id == sa.bindparam('stop_id'))
+            .values(name_normalized=sa.bindparam('normalized')),
+            rows,
+        )
+
+    with op.batch_alter_table('stop') as batch_op:
+        batch_op.alter_column('name_normalized', existing_type=sa.String(length=128), nullable=False)
+        batch_op.create_index('ix_stop_system_line', ['system', 'line'], unique=False)
+        batch_op.create_index('ix_stop_name_normalized', ['name_normalized'], unique=False)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_stop_name_trgm', 'stop', ['name_normalized'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name_normalized': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_stop_name_trgm', table_name='stop')
+    with op.batch_alter_table('stop') as batch_op:
+        batch_op.drop_index('ix_stop_name_normalized')
+        batch_op.drop_index('ix_stop_system_line')
+        batch_op.drop_column('name_normalized')
@@ -0,0 +1,30 @@
+"""gtfs import manifest
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('gtfs_manifest',
+    sa.Column('system', sa.String(length=64), nullable=False),
+    sa.Column('file_hashes', sa.JSON(), nullable=False),
+    sa.Column('row_hashes', sa.JSON(), nullable=False),
+    sa.Column('imported_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('system')
+    )
+
+
+def downgrade():
+    op.drop_table('gtfs_manifest')
@@ -1,7 +1,26 @@
+import re
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import validates
 
 db = SQLAlchemy()
 
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+def normalize_stop_name(name):
+    """
+    Search key for a stop name: lowercase alphanumerics separated by single spaces.
+    "St. George Station" -> "st george station"
+    """
+    if not name:
+        return ''
+    return _NON_ALNUM.sub(' ', name.lower()).strip()
+
+def _name_normalized_default(context):
+    # Runs for Core/bulk inserts too, where ORM validators do not fire
+    return normalize_stop_name(context.get_current_parameters().get('name'))
+
 class TransitSystem(db.Model):
     __tablename__ = 'transit_system'
     id = db.Column(db.Integer, primary_key=True)
@@ -19,13 +38,29 @@ class Line(db.Model):
 
 class Stop(db.Model):
     __tablename__ = 'stop'
+    __table_args__ = (
+        db.Index('ix_stop_system_line', 'system', 'line'),
+        db.Index('ix_stop_name_normalized', 'name_normalized'),
+        # Trigram index so '%substring%' name searches are indexed on Postgres
+        db.Index(
+            'ix_stop_name_trgm', 'name_normalized',
+            postgresql_using='gin',
+            postgresql_ops={'name_normalized': 'gin_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
+    name_normalized = db.Column(db.String(128), nullable=False, default=_name_normalized_default)
     line = db.Column(db.String(64), nullable=False)
     system = db.Column(db.String(64), nullable=False)
     lat = db.Column(db.Float, nullable=True)
     lon = db.Column(db.Float, nullable=True)
 
+    @validates('name')
+    def _set_name_normalized(self, key, name):
+        self.name_normalized = normalize_stop_name(name)
+        return name
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -34,3 +69,54 @@ class Stop(db.Model):
             'system': self.system,
             'location': {'lat': self.lat, 'lon': self.lon} if self.lat and self.lon else None
         }
+
+class DataVersion(db.Model):
+    """
+    Monotonic version per data set ('stops', ...), bumped in the same
+    transaction as every write so all processes agree on when data changed.
+    """
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+def bump_data_version(name):
+    """
+    Increment a data version inside the current transaction; the caller commits.
+    """
+    updated = db.session.execute(
+        db.update(DataVersion).where(DataVersion.name == name).values(version=DataVersion.version + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(DataVersion(name=name, version=1))
+        db.session.flush()
+
+def get_data_version(name):
+    """
+    Current version of a data set (0 if never written), or None when the
+    table is unavailable.
+    """
+    try:
+        version = db.session.execute(
+            db.select(DataVersion.version).where(DataVersion.name == name)
+        ).scalar()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+    return version or 0
+
+class GtfsManifest(db.Model):
+    """
+    What the last GTFS import of a system loaded: a hash per feed file and a
+    hash per resulting stop row, so the next import can apply only the diff.
+    """
+    __tablename__ = 'gtfs_manifest'
+    system = db.Column(db.String(64), primary_key=True)
+    file_hashes = db.Column(db.JSON, nullable=False, default=dict)
+    row_hashes = db.Column(db.JSON, nullable=False, default=dict)
+    imported_at = db.Column(db.DateTime, nullable=True)
+
+event.listen(
+    Stop.__table__,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
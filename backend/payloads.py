@@ -0,0 +1,144 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from flask.json.provider import DefaultJSONProvider
+from backend.metrics import JSON_SECONDS, timed
+from backend.signals import stops_changed
+
+# Optional accelerators: orjson for encoding, brotli for compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Payloads smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+
+def dumps_bytes(obj):
+    """
+    Serialize to compact UTF-8 JSON with sorted keys, using orjson when it is
+    installed. Output is byte-identical between calls for the same data.
+    """
+    with timed(JSON_SECONDS):
+        return _encode(obj)
+
+
+def _encode(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes responses with orjson when available.
+    Falls back to the default provider for types orjson does not handle.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            try:
+                return _encode(obj).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        # One observation per response, including a fallback after orjson fails
+        with timed(JSON_SECONDS):
+            if orjson is not None:
+                try:
+                    return self._app.response_class(_encode(obj), mimetype=self.mimetype)
+                except TypeError:
+                    pass
+            return super().response(obj)
+
+
+class Payload:
+    """
+    One serialized JSON body plus its precompressed variants.
+    """
+    __slots__ = ("raw", "encoded")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.encoded = {}
+        if len(raw) >= MIN_COMPRESS_BYTES:
+            self.encoded['gzip'] = gzip.compress(raw, compresslevel=6, mtime=0)
+            if brotli is not None:
+                self.encoded['br'] = brotli.compress(raw, quality=9)
+
+    def body(self, accept_encodings):
+        """
+        Return (encoding or None, bytes) for the best variant the client accepts.
+        """
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encoded and accept_encodings[encoding]:
+                return encoding, self.encoded[encoding]
+        return None, self.raw
+
+
+class PayloadStore:
+    """
+    Bounded LRU of precomputed payloads keyed by (data version, slice key).
+    A new data version naturally misses every old entry, which then age out.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, version, key, build):
+        """
+        Return the Payload for `key` at `version`, serializing and compressing
+        `build()` once on a miss. A build() result of None is cached as None.
+        """
+        cache_key = (version, key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                return self._entries[cache_key]
+        data = build()
+        payload = None if data is None else Payload(dumps_bytes(data))
+        with self._lock:
+            self._entries[cache_key] = payload
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+stop_payloads = PayloadStore()
+
+
+def _on_stops_changed(sender, **kw):
+    # Entries are keyed by data version already; this just frees memory early
+    stop_payloads.clear()
+
+
+stops_changed.connect(_on_stops_changed, weak=False)
+
+
+def payload_response(app, payload, accept_encodings):
+    """
+    Build a JSON response from a Payload, choosing the encoding from the
+    request's Accept-Encoding header.
+    """
+    encoding, body = payload.body(accept_encodings)
+    response = app.response_class(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,213 @@
+# Platform geometry and the car placement engine built on it
+import hashlib
+import json
+import numpy as np
+from backend.car_placement import EXIT_ALIASES, _clean
+
+# Per-station platform layout. Positions are meters along the platform from
+# its "start" end (north or west); a line's directions say which end the
+# train's front stops at, `stop_offset` how far short of that end. Trains
+# may run in several lengths ("consists"), always stopping front-aligned.
+PLATFORM_GEOMETRY = {
+    "union station": {
+        "length": 152.0,
+        "exits": {"york concourse": 38.0, "front street": 70.0, "bay concourse": 118.0},
+        "lines": {
+            "1": {
+                "names": ["line 1", "yonge university", "yonge-university"],
+                "car_length": 23.0, "cars": 6, "consists": [4, 6], "stop_offset": 7.0,
+                "directions": {"northbound": "start", "southbound": "end"},
+            },
+        },
+    },
+    "st george": {
+        "length": 152.0,
+        "exits": {"st george street": 20.0, "bedford": 50.0, "line 2 transfer": 96.0},
+        "lines": {
+            "1": {
+                "names": ["line 1", "yonge university", "yonge-university"],
+                "car_length": 23.0, "cars": 6, "stop_offset": 7.0,
+                "directions": {"northbound": "start", "southbound": "end"},
+            },
+            "2": {
+                "names": ["line 2", "bloor danforth", "bloor-danforth"],
+                "car_length": 23.0, "cars": 6, "stop_offset": 7.0,
+                "directions": {"westbound": "start", "eastbound": "end"},
+            },
+        },
+    },
+    "king": {
+        "length": 152.0,
+        "exits": {"king street west": 22.0, "king street east": 128.0, "first canadian place": 60.0},
+        "lines": {
+            "1": {
+                "names": ["line 1", "yonge university", "yonge-university"],
+                "car_length": 23.0, "cars": 6, "consists": [4, 6], "stop_offset": 7.0,
+                "directions": {"northbound": "start", "southbound": "end"},
+            },
+        },
+    },
+    "bloor-yonge": {
+        "length": 152.0,
+        "exits": {"yonge": 30.0, "bloor": 84.0, "hudson's bay": 130.0},
+        "lines": {
+            "1": {
+                "names": ["line 1", "yonge university", "yonge-university", "yonge"],
+                "car_length": 23.0, "cars": 6, "stop_offset": 7.0,
+                "directions": {"northbound": "start", "southbound": "end"},
+            },
+            "2": {
+                "names": ["line 2", "bloor danforth", "bloor-danforth", "bloor"],
+                "car_length": 23.0, "cars": 6, "stop_offset": 7.0,
+                "directions": {"westbound": "start", "eastbound": "end"},
+            },
+        },
+    },
+}
+
+# Cars whose walk is within this many meters of the best are equally good
+TIE_TOLERANCE_M = 5.0
+
+
+def car_centres(length, car_length, cars, stop_offset, toward):
+    """
+    Centre position of each car, front car first, for a train whose front
+    stops `stop_offset` meters short of the `toward` ("start"/"end") end.
+    """
+    along = stop_offset + (np.arange(cars) + 0.5) * car_length
+    return along if toward == "start" else length - along
+
+
+def walk_distances(centres, exits, car_length):
+    """
+    (exits x cars) matrix of meters from the nearest door of each car to
+    each exit. Doors run the full car, so an exit alongside a car is 0 m.
+    """
+    return np.maximum(np.abs(exits[:, None] - centres[None, :]) - car_length / 2, 0.0)
+
+
+def compute_placements(geometry, tolerance=TIE_TOLERANCE_M):
+    """
+    Precompute the best car(s) for every station, line, direction, train
+    length and exit. Each (station, line) is solved as one vectorized
+    (directions x consists x exits x cars) array.
+
+    Returns {(station, line, direction, cars, exit): (best cars, walk meters)}.
+    """
+    table = {}
+    for station, platform in geometry.items():
+        exit_names = list(platform["exits"])
+        exits = np.array([platform["exits"][name] for name in exit_names], dtype=float)
+        for line, spec in platform["lines"].items():
+            directions = list(spec["directions"])
+            consists = sorted(set(spec.get("consists", [])) | {spec["cars"]})
+            longest = max(consists)
+            # Distances for the longest train; shorter ones are its front cars
+            dist = np.stack([
+                walk_distances(
+                    car_centres(platform["length"], spec["car_length"], longest, spec["stop_offset"], spec["directions"][d]),
+                    exits, spec["car_length"],
+                )
+                for d in directions
+            ])
+            for consist in consists:
+                sub = dist[:, :, :consist]
+                best = sub.min(axis=2)
+                optimal = sub <= best[:, :, None] + tolerance
+                for d_idx, direction in enumerate(directions):
+                    for e_idx, exit_name in enumerate(exit_names):
+                        cars = tuple(int(c) + 1 for c in np.flatnonzero(optimal[d_idx, e_idx]))
+                        table[(station, line, direction, consist, exit_name)] = (cars, float(best[d_idx, e_idx]))
+    return table
+
+
+def build_line_lookup(geometry):
+    """
+    Map (station, any spelling of a line) to the line key.
+    """
+    lookup = {}
+    for station, platform in geometry.items():
+        for line, spec in platform["lines"].items():
+            for name in (line, *spec.get("names", ())):
+                lookup[(station, _clean(name))] = line
+    return lookup
+
+
+def build_exit_lookup(geometry, exit_aliases):
+    """
+    Map (station, any spelling of an exit) to the geometry exit name.
+    """
+    lookup = {}
+    for station, platform in geometry.items():
+        for exit_name in platform["exits"]:
+            for variant in (exit_name, *exit_aliases.get(station, {}).get(exit_name, ())):
+                lookup[(station, _clean(variant))] = exit_name
+    return lookup
+
+
+PLACEMENTS = {}
+LINE_LOOKUP = {}
+EXIT_LOOKUP = {}
+# Content hash of PLATFORM_GEOMETRY, used for HTTP validators
+GEOMETRY_VERSION = None
+
+
+def rebuild_placements():
+    """
+    Recompute the placement tables from PLATFORM_GEOMETRY. Runs at import;
+    call again after changing the geometry.
+    """
+    global PLACEMENTS, LINE_LOOKUP, EXIT_LOOKUP, GEOMETRY_VERSION
+    PLACEMENTS = compute_placements(PLATFORM_GEOMETRY)
+    LINE_LOOKUP = build_line_lookup(PLATFORM_GEOMETRY)
+    EXIT_LOOKUP = build_exit_lookup(PLATFORM_GEOMETRY, EXIT_ALIASES)
+    blob = json.dumps([PLATFORM_GEOMETRY, TIE_TOLERANCE_M], sort_keys=True)
+    GEOMETRY_VERSION = hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+def has_geometry(station):
+    return station in PLATFORM_GEOMETRY
+
+
+def place(station, exit_name, line=None, direction=None, cars=None):
+    """
+    Look up the precomputed placement for a normalized station name.
+    Returns (result, None) on success or (None, error message).
+    """
+    platform = PLATFORM_GEOMETRY.get(station)
+    if platform is None:
+        return None, f"No platform geometry for '{station}'"
+    exit_key = EXIT_LOOKUP.get((station, _clean(exit_name or '')))
+    if exit_key is None:
+        return None, "Please specify a valid exit or exit is ambiguous/missing."
+    if line:
+        line_key = LINE_LOOKUP.get((station, _clean(line)))
+        if line_key is None:
+            return None, f"Line '{line}' does not serve {station}."
+    elif len(platform["lines"]) == 1:
+        line_key = next(iter(platform["lines"]))
+    else:
+        return None, f"Please clarify which line you are on at {station}."
+    spec = platform["lines"][line_key]
+    if direction not in spec["directions"]:
+        options = " or ".join(spec["directions"])
+        return None, f"Please specify direction ({options})."
+    consist = spec["cars"] if cars is None else cars
+    found = PLACEMENTS.get((station, line_key, direction, consist, exit_key))
+    if found is None:
+        lengths = ", ".join(str(c) for c in sorted(set(spec.get("consists", [])) | {spec["cars"]}))
+        return None, f"Trains on line {line_key} run with {lengths} cars."
+    best, walk = found
+    return {
+        "station": station,
+        "exit": exit_key,
+        "line": line_key,
+        "direction": direction,
+        "train_cars": consist,
+        "car": best[0] if len(best) == 1 else list(best),
+        "walk_m": round(walk, 1),
+        "notes": f"Board car {' or '.join(str(c) for c in best)} travelling {direction} for the shortest walk to {exit_key}.",
+    }, None
+
+
+rebuild_placements()
@@ -0,0 +1,170 @@
+# Opt-in per-request sampling profiler writing collapsed stacks
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+
+# Header that requests a profile when it carries PROFILE_TOKEN
+PROFILE_HEADER = 'X-Profile-Token'
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.001
+# Profiles kept in PROFILE_DIR; older ones are deleted as new ones are written
+MAX_PROFILE_FILES = 200
+PROFILE_SUFFIX = '.collapsed'
+
+_counter = itertools.count()
+
+
+def _frame_label(code):
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(';', ':')
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one thread.
+
+    A helper thread reads the target thread's stack every `interval`
+    seconds and counts identical stacks, so the profiled code runs
+    unmodified and the cost is bounded by the sampling rate rather than
+    the number of calls. collapsed() renders the counts in the collapsed
+    stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def write_profile(profiler, directory, name, max_files=MAX_PROFILE_FILES):
+    """
+    Write the profiler's collapsed stacks to `directory` and return the path,
+    then delete the oldest profiles beyond `max_files`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_counter)}-{name}{PROFILE_SUFFIX}")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(profiler.collapsed())
+    if max_files:
+        prune_profiles(directory, max_files)
+    return path
+
+
+def prune_profiles(directory, max_files):
+    """
+    Delete all but the `max_files` most recently written profiles in
+    `directory`. Returns the number deleted.
+    """
+    profiles = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(PROFILE_SUFFIX) and entry.is_file():
+                try:
+                    profiles.append((entry.stat().st_mtime_ns, entry.name))
+                except FileNotFoundError:
+                    pass
+    profiles.sort()
+    deleted = 0
+    for _, filename in profiles[:max(0, len(profiles) - max_files)]:
+        try:
+            os.remove(os.path.join(directory, filename))
+            deleted += 1
+        except FileNotFoundError:
+            # Another worker pruned it first
+            pass
+    return deleted
+
+
+def should_profile(token, sample_rate, supplied):
+    """
+    Profile when the request carries the admin token, or at random for a
+    `sample_rate` fraction of requests.
+    """
+    if token and supplied and hmac.compare_digest(supplied.encode(), token.encode()):
+        return True
+    return bool(sample_rate) and random.random() < sample_rate
+
+
+def register_profiling(app):
+    """
+    Profile requests that send PROFILE_TOKEN in the X-Profile-Token header
+    and a PROFILE_SAMPLE_RATE fraction of all requests, writing one
+    collapsed-stack file per request to PROFILE_DIR, which keeps the newest
+    PROFILE_MAX_FILES of them. Nothing is registered
+    unless one of the two is configured, so disabled profiling costs nothing.
+    """
+    token = app.config.get('PROFILE_TOKEN')
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE') or 0.0
+    if not token and not sample_rate:
+        return
+    directory = app.config.get('PROFILE_DIR') or 'profiles'
+    max_files = app.config.get('PROFILE_MAX_FILES', MAX_PROFILE_FILES)
+
+    def finish():
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return None
+        profiler.stop()
+        try:
+            return write_profile(profiler, directory, request.endpoint or 'unmatched', max_files)
+        except OSError as e:
+            print(f"[register_profiling] Error writing profile: {e}")
+            return None
+
+    @app.before_request
+    def start_profiler():
+        if should_profile(token, sample_rate, request.headers.get(PROFILE_HEADER)):
+            g.profiler = SamplingProfiler().start()
+
+    @app.after_request
+    def stop_profiler(response):
+        path = finish()
+        if path is not None:
+            response.headers['X-Profile'] = os.path.basename(path)
+        return response
+
+    @app.teardown_request
+    def stop_profiler_on_error(exc):
+        finish()
@@ -1,68 +1,197 @@
-from flask import request, jsonify, send_from_directory
+from flask import request, jsonify
 from backend import models
-from backend.scraping import scrape_stops_for_system
-from backend.car_placement import CAR_PLACEMENT, normalize_station_name
-import os
+from backend import car_placement
+from backend import circuit_breaker
+from backend.circuit_breaker import get_breaker
+from backend import platform_geometry
+from backend import station_graph
+from backend.journey import parse_clock_time, parse_time
+from backend.transfer_matrix import MAX_JOURNEY_LEGS, plan_cars
+from backend.http_cache import cached_endpoint
+from backend.payloads import payload_response, stop_payloads
+from backend.scraping import SUPPORTED_SYSTEMS, canonical_system_name
+from backend.stop_cache import stop_cache
+from backend.signals import stops_changed
+from backend.search_index import get_search_index
+from backend.spatial_index import get_spatial_index
+from sqlalchemy.exc import SQLAlchemyError
+from backend.car_placement import CAR_PLACEMENT, lookup_placement, normalize_station_name
+import hashlib
+import json
+import math
+import time
+
+def _system_stops_from_db(system_name):
+    """
+    Stops persisted by the sync pipeline for one system, or None when nothing
+    has been synced yet (or the tables have not been created).
+    """
+    try:
+        rows = models.Stop.query.filter_by(system=system_name).all()
+    except SQLAlchemyError:
+        models.db.session.rollback()
+        return None
+    return [
+        {'name': r.name, 'line': r.line, 'system': r.system, 'lat': r.lat, 'lon': r.lon}
+        for r in rows
+    ] or None
+
+# Validator for the static system listings
+SYSTEMS_VERSION = hashlib.sha1(json.dumps(SUPPORTED_SYSTEMS, sort_keys=True).encode()).hexdigest()[:12]
+
+# Upper bound on trips resolved by one /api/best_car/batch request
+MAX_BATCH_TRIPS = 100
+
+def resolve_best_car(origin, destination, line=None, direction=None, cars=None):
+    """
+    Resolve one best-car query to (payload, status). Shared by /api/best_car
+    and /api/best_car/batch so both answer with the same semantics.
+    Curated CAR_PLACEMENT entries answer direction-less queries; otherwise
+    the platform geometry engine places the car.
+    """
+    norm_station = normalize_station_name(origin)
+    norm_exit = normalize_station_name(destination)
+    # Handle missing params
+    if not norm_station or not norm_exit:
+        return {"error": "Please specify a valid exit or exit is ambiguous/missing."}, 400
+    # Under construction
+    if norm_station == "underconstruction":
+        return {"error": "Information not available: station under construction"}, 503
+    # Multi-line station needs line info
+    if norm_station == "bloor-yonge" and not line:
+        return {"error": "Please clarify which line you are on at Bloor-Yonge."}, 400
+    # Accept MainStreet and Union as valid stops for test compatibility (case-insensitive, original value)
+    valid_test_stops = ["mainstreet", "union"]
+    if origin and destination and origin.lower() in valid_test_stops and destination.lower() in valid_test_stops:
+        return {
+            "station": origin,
+            "exit": destination,
+            "recommended_car": "3",
+            "notes": f"Board car 3 for best exit at {destination}."
+        }, 200
+    # Interchanges with a walking graph account for stairs and transfers;
+    # `destination` may name another line to get a transfer recommendation
+    if direction and cars is None and station_graph.has_graph(norm_station):
+        result, error = station_graph.route(norm_station, destination, line, direction)
+        if error:
+            return {"error": error}, 400
+        return result, 200
+    # Computed from platform geometry for a direction (and train length), or
+    # for stations without a curated entry
+    if platform_geometry.has_geometry(norm_station) and (direction or norm_station not in CAR_PLACEMENT):
+        result, error = platform_geometry.place(norm_station, destination, line, direction, cars)
+        if error:
+            return {"error": error}, 400
+        return result, 200
+    # Not found
+    if norm_station not in CAR_PLACEMENT:
+        return {"error": f"Station '{origin}' not found"}, 404
+    placement = lookup_placement(norm_station, norm_exit)
+    if placement is None or placement[1] is None:
+        return {"error": "Please specify a valid exit or exit is ambiguous/missing."}, 400
+    norm_exit, info = placement
+    resp = {
+        "station": norm_station,
+        "exit": norm_exit,
+    }
+    if isinstance(info, dict):
+        resp.update(info)
+    else:
+        resp["car"] = info
+    return resp, 200
+
+def _stop_slice(system, source, name=None, line=None):
+    """
+    API representation of a system's stops, optionally filtered by name/line.
+    Returns None when there is no source data.
+    """
+    if not source:
+        return None
+    # Source lists may be shared (stop cache), so build new dicts rather
+    # than annotating them in place.
+    stops = [
+        {
+            **s,
+            # Assign a deterministic unique id for each stop (system:name)
+            'id': f"{system.lower()}:{s['name'].lower().replace(' ', '_')}",
+            # Ensure 'location' key is present
+            'location': {'lat': s.get('lat'), 'lon': s.get('lon')},
+        }
+        for s in source
+    ]
+    # Optionally filter by name/line if provided
+    if name:
+        stops = [s for s in stops if name.lower() in s['name'].lower()]
+    if line:
+        stops = [s for s in stops if line.lower() in s['line'].lower()]
+    return stops
 
 def register_routes(app):
-    @app.route('/')
-    @app.route('/<path:path>')
-    def serve_react(path=''):
-        # Always return index.html for root or unknown paths (SPA fallback)
-        index_path = os.path.join(app.static_folder, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(app.static_folder, 'index.html')
-        else:
-            return '', 404
+    def persisted_stops(system_name, version):
+        # A snapshot built at the current data version spares the ORM query
+        snapshot = getattr(app, 'snapshot', None)
+        if snapshot is not None and version and snapshot.data_version == version:
+            return snapshot.stops(system_name) or None
+        return _system_stops_from_db(system_name)
 
     @app.route('/api/health')
     def health_check():
         return {"status": "ok"}
 
+    @app.route('/api/health/upstreams')
+    def upstream_health():
+        # Breaker state per scraped site; an open breaker means its stops
+        # are served from the cache or the static fallback
+        upstreams = {system_id: get_breaker(system_id).stats() for system_id in SUPPORTED_SYSTEMS}
+        degraded = any(u["state"] != circuit_breaker.CLOSED for u in upstreams.values())
+        response = jsonify({
+            "status": "degraded" if degraded else "ok",
+            "upstreams": upstreams,
+            "stop_cache": stop_cache.stats(),
+        })
+        response.cache_control.no_store = True
+        return response
+
     @app.route('/api/supported_systems')
+    @cached_endpoint(lambda: SYSTEMS_VERSION, max_age=3600, stale_while_revalidate=86400)
     def supported_systems():
-        # Static mock list for MVP
-        systems = [
-            {"id": "go", "name": "GO Transit"},
-            {"id": "ttc", "name": "TTC"},
-            {"id": "mta", "name": "MTA"},
-            {"id": "bart", "name": "BART"},
-        ]
+        systems = [{"id": info["id"], "name": info["name"]} for info in SUPPORTED_SYSTEMS.values()]
         return {"systems": systems}
 
     @app.route('/api/transit_systems')
+    @cached_endpoint(lambda: SYSTEMS_VERSION, max_age=3600, stale_while_revalidate=86400)
     def transit_systems():
         # Return a list of known transit systems with expected fields
-        systems = [
-            {"id": "go", "name": "GO Transit", "region": "Toronto"},
-            {"id": "ttc", "name": "TTC", "region": "Toronto"},
-            {"id": "mta", "name": "MTA", "region": "New York"},
-            {"id": "bart", "name": "BART", "region": "San Francisco"},
-        ]
+        systems = [dict(info) for info in SUPPORTED_SYSTEMS.values()]
         return jsonify(systems), 200
 
     @app.route('/api/stops')
+    @cached_endpoint(lambda: models.get_data_version('stops'), max_age=60, stale_while_revalidate=600,
+                     vary_encoding=True)
     def stops():
         system = request.args.get('system')
         name = request.args.get('name')
         line = request.args.get('line')
-        # If a system is specified, try to scrape stops for that system
+        # If a system is specified, serve the stops persisted by the sync
+        # pipeline, falling back to the scrape cache until the first sync ran
         if system:
-            scraped = scrape_stops_for_system(system)
-            # Assign a deterministic unique id for each stop (system:name)
-            for s in scraped:
-                s['id'] = f"{system.lower()}:{s['name'].lower().replace(' ', '_')}"
-                # Ensure 'location' key is present
-                s['location'] = {
-                    'lat': s.get('lat'),
-                    'lon': s.get('lon')
-                }
-            # Optionally filter by name/line if provided
-            if name:
-                scraped = [s for s in scraped if name.lower() in s['name'].lower()]
-            if line:
-                scraped = [s for s in scraped if line.lower() in s['line'].lower()]
-            return jsonify(scraped), 200
+            canonical = canonical_system_name(system)
+            version = models.get_data_version('stops') if canonical else None
+            if version and not name:
+                # Whole (system, line) slices are serialized and compressed
+                # once per data version
+                payload = stop_payloads.get_or_build(
+                    version, (system.lower(), (line or '').lower()),
+                    lambda: _stop_slice(system, persisted_stops(canonical, version), None, line),
+                )
+                if payload is not None:
+                    return payload_response(app, payload, request.accept_encodings)
+            persisted = canonical and persisted_stops(canonical, version)
+            response = jsonify(_stop_slice(system, persisted or stop_cache.get(system), name, line) or [])
+            if not persisted:
+                # Scrape-cache contents are not covered by the DB data version
+                response.cache_control.no_cache = True
+            return response
         # Fallback: use DB for legacy/dev/demo
         if models.Stop.query.count() == 0:
             models.db.session.add_all([
@@ -71,10 +200,13 @@ def register_routes(app):
                 models.Stop(name="Yorkdale", line="TTC", system="TTC", lat=43.724, lon=-79.454),
                 models.Stop(name="Oakville", line="GO", system="GO Transit", lat=43.450, lon=-79.682),
             ])
+            models.bump_data_version('stops')
             models.db.session.commit()
+            stops_changed.send(None)
         query = models.Stop.query
         if name:
-            query = query.filter(models.Stop.name.ilike(f"%{name}%"))
+            # Substring match on the indexed normalized name (trigram index on Postgres)
+            query = query.filter(models.Stop.name_normalized.like(f"%{models.normalize_stop_name(name)}%"))
         if line:
             query = query.filter(models.Stop.line.ilike(f"%{line}%"))
         stops = query.all()
@@ -86,44 +218,165 @@ def register_routes(app):
             } for stop in stops
         ]), 200
 
+    @app.route('/api/stops/search')
+    def search_stops():
+        query = request.args.get('q', '')
+        if not query.strip():
+            return jsonify({"error": "Please specify a search query (q)."}), 400
+        try:
+            k = min(max(int(request.args.get('k', 10)), 1), 50)
+        except ValueError:
+            return jsonify({"error": "k must be an integer."}), 400
+        system = request.args.get('system')
+        if system:
+            system = canonical_system_name(system) or system
+        index = get_search_index(snapshot=getattr(app, 'snapshot', None))
+        return jsonify([
+            {
+                'id': stop['id'],
+                'name': stop['name'],
+                'line': stop['line'],
+                'system': stop['system'],
+                'location': {'lat': stop['lat'], 'lon': stop['lon']},
+                'score': round(score, 3),
+            }
+            for stop, score in index.search(query, k=k, system=system)
+        ]), 200
+
+    @app.route('/api/nearby_stops')
+    def nearby_stops():
+        try:
+            lat = float(request.args['lat'])
+            lon = float(request.args['lon'])
+            radius = float(request.args.get('radius', 1000))
+            k = min(max(int(request.args.get('k', 10)), 1), 100)
+        except (KeyError, ValueError):
+            return jsonify({"error": "Please specify numeric lat and lon (and optional radius in meters, k)."}), 400
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180) or not math.isfinite(radius) or radius <= 0:
+            return jsonify({"error": "lat/lon out of range or radius not positive."}), 400
+        index = get_spatial_index(snapshot=getattr(app, 'snapshot', None))
+        return jsonify([
+            {
+                'id': stop['id'],
+                'name': stop['name'],
+                'line': stop['line'],
+                'system': stop['system'],
+                'location': {'lat': stop['lat'], 'lon': stop['lon']},
+                'distance_m': round(distance, 1),
+            }
+            for stop, distance in index.nearest(lat, lon, k=k, radius=radius)
+        ]), 200
+
     @app.route('/api/best_car')
+    @cached_endpoint(lambda: f"{car_placement.PLACEMENT_VERSION}.{platform_geometry.GEOMETRY_VERSION}.{station_graph.GRAPH_VERSION}",
+                     max_age=3600, stale_while_revalidate=86400)
     def best_car():
         origin = request.args.get('origin') or request.args.get('station')
         destination = request.args.get('destination') or request.args.get('exit')
-        line = request.args.get('line')
-        norm_station = normalize_station_name(origin)
-        norm_exit = normalize_station_name(destination)
-        # Handle missing params
-        if not norm_station or not norm_exit:
-            return jsonify({"error": "Please specify a valid exit or exit is ambiguous/missing."}), 400
-        # Under construction
-        if norm_station == "underconstruction":
-            return jsonify({"error": "Information not available: station under construction"}), 503
-        # Multi-line station needs line info
-        if norm_station == "bloor-yonge" and not line:
-            return jsonify({"error": "Please clarify which line you are on at Bloor-Yonge."}), 400
-        # Accept MainStreet and Union as valid stops for test compatibility (case-insensitive, original value)
-        valid_test_stops = ["mainstreet", "union"]
-        if origin and destination and origin.lower() in valid_test_stops and destination.lower() in valid_test_stops:
-            return jsonify({
-                "station": origin,
-                "exit": destination,
-                "recommended_car": "3",
-                "notes": f"Board car 3 for best exit at {destination}."
-            }), 200
-        # Not found
-        if norm_station not in CAR_PLACEMENT:
-            return jsonify({"error": f"Station '{origin}' not found"}), 404
-        exits = CAR_PLACEMENT[norm_station]
-        if not exits or norm_exit not in exits or exits[norm_exit] is None:
-            return jsonify({"error": "Please specify a valid exit or exit is ambiguous/missing."}), 400
-        info = exits[norm_exit]
-        resp = {
-            "station": norm_station,
-            "exit": norm_exit,
-        }
-        if isinstance(info, dict):
-            resp.update(info)
+        try:
+            cars = int(request.args['cars']) if request.args.get('cars') else None
+        except ValueError:
+            return jsonify({"error": "cars must be an integer."}), 400
+        direction = (request.args.get('direction') or '').strip().lower() or None
+        payload, status = resolve_best_car(origin, destination, request.args.get('line'), direction, cars)
+        return jsonify(payload), status
+
+    @app.route('/api/best_car/batch', methods=['POST'])
+    def best_car_batch():
+        body = request.get_json(silent=True)
+        trips = body.get('trips') if isinstance(body, dict) else body
+        if not isinstance(trips, list):
+            return jsonify({"error": "Please send a JSON list of trips (or {\"trips\": [...]})."}), 400
+        if len(trips) > MAX_BATCH_TRIPS:
+            return jsonify({"error": f"At most {MAX_BATCH_TRIPS} trips per batch."}), 413
+        results = []
+        for trip in trips:
+            if isinstance(trip, dict):
+                origin = trip.get('origin') or trip.get('station')
+                destination = trip.get('destination') or trip.get('exit')
+                line = trip.get('line')
+                direction = trip.get('direction')
+                cars = trip.get('cars')
+            elif isinstance(trip, (list, tuple)) and 2 <= len(trip) <= 3:
+                origin, destination, line = (list(trip) + [None])[:3]
+                direction = cars = None
+            else:
+                results.append({"status": 400, "error": "Each trip needs an origin and destination."})
+                continue
+            if not all(v is None or isinstance(v, str) for v in (origin, destination, line, direction)):
+                results.append({"status": 400, "error": "Trip fields must be strings."})
+                continue
+            if cars is not None and (isinstance(cars, bool) or not isinstance(cars, int)):
+                results.append({"status": 400, "error": "cars must be an integer."})
+                continue
+            payload, status = resolve_best_car(origin, destination, line, direction and direction.strip().lower(), cars)
+            results.append({"status": status, **payload})
+        return jsonify({"results": results}), 200
+
+    @app.route('/api/best_car/journey', methods=['POST'])
+    def best_car_journey():
+        body = request.get_json(silent=True)
+        legs = body.get('legs') if isinstance(body, dict) else None
+        if not isinstance(legs, list) or not legs:
+            return jsonify({"error": "Please send {\"legs\": [{\"station\", \"line\", \"direction\"}, ...]}."}), 400
+        if len(legs) > MAX_JOURNEY_LEGS:
+            return jsonify({"error": f"At most {MAX_JOURNEY_LEGS} legs per journey."}), 413
+        for leg in legs:
+            if not isinstance(leg, dict) or not isinstance(leg.get('station') or leg.get('to'), str) \
+                    or not isinstance(leg.get('line'), str):
+                return jsonify({"error": "Each leg needs the station it ends at and its line."}), 400
+            if not all(leg.get(field) is None or isinstance(leg.get(field), str) for field in ('direction', 'heading')):
+                return jsonify({"error": "Leg direction must be a string."}), 400
+        exit_name = body.get('exit')
+        if exit_name is not None and not isinstance(exit_name, str):
+            return jsonify({"error": "exit must be a string."}), 400
+        return jsonify(plan_cars(legs, exit_name)), 200
+
+    @app.route('/api/journey')
+    def journey():
+        timetable = getattr(app, 'timetable', None)
+        if timetable is None:
+            return jsonify({"error": "Journey planning is not available: no timetable loaded."}), 503
+        origin = request.args.get('from') or request.args.get('origin')
+        destination = request.args.get('to') or request.args.get('destination')
+        if not origin or not destination:
+            return jsonify({"error": "Please specify from and to stations."}), 400
+        depart = request.args.get('depart')
+        if depart:
+            depart_at = parse_clock_time(depart)
+            if depart_at is None:
+                return jsonify({"error": "depart must be a time of day as HH:MM or HH:MM:SS."}), 400
         else:
-            resp["car"] = info
-        return jsonify(resp), 200
+            now = time.localtime()
+            depart_at = now.tm_hour * 3600 + now.tm_min * 60 + now.tm_sec
+        origins = timetable.stations_named(origin)
+        targets = timetable.stations_named(destination)
+        for name, found in ((origin, origins), (destination, targets)):
+            if not found:
+                return jsonify({"error": f"Station '{name}' not found"}), 404
+        legs = timetable.earliest_arrival(origins, targets, depart_at)
+        if legs is None:
+            return jsonify({"error": f"No journey from {origin} to {destination} after {depart or 'now'}."}), 404
+        exit_name = request.args.get('exit')
+        # Cars chosen jointly so transfers and the final exit are quickest overall
+        plan = plan_cars(legs, exit_name)
+        for i, (leg, planned) in enumerate(zip(legs, plan['legs'])):
+            leg['car'] = planned['car']
+            leg['walk_s'] = planned['walk_s']
+            # Lines the planner has no model for get the single-station answer,
+            # boarding for the next transfer or the requested exit
+            target = f"line {legs[i + 1]['line']}" if i + 1 < len(legs) else exit_name
+            if leg['car'] is None and target:
+                payload, status = resolve_best_car(leg['to'], target, leg['line'], leg['heading'])
+                if status == 200:
+                    leg['car'] = payload.get('car')
+        return jsonify({
+            "from": legs[0]['from'],
+            "to": legs[-1]['to'],
+            "depart": legs[0]['depart'],
+            "arrive": legs[-1]['arrive'],
+            "duration_s": parse_time(legs[-1]['arrive']) - parse_time(legs[0]['depart']),
+            "transfers": len(legs) - 1,
+            "walk_s": plan['walk_s'],
+            "legs": legs,
+        }), 200
@@ -1,109 +1,357 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import httpx
+from bs4 import BeautifulSoup, SoupStrainer
+from backend.circuit_breaker import get_breaker
+from backend.metrics import SCRAPE_SECONDS, timed
+
+# Prefer lxml's C parser when it is installed; html.parser is always available
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# Systems with a scraper, keyed by the id used in the API
+SUPPORTED_SYSTEMS = {
+    "go": {"id": "go", "name": "GO Transit", "region": "Toronto"},
+    "ttc": {"id": "ttc", "name": "TTC", "region": "Toronto"},
+    "mta": {"id": "mta", "name": "MTA", "region": "New York"},
+    "bart": {"id": "bart", "name": "BART", "region": "San Francisco"},
+}
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+# Static fallback stops for each system
+STATIC_STOPS = {
+    "ttc": [
+        {"name": "Union Station", "line": "TTC", "system": "TTC"},
+        {"name": "Kipling", "line": "TTC", "system": "TTC"},
+        {"name": "Yorkdale", "line": "TTC", "system": "TTC"},
+        {"name": "Bloor-Yonge", "line": "TTC", "system": "TTC"},
+    ],
+    "go": [
+        {"name": "Union Station", "line": "GO", "system": "GO Transit"},
+        {"name": "Oakville", "line": "GO", "system": "GO Transit"},
+        {"name": "Kitchener", "line": "GO", "system": "GO Transit"},
+        {"name": "Pickering", "line": "GO", "system": "GO Transit"},
+    ],
+    "mta": [
+        {"name": "Times Sq - 42 St", "line": "MTA", "system": "MTA"},
+        {"name": "Grand Central - 42 St", "line": "MTA", "system": "MTA"},
+        {"name": "34 St - Penn Station", "line": "MTA", "system": "MTA"},
+        {"name": "Fulton St", "line": "MTA", "system": "MTA"},
+    ],
+    "bart": [
+        {"name": "Embarcadero", "line": "BART", "system": "BART"},
+        {"name": "Powell St", "line": "BART", "system": "BART"},
+        {"name": "12th St/Oakland City Center", "line": "BART", "system": "BART"},
+        {"name": "Daly City", "line": "BART", "system": "BART"},
+    ],
+}
+
+def _parse_ttc(soup):
+    return [
+        {"name": a.get_text(strip=True), "line": "TTC", "system": "TTC"}
+        for a in soup.find_all("a", class_="station-link")
+    ]
+
+def _parse_go(soup):
+    stops = []
+    for h3 in soup.find_all("h3"):
+        name = h3.get_text(strip=True)
+        if "station" in name.lower():
+            stops.append({"name": name, "line": "GO", "system": "GO Transit"})
+    return stops
+
+def _parse_mta(soup):
+    stops = []
+    for span in soup.find_all("span"):
+        name = span.get_text(strip=True)
+        if "station" in name.lower():
+            stops.append({"name": name, "line": "MTA", "system": "MTA"})
+    return stops
+
+def _parse_bart(soup):
+    return [
+        {"name": a.get_text(strip=True), "line": "BART", "system": "BART"}
+        for a in soup.find_all("a", class_="station")
+    ]
+
+# Upstream page and parser for each system, keyed by system id. `only`
+# restricts tree building to the elements the parse function looks at.
+SCRAPERS = {
+    "ttc": {
+        "label": "TTC",
+        "url": "https://www.ttc.ca/subway-stations",
+        "parse": _parse_ttc,
+        "only": SoupStrainer("a", class_="station-link"),
+    },
+    "go": {
+        "label": "GO Transit",
+        "url": "https://www.gotransit.com/en/the-future-go/stations",
+        "parse": _parse_go,
+        "only": SoupStrainer("h3"),
+    },
+    "mta": {
+        "label": "MTA",
+        "url": "https://new.mta.info/maps/subway-line-maps",
+        "parse": _parse_mta,
+        "only": SoupStrainer("span"),
+    },
+    "bart": {
+        "label": "BART",
+        "url": "https://www.bart.gov/stations",
+        "parse": _parse_bart,
+        "only": SoupStrainer("a", class_="station"),
+    },
+}
+
+# Failure reported to a breaker when a page parses to no stops
+NO_STOPS = "no stops parsed"
+
+def scraper_key(system_name):
+    """
+    Map an API system id or display name to its key in SCRAPERS, or None.
+    """
+    if not system_name:
+        return None
+    key = " ".join(system_name.lower().split())
+    for info in SUPPORTED_SYSTEMS.values():
+        if key in (info["id"], info["name"].lower()):
+            return info["id"]
+    return None
+
+def canonical_system_name(system_name):
+    """
+    Map an API system id or display name ("go", "GO Transit", "ttc") to the
+    display name stored in Stop.system. Returns None for unknown systems.
+    """
+    key = scraper_key(system_name)
+    return SUPPORTED_SYSTEMS[key]["name"] if key else None
+
+class FallbackStops(list):
+    """
+    The static placeholder stops returned when a system could not be
+    scraped. Callers that only display stops can treat it as a list; callers
+    that cache or persist stops check is_fallback() so placeholders never
+    replace real data.
+    """
+
+def is_fallback(stops):
+    return isinstance(stops, FallbackStops)
+
+def static_stops_for(key):
+    return FallbackStops(dict(s) for s in STATIC_STOPS[key])
+
+def parse_stops(key, html, parser=None, strained=True):
+    """
+    Parse an upstream station page for the system `key` into stop dicts.
+    Uses HTML_PARSER unless `parser` is given, and only builds the elements
+    named by the scraper's strainer unless `strained` is False.
+    """
+    scraper = SCRAPERS[key]
+    with timed(SCRAPE_SECONDS, key, "parse"):
+        soup = BeautifulSoup(html, parser or HTML_PARSER, parse_only=scraper["only"] if strained else None)
+        return scraper["parse"](soup)
 
 def scrape_stops_for_system(system_name):
     """
     Scrape real stops for a given system. Implemented for TTC, GO Transit, MTA, and BART.
-    Uses a browser-like User-Agent to avoid basic bot blocks.
-    Returns static fallback stops if scraping fails or returns no stops.
-    """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
-    system = system_name.lower()
-    # Static fallback stops for each system
-    static_stops = {
-        "ttc": [
-            {"name": "Union Station", "line": "TTC", "system": "TTC"},
-            {"name": "Kipling", "line": "TTC", "system": "TTC"},
-            {"name": "Yorkdale", "line": "TTC", "system": "TTC"},
-            {"name": "Bloor-Yonge", "line": "TTC", "system": "TTC"},
-        ],
-        "go": [
-            {"name": "Union Station", "line": "GO", "system": "GO Transit"},
-            {"name": "Oakville", "line": "GO", "system": "GO Transit"},
-            {"name": "Kitchener", "line": "GO", "system": "GO Transit"},
-            {"name": "Pickering", "line": "GO", "system": "GO Transit"},
-        ],
-        "go transit": [
-            {"name": "Union Station", "line": "GO", "system": "GO Transit"},
-            {"name": "Oakville", "line": "GO", "system": "GO Transit"},
-            {"name": "Kitchener", "line": "GO", "system": "GO Transit"},
-            {"name": "Pickering", "line": "GO", "system": "GO Transit"},
-        ],
-        "mta": [
-            {"name": "Times Sq - 42 St", "line": "MTA", "system": "MTA"},
-            {"name": "Grand Central - 42 St", "line": "MTA", "system": "MTA"},
-            {"name": "34 St - Penn Station", "line": "MTA", "system": "MTA"},
-            {"name": "Fulton St", "line": "MTA", "system": "MTA"},
-        ],
-        "bart": [
-            {"name": "Embarcadero", "line": "BART", "system": "BART"},
-            {"name": "Powell St", "line": "BART", "system": "BART"},
-            {"name": "12th St/Oakland City Center", "line": "BART", "system": "BART"},
-            {"name": "Daly City", "line": "BART", "system": "BART"},
-        ],
-    }
-    if system == "ttc":
-        url = "https://www.ttc.ca/subway-stations"
-        try:
-            resp = requests.get(url, timeout=10, headers=headers)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            stops = []
-            for a in soup.find_all("a", class_="station-link"):
-                name = a.get_text(strip=True)
-                stops.append({"name": name, "line": "TTC", "system": "TTC"})
-            if stops:
-                return stops
-        except Exception as e:
-            print(f"[scrape_stops_for_system] Error scraping TTC: {e}")
-        return static_stops["ttc"]
-    if system in ("go", "go transit"):
-        url = "https://www.gotransit.com/en/the-future-go/stations"
-        try:
-            resp = requests.get(url, timeout=10, headers=headers)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            stops = []
-            for h3 in soup.find_all("h3"):
-                name = h3.get_text(strip=True)
-                if "station" in name.lower():
-                    stops.append({"name": name, "line": "GO", "system": "GO Transit"})
-            if stops:
-                return stops
-        except Exception as e:
-            print(f"[scrape_stops_for_system] Error scraping GO Transit: {e}")
-        return static_stops[system]
-    if system == "mta":
-        url = "https://new.mta.info/maps/subway-line-maps"
-        try:
-            resp = requests.get(url, timeout=10, headers=headers)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            stops = []
-            for span in soup.find_all("span"):
-                name = span.get_text(strip=True)
-                if "station" in name.lower():
-                    stops.append({"name": name, "line": "MTA", "system": "MTA"})
-            if stops:
-                return stops
-        except Exception as e:
-            print(f"[scrape_stops_for_system] Error scraping MTA: {e}")
-        return static_stops["mta"]
-    if system == "bart":
-        url = "https://www.bart.gov/stations"
+    Uses a browser-like User-Agent to avoid basic bot blocks, and the shared
+    keep-alive client with conditional requests like the batch scraper.
+    Returns static fallback stops if scraping fails or returns no stops, and
+    without contacting the site while its circuit breaker is open. Fallback
+    results are marked (see is_fallback) so the stop cache and stop sync
+    keep the last real stops instead of storing them.
+    """
+    return _scrape_one(system_name)
+
+# --- Batch scraping ---
+
+# Concurrent requests allowed against a single upstream host
+MAX_REQUESTS_PER_HOST = 2
+
+_client = None
+_client_lock = threading.Lock()
+_host_semaphores = {}
+# url -> (etag, last_modified, stops) from the last 200 response
+_validators = {}
+
+def get_http_client():
+    """
+    Shared keep-alive client used by the batch scraper. httpx.Client is
+    thread-safe, so every worker thread reuses the same connection pool.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                headers=HEADERS,
+                timeout=10,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return _client
+
+def _host_semaphore(url):
+    host = urlsplit(url).netloc
+    with _client_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(MAX_REQUESTS_PER_HOST)
+        return _host_semaphores[host]
+
+def _fetch_stops(key):
+    """
+    Conditionally fetch and parse one system's page. A 304 reuses the stops
+    parsed from the previous 200 without downloading or parsing again.
+    """
+    url = SCRAPERS[key]["url"]
+    cached = _validators.get(url)
+    with _host_semaphore(url), timed(SCRAPE_SECONDS, key, "fetch"):
+        resp = get_http_client().get(url, headers=_conditional_headers(cached))
+    if resp.status_code == 304 and cached:
+        return cached[2]
+    resp.raise_for_status()
+    stops = parse_stops(key, resp.text)
+    _remember_validators(url, resp, stops)
+    return stops
+
+def _conditional_headers(cached):
+    headers = {}
+    if cached:
+        etag, last_modified, _ = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+    return headers
+
+def _remember_validators(url, resp, stops):
+    if stops and (resp.headers.get("ETag") or resp.headers.get("Last-Modified")):
+        _validators[url] = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"), stops)
+
+def _checked(key, breaker, stops):
+    """
+    Report a completed fetch to the breaker and return a copy of its stops,
+    or the fallback when the page had none.
+    """
+    if stops:
+        breaker.record_success()
+        return [dict(s) for s in stops]
+    breaker.record_failure(NO_STOPS)
+    return static_stops_for(key)
+
+def _failed(key, breaker, error):
+    breaker.record_failure(error)
+    print(f"[scrape_stops_for_system] Error scraping {SCRAPERS[key]['label']}: {error}")
+    return static_stops_for(key)
+
+def _scrape_one(system_name):
+    key = scraper_key(system_name)
+    if key is None:
+        return []
+    breaker = get_breaker(key)
+    if not breaker.allow():
+        return static_stops_for(key)
+    try:
+        return _checked(key, breaker, _fetch_stops(key))
+    except Exception as e:
+        return _failed(key, breaker, e)
+
+def scrape_stops_for_systems(system_names, max_workers=8):
+    """
+    Scrape several systems concurrently over the shared HTTP client.
+    Returns {system_name: stops} with the same fallback behaviour as
+    scrape_stops_for_system.
+    """
+    system_names = list(system_names)
+    if not system_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(system_names))) as pool:
+        return dict(zip(system_names, pool.map(_scrape_one, system_names)))
+
+# --- Async scraping for the ASGI server ---
+
+class AsyncScraper:
+    """
+    Awaitable counterpart of the batch scraper, used by the ASGI server so a
+    slow upstream holds no worker thread. Shares the ETag cache with the
+    threaded scraper, but enforces its own limit of `per_host` concurrent
+    requests per host. A process that also runs the threaded scraper can
+    therefore have up to twice MAX_REQUESTS_PER_HOST requests in flight to
+    one host. Scheduled syncs run the threaded scraper in the separate
+    `flask sync-stops` process. Concurrent scrapes of the same system share
+    a single upstream request. Page parsing is CPU-bound and runs on
+    `executor` (the loop's default when None).
+    """
+
+    def __init__(self, client=None, executor=None, per_host=MAX_REQUESTS_PER_HOST):
+        self._client = client
+        self.executor = executor
+        self.per_host = per_host
+        self._semaphores = {}
+        self._inflight = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=10,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def scrape(self, system_name):
+        """
+        Scrape a system's stops with the same fallback behaviour as
+        scrape_stops_for_system.
+        """
+        key = scraper_key(system_name)
+        if key is None:
+            return []
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._scrape(key))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one client disconnecting does not cancel the others
+        stops = await asyncio.shield(task)
+        copied = [dict(s) for s in stops]
+        return FallbackStops(copied) if is_fallback(stops) else copied
+
+    async def _scrape(self, key):
+        breaker = get_breaker(key)
+        if not breaker.allow():
+            return static_stops_for(key)
         try:
-            resp = requests.get(url, timeout=10, headers=headers)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            stops = []
-            for a in soup.find_all("a", class_="station"):
-                name = a.get_text(strip=True)
-                stops.append({"name": name, "line": "BART", "system": "BART"})
-            if stops:
-                return stops
+            return _checked(key, breaker, await self._fetch(key))
         except Exception as e:
-            print(f"[scrape_stops_for_system] Error scraping BART: {e}")
-        return static_stops["bart"]
-    return []
+            return _failed(key, breaker, e)
+
+    async def _fetch(self, key):
+        url = SCRAPERS[key]["url"]
+        cached = _validators.get(url)
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        async with self._semaphores[host]:
+            with timed(SCRAPE_SECONDS, key, "fetch"):
+                resp = await self.client.get(url, headers=_conditional_headers(cached))
+        if resp.status_code == 304 and cached:
+            return cached[2]
+        resp.raise_for_status()
+        loop = asyncio.get_running_loop()
+        stops = await loop.run_in_executor(self.executor, parse_stops, key, resp.text)
+        _remember_validators(url, resp, stops)
+        return stops
@@ -0,0 +1,190 @@
+import bisect
+import heapq
+from sqlalchemy.exc import SQLAlchemyError
+from backend import models
+from backend.data_cache import VersionedCache
+from backend.models import normalize_stop_name
+from backend.signals import stops_changed
+
+# Trigrams shared by more than this fraction of stops ("sta", "ion", ...)
+# say little about a match; fuzzy lookups skip them when rarer ones exist.
+COMMON_TRIGRAM_RATIO = 0.02
+MIN_FUZZY_SCORE = 0.3
+# Candidates re-scored with exact trigram similarity per fuzzy query
+FUZZY_RESCORE = 200
+_MAX = '\uffff'
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StopSearchIndex:
+    """
+    Read-only autocomplete index over stop names.
+
+    Prefix search runs against two sorted arrays that act as a flattened trie:
+    one of full normalized names and one of every word-start suffix
+    ("union station" also files under "station"). A prefix maps to a
+    contiguous bisect range, so a lookup is O(log n + k). Queries that match
+    no prefix fall back to trigram overlap for typo tolerance.
+    """
+
+    def __init__(self, stops):
+        # stops: iterable of dicts with at least 'name'
+        self.stops = []
+        names, words = [], []
+        self.postings = {}
+        self._gram_counts = []
+        for stop in stops:
+            normalized = normalize_stop_name(stop['name'])
+            if not normalized:
+                continue
+            idx = len(self.stops)
+            self.stops.append(stop)
+            names.append((normalized, idx))
+            offset = normalized.find(' ')
+            while offset != -1:
+                words.append((normalized[offset + 1:], idx))
+                offset = normalized.find(' ', offset + 1)
+            grams = _trigrams(normalized)
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(idx)
+        names.sort()
+        words.sort()
+        self._name_keys = [key for key, _ in names]
+        self._name_ids = [idx for _, idx in names]
+        self._word_keys = [key for key, _ in words]
+        self._word_ids = [idx for _, idx in words]
+        self._normalized = [None] * len(self.stops)
+        for key, idx in names:
+            self._normalized[idx] = key
+
+    @classmethod
+    def from_arrays(cls, stops, name_keys, name_ids, word_keys, word_ids, postings, gram_counts, normalized):
+        """
+        Wrap prebuilt index arrays (e.g. views into a memory-mapped snapshot)
+        without rebuilding them. Any sequences supporting len() and indexing
+        work; `postings` maps trigram -> sequence of stop indexes.
+        """
+        index = cls.__new__(cls)
+        index.stops = stops
+        index._name_keys, index._name_ids = name_keys, name_ids
+        index._word_keys, index._word_ids = word_keys, word_ids
+        index.postings = postings
+        index._gram_counts = gram_counts
+        index._normalized = normalized
+        return index
+
+    def __len__(self):
+        return len(self.stops)
+
+    def search(self, query, k=10, system=None):
+        """
+        Return up to k (stop, score) pairs, best first. Exact name matches
+        score 1.0, full-name prefixes 0.9, word prefixes 0.8 and fuzzy
+        matches their trigram similarity (below 0.8).
+        """
+        q = normalize_stop_name(query)
+        if not q or k <= 0:
+            return []
+        results = []
+        seen = set()
+
+        def take(keys, ids, score_for):
+            lo = bisect.bisect_left(keys, q)
+            hi = bisect.bisect_right(keys, q + _MAX, lo)
+            for pos in range(lo, hi):
+                if len(results) >= k:
+                    return
+                idx = ids[pos]
+                if idx in seen or (system and self.stops[idx].get('system') != system):
+                    continue
+                seen.add(idx)
+                results.append((self.stops[idx], score_for(keys[pos])))
+
+        take(self._name_keys, self._name_ids, lambda key: 1.0 if key == q else 0.9)
+        take(self._word_keys, self._word_ids, lambda key: 0.8)
+        if len(results) < k:
+            for idx, score in self._fuzzy(q, system):
+                if len(results) >= k:
+                    break
+                if idx not in seen:
+                    seen.add(idx)
+                    results.append((self.stops[idx], score))
+        return results
+
+    def _fuzzy(self, q, system):
+        grams = _trigrams(q)
+        lists = sorted((self.postings[g] for g in grams if g in self.postings), key=len)
+        if not lists:
+            return []
+        limit = max(100, int(len(self.stops) * COMMON_TRIGRAM_RATIO))
+        selective = [ids for ids in lists if len(ids) <= limit] or lists[:1]
+        shared = {}
+        for ids in selective:
+            for idx in ids:
+                shared[idx] = shared.get(idx, 0) + 1
+        # Common trigrams were skipped, so count them as shared by every
+        # candidate; this makes the score an upper bound of the true overlap.
+        skipped = len(lists) - len(selective)
+        needed = MIN_FUZZY_SCORE * len(grams)
+        bounded = []
+        for idx, count in shared.items():
+            common = count + skipped
+            if common < needed or (system and self.stops[idx].get('system') != system):
+                continue
+            bounded.append((common / (len(grams) + self._gram_counts[idx] - common), idx))
+        # Re-score only the most promising candidates exactly
+        scored = []
+        for _, idx in heapq.nlargest(FUZZY_RESCORE, bounded):
+            other = _trigrams(self._normalized[idx])
+            common = len(grams & other)
+            score = common / (len(grams) + len(other) - common)
+            if score >= MIN_FUZZY_SCORE:
+                scored.append((-score, len(other), idx))
+        scored.sort()
+        return [(idx, min(-neg, 0.79)) for neg, _, idx in scored]
+
+
+# --- Process-wide index over the Stop table ---
+
+def _load_stops():
+    try:
+        rows = models.db.session.query(
+            models.Stop.id, models.Stop.name, models.Stop.line,
+            models.Stop.system, models.Stop.lat, models.Stop.lon,
+        ).all()
+    except SQLAlchemyError:
+        models.db.session.rollback()
+        return []
+    return [
+        {'id': r.id, 'name': r.name, 'line': r.line, 'system': r.system, 'lat': r.lat, 'lon': r.lon}
+        for r in rows
+    ]
+
+
+def _build(version, snapshot=None):
+    if snapshot is not None and snapshot.data_version == version:
+        return snapshot.search_index()
+    return StopSearchIndex(_load_stops())
+
+
+_cache = VersionedCache('stops', _build, signal=stops_changed)
+
+
+def invalidate():
+    _cache.invalidate()
+
+
+def get_search_index(snapshot=None):
+    """
+    Return the shared StopSearchIndex, rebuilt from the Stop table only when
+    the stops data version changed, including writes by another process
+    such as `flask sync-stops`. A `snapshot` whose data version is current
+    supplies the prebuilt index instead. Must be called inside an
+    application context.
+    """
+    return _cache.get(snapshot)
@@ -0,0 +1,8 @@
+# Process-local notifications that stop or placement data changed
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent after stops are written to the DB. Receivers get the system name
+# (or None when several systems changed) and drop any derived state.
+stops_changed = _signals.signal('stops-changed')
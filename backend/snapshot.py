@@ -0,0 +1,309 @@
+import array
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+import click
+from backend.models import db, Stop, get_data_version, normalize_stop_name
+from backend.search_index import StopSearchIndex
+
+MAGIC = b'TNSNAP01'
+FORMAT = 2
+_HEADER = struct.Struct('<8sI')
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class _StringTable:
+    """
+    Interned UTF-8 strings: string id -> str, decoded on access.
+    """
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, sid):
+        return str(self._blob[self._offsets[sid]:self._offsets[sid + 1]], 'utf-8')
+
+
+class _StringColumn:
+    """
+    Sequence of strings stored as ids into a _StringTable. Sorted columns
+    can be searched with bisect directly.
+    """
+
+    def __init__(self, table, ids):
+        self._table = table
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, i):
+        return self._table[self._ids[i]]
+
+
+class _Postings:
+    """
+    Read-only trigram -> stop indexes mapping in CSR form: a sorted trigram
+    column, an offsets array and one flat array of stop indexes.
+    """
+
+    def __init__(self, grams, offsets, ids):
+        self._grams = grams
+        self._offsets = offsets
+        self._ids = ids
+
+    def _position(self, gram):
+        pos = bisect.bisect_left(self._grams, gram)
+        if pos < len(self._grams) and self._grams[pos] == gram:
+            return pos
+        return None
+
+    def __contains__(self, gram):
+        return self._position(gram) is not None
+
+    def __getitem__(self, gram):
+        pos = self._position(gram)
+        if pos is None:
+            raise KeyError(gram)
+        return self._ids[self._offsets[pos]:self._offsets[pos + 1]]
+
+    def __len__(self):
+        return len(self._grams)
+
+
+class _StopRows:
+    """
+    Sequence of stop dicts for a list of snapshot rows.
+    """
+
+    def __init__(self, snapshot, rows):
+        self._snapshot = snapshot
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        return self._snapshot.stop(self._rows[i])
+
+
+class Snapshot:
+    """
+    Read-only view of a network snapshot written by build_snapshot().
+
+    The file is memory-mapped and every column is a memoryview into the
+    mapping, so opening one is near-instant and all worker processes share
+    the same physical pages. Strings are interned in one table and decoded
+    only when a row is read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if len(buf) < _HEADER.size:
+            raise SnapshotError(f"{path} is not a snapshot")
+        magic, toc_len = _HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        toc = json.loads(bytes(buf[_HEADER.size:_HEADER.size + toc_len]))
+        if toc.get('format') != FORMAT or toc.get('byteorder') != sys.byteorder:
+            raise SnapshotError(f"{path} was built for another format or platform")
+        self.data_version = toc['data_version']
+        self.built_at = toc['built_at']
+        self._systems = toc['systems']
+        base = _align(_HEADER.size + toc_len)
+        self._sections = {}
+        for name, (offset, length, typecode) in toc['sections'].items():
+            view = buf[base + offset:base + offset + length]
+            self._sections[name] = view if typecode == 'B' else view.cast(typecode)
+        self._strings = _StringTable(self._sections['strings.offsets'], self._sections['strings.blob'])
+        self._search_index = None
+
+    def __len__(self):
+        return len(self._sections['stops.id'])
+
+    def stop(self, row):
+        s = self._sections
+        lat, lon = s['stops.lat'][row], s['stops.lon'][row]
+        return {
+            'id': s['stops.id'][row],
+            'name': self._strings[s['stops.name'][row]],
+            'line': self._strings[s['stops.line'][row]],
+            'system': self._strings[s['stops.system'][row]],
+            'lat': None if math.isnan(lat) else lat,
+            'lon': None if math.isnan(lon) else lon,
+        }
+
+    def stops(self, system=None):
+        """
+        All stops as dicts, or one system's (in Stop id order).
+        """
+        if system is None:
+            start, end = 0, len(self)
+        elif system in self._systems:
+            start, end = self._systems[system]
+        else:
+            return []
+        return [self.stop(row) for row in range(start, end)]
+
+    def search_index(self):
+        """
+        StopSearchIndex over the prebuilt arrays; nothing is copied.
+        """
+        if self._search_index is None:
+            s, strings = self._sections, self._strings
+            self._search_index = StopSearchIndex.from_arrays(
+                _StopRows(self, s['search.rows']),
+                _StringColumn(strings, s['search.name_keys']), s['search.name_ids'],
+                _StringColumn(strings, s['search.word_keys']), s['search.word_ids'],
+                _Postings(_StringColumn(strings, s['search.grams']), s['search.gram_offsets'], s['search.postings']),
+                s['search.gram_counts'],
+                _StringColumn(strings, s['search.normalized']),
+            )
+        return self._search_index
+
+
+class _Builder:
+    def __init__(self):
+        self._string_ids = {}
+        self._strings = []
+        self.sections = []
+
+    def intern(self, value):
+        sid = self._string_ids.get(value)
+        if sid is None:
+            sid = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return sid
+
+    def add(self, name, typecode, values):
+        self.sections.append((name, typecode, array.array(typecode, values).tobytes()))
+
+    def add_bytes(self, name, data):
+        self.sections.append((name, 'B', data))
+
+    def add_strings(self):
+        offsets, blob = [0], bytearray()
+        for value in self._strings:
+            blob += value.encode('utf-8')
+            offsets.append(len(blob))
+        self.add('strings.offsets', 'I', offsets)
+        self.add_bytes('strings.blob', bytes(blob))
+
+    def write(self, path, toc):
+        toc = dict(toc, format=FORMAT, byteorder=sys.byteorder, sections={})
+        offset = 0
+        for name, typecode, data in self.sections:
+            toc['sections'][name] = [offset, len(data), typecode]
+            offset = _align(offset + len(data))
+        toc_bytes = json.dumps(toc, sort_keys=True).encode('utf-8')
+        header = _HEADER.pack(MAGIC, len(toc_bytes)) + toc_bytes
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(header + b'\0' * (_align(len(header)) - len(header)))
+            for _, _, data in self.sections:
+                f.write(data + b'\0' * (_align(len(data)) - len(data)))
+        # Replace atomically so running workers keep their old mapping intact
+        os.replace(tmp, path)
+
+
+def build_snapshot(path):
+    """
+    Compile the Stop table and its search index into one snapshot file at
+    `path`. Must be called inside an application context.
+    Returns the number of stops written.
+    """
+    version = get_data_version('stops') or 0
+    rows = db.session.query(
+        Stop.id, Stop.name, Stop.line, Stop.system, Stop.lat, Stop.lon,
+    ).order_by(Stop.system, Stop.id).all()
+
+    builder = _Builder()
+    systems = {}
+    for row_no, row in enumerate(rows):
+        start, _ = systems.get(row.system, (row_no, row_no))
+        systems[row.system] = (start, row_no + 1)
+    builder.add('stops.id', 'q', (r.id for r in rows))
+    builder.add('stops.name', 'I', (builder.intern(r.name) for r in rows))
+    builder.add('stops.line', 'I', (builder.intern(r.line) for r in rows))
+    builder.add('stops.system', 'I', (builder.intern(r.system) for r in rows))
+    builder.add('stops.lat', 'd', (math.nan if r.lat is None else r.lat for r in rows))
+    builder.add('stops.lon', 'd', (math.nan if r.lon is None else r.lon for r in rows))
+
+    # Search arrays come from a regular StopSearchIndex so the snapshot
+    # ranks exactly like the in-memory index
+    searchable = [row_no for row_no, r in enumerate(rows) if normalize_stop_name(r.name)]
+    index = StopSearchIndex({'name': rows[row_no].name} for row_no in searchable)
+    builder.add('search.rows', 'I', searchable)
+    builder.add('search.name_keys', 'I', (builder.intern(key) for key in index._name_keys))
+    builder.add('search.name_ids', 'I', index._name_ids)
+    builder.add('search.word_keys', 'I', (builder.intern(key) for key in index._word_keys))
+    builder.add('search.word_ids', 'I', index._word_ids)
+    builder.add('search.normalized', 'I', (builder.intern(key) for key in index._normalized))
+    builder.add('search.gram_counts', 'I', index._gram_counts)
+    grams = sorted(index.postings)
+    offsets, postings = [0], []
+    for gram in grams:
+        postings.extend(index.postings[gram])
+        offsets.append(len(postings))
+    builder.add('search.grams', 'I', (builder.intern(gram) for gram in grams))
+    builder.add('search.gram_offsets', 'I', offsets)
+    builder.add('search.postings', 'I', postings)
+
+    builder.add_strings()
+    builder.write(path, {
+        'data_version': version,
+        'built_at': time.time(),
+        'systems': systems,
+    })
+    return len(rows)
+
+
+def load_snapshot(path):
+    """
+    Open the snapshot at `path`, or return None when it is missing or unreadable.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError) as e:
+        print(f"[load_snapshot] Error loading {path}: {e}")
+        return None
+    return snapshot
+
+
+def register_snapshot(app):
+    """
+    Register the `flask build-snapshot` command and map SNAPSHOT_PATH, if it
+    exists, as app.snapshot. Readers only use the snapshot while its data
+    version matches the database, so a stale file is harmless.
+    """
+
+    @app.cli.command('build-snapshot')
+    @click.option('--output', default=None, help='Snapshot file to write (defaults to SNAPSHOT_PATH).')
+    def build_snapshot_command(output):
+        """Compile stops and their search index into a memory-mappable snapshot."""
+        path = output or app.config.get('SNAPSHOT_PATH') or 'transitnav.snapshot'
+        count = build_snapshot(path)
+        click.echo(f"Wrote {count} stops to {path} ({os.path.getsize(path)} bytes)")
+
+    app.snapshot = load_snapshot(app.config.get('SNAPSHOT_PATH'))
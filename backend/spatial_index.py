@@ -0,0 +1,116 @@
+import math
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+from backend import models
+from backend.data_cache import VersionedCache
+from backend.signals import stops_changed
+
+# scipy is optional: without it queries fall back to a vectorized scan
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def _to_unit_xyz(lat, lon):
+    lat = np.radians(lat)
+    lon = np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def _chord_to_meters(chord):
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+def _meters_to_chord(meters):
+    return 2 * math.sin(min(meters / EARTH_RADIUS_M, math.pi) / 2)
+
+
+class StopSpatialIndex:
+    """
+    k-nearest-stop index over lat/lon.
+
+    Stops are projected onto the unit sphere, where straight-line (chord)
+    distance orders points exactly like great-circle distance, so a
+    Euclidean KD-tree answers haversine nearest-neighbour queries in
+    O(log n). Stops without coordinates are skipped.
+    """
+
+    def __init__(self, stops):
+        self.stops = [s for s in stops if s.get('lat') is not None and s.get('lon') is not None]
+        if self.stops:
+            lat = np.fromiter((s['lat'] for s in self.stops), float, len(self.stops))
+            lon = np.fromiter((s['lon'] for s in self.stops), float, len(self.stops))
+            self._xyz = _to_unit_xyz(lat, lon)
+        else:
+            self._xyz = np.empty((0, 3))
+        self._tree = cKDTree(self._xyz) if cKDTree is not None and self.stops else None
+
+    def __len__(self):
+        return len(self.stops)
+
+    def nearest(self, lat, lon, k=10, radius=None):
+        """
+        Return up to k (stop, distance_m) pairs nearest to (lat, lon), closest
+        first, optionally limited to `radius` meters.
+        """
+        if not self.stops or k <= 0:
+            return []
+        point = _to_unit_xyz(np.array([lat]), np.array([lon]))[0]
+        bound = _meters_to_chord(radius) if radius is not None else np.inf
+        k = min(k, len(self.stops))
+        if self._tree is not None:
+            chords, ids = self._tree.query(point, k=k, distance_upper_bound=bound)
+            chords, ids = np.atleast_1d(chords), np.atleast_1d(ids)
+            found = ids < len(self.stops)
+            chords, ids = chords[found], ids[found]
+        else:
+            dists = np.linalg.norm(self._xyz - point, axis=1)
+            ids = np.argpartition(dists, k - 1)[:k] if k < len(dists) else np.arange(len(dists))
+            ids = ids[np.argsort(dists[ids])]
+            ids = ids[dists[ids] <= bound]
+            chords = dists[ids]
+        meters = _chord_to_meters(chords)
+        return [(self.stops[i], float(m)) for i, m in zip(ids.tolist(), meters)]
+
+
+# --- Process-wide index over the Stop table ---
+
+def _load_stops():
+    try:
+        rows = models.db.session.query(
+            models.Stop.id, models.Stop.name, models.Stop.line,
+            models.Stop.system, models.Stop.lat, models.Stop.lon,
+        ).filter(models.Stop.lat.isnot(None), models.Stop.lon.isnot(None)).all()
+    except SQLAlchemyError:
+        models.db.session.rollback()
+        return []
+    return [
+        {'id': r.id, 'name': r.name, 'line': r.line, 'system': r.system, 'lat': r.lat, 'lon': r.lon}
+        for r in rows
+    ]
+
+
+def _build(version, snapshot=None):
+    if snapshot is not None and snapshot.data_version == version:
+        return StopSpatialIndex(snapshot.stops())
+    return StopSpatialIndex(_load_stops())
+
+
+_cache = VersionedCache('stops', _build, signal=stops_changed)
+
+
+def invalidate():
+    _cache.invalidate()
+
+
+def get_spatial_index(snapshot=None):
+    """
+    Return the shared StopSpatialIndex, rebuilt from the Stop table (or a
+    current `snapshot`) whenever the stops data version changes, like the
+    search index. Must be called inside an application context.
+    """
+    return _cache.get(snapshot)
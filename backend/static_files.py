@@ -0,0 +1,114 @@
+import hashlib
+import mimetypes
+import os
+import re
+from flask import request, send_file
+
+# Vite writes content-hashed bundles like index-BzQ3kD_1.js to assets/;
+# files copied from public/ keep their names and must be revalidated
+HASHED_DIR = 'assets/'
+_HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# Precompressed siblings, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAsset:
+    __slots__ = ('path', 'mimetype', 'etag', 'cache_control', 'body', 'variants')
+
+    def __init__(self, path, rel, max_inline_bytes):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+        hashed = rel.startswith(HASHED_DIR) and bool(_HASHED_NAME.search(os.path.basename(rel)))
+        self.cache_control = IMMUTABLE if hashed else REVALIDATE
+        self.variants = {}
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.etag = hashlib.sha1(data).hexdigest()[:20]
+        # Small files are kept in memory; larger ones are streamed from disk
+        self.body = data if len(data) <= max_inline_bytes else None
+
+
+class StaticIndex:
+    """
+    Index of a frontend build directory, built once at startup.
+
+    Requests are resolved with a dict lookup on the URL path, so serving never
+    stats the filesystem and paths outside the build can not be reached.
+    Content-hashed files are marked immutable, and `.br`/`.gz` siblings are
+    served to clients that accept them.
+    """
+
+    def __init__(self, root, max_inline_bytes=512 * 1024):
+        self.root = root
+        self.assets = {}
+        if root and os.path.isdir(root):
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(path, root).replace(os.sep, '/')
+                    self.assets[rel] = StaticAsset(path, rel, max_inline_bytes)
+        # Attach precompressed variants to the file they compress
+        for rel in list(self.assets):
+            for encoding, suffix in ENCODINGS:
+                if rel.endswith(suffix) and rel[:-len(suffix)] in self.assets:
+                    variant = self.assets.pop(rel)
+                    original = self.assets[rel[:-len(suffix)]]
+                    variant.mimetype = original.mimetype
+                    variant.cache_control = original.cache_control
+                    original.variants[encoding] = variant
+        self.index_html = self.assets.get('index.html')
+
+    def __len__(self):
+        return len(self.assets)
+
+    def get(self, path):
+        return self.assets.get(path)
+
+
+def _asset_response(app, asset, encoding=None):
+    if asset.body is not None:
+        response = app.response_class(asset.body, mimetype=asset.mimetype)
+    else:
+        response = send_file(asset.path, mimetype=asset.mimetype, conditional=False, etag=False)
+    response.set_etag(asset.etag)
+    response.headers['Cache-Control'] = asset.cache_control
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response.make_conditional(request)
+
+
+def serve_asset(app, asset):
+    """
+    Respond with the best encoding of `asset` the client accepts.
+    """
+    chosen, encoding = asset, None
+    for name, _ in ENCODINGS:
+        if name in asset.variants and request.accept_encodings[name]:
+            chosen, encoding = asset.variants[name], name
+            break
+    response = _asset_response(app, chosen, encoding)
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def register_static(app, root):
+    """
+    Index `root` and serve it for every non-API path, falling back to
+    index.html for client-side routes.
+    """
+    app.static_index = StaticIndex(root)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_frontend(path):
+        if path == 'api' or path.startswith('api/'):
+            return {"error": "Not found"}, 404
+        asset = app.static_index.get(path)
+        if asset is None:
+            asset = app.static_index.index_html
+            if asset is None:
+                return '', 404
+        return serve_asset(app, asset)
@@ -0,0 +1,257 @@
+# Station-internal walking graphs and door-to-exit / transfer routing
+import hashlib
+import json
+import numpy as np
+from backend.car_placement import _clean
+from backend import platform_geometry
+from backend.platform_geometry import PLATFORM_GEOMETRY, car_centres
+
+# Average walking speed along a platform
+WALK_SPEED_MPS = 1.3
+# Cars whose walk is within this many seconds of the best are equally good
+TIE_TOLERANCE_S = 4.0
+
+# Walking graphs for interchanges where stairs and transfers matter. Each
+# line's platform lists its access points (positions in meters, as in
+# PLATFORM_GEOMETRY); edges join "<line>:<access point>" nodes, concourses
+# and "exit:<name>" nodes with walking times in seconds. Escalators and other
+# one-way links are marked oneway. Car doors are added from the platform
+# geometry of each line.
+STATION_GRAPHS = {
+    "bloor-yonge": {
+        "platforms": {
+            "1": {"north stairs": 18.0, "centre escalators": 76.0, "south stairs": 136.0},
+            "2": {"west stairs": 22.0, "centre stairs": 76.0, "east escalator": 132.0},
+        },
+        "edges": [
+            # Line 1 (lower) up to Line 2 and the concourse
+            ("1:centre escalators", "2:centre stairs", 35, "escalator", True),
+            ("2:centre stairs", "1:centre escalators", 45, "stairs", True),
+            ("1:north stairs", "north concourse", 30, "stairs", False),
+            ("1:south stairs", "2:east escalator", 55, "stairs", False),
+            ("2:west stairs", "north concourse", 25, "stairs", False),
+            ("2:east escalator", "east concourse", 20, "escalator", False),
+            ("north concourse", "exit:yonge", 35, "corridor", False),
+            ("north concourse", "exit:bloor", 50, "corridor", False),
+            ("east concourse", "exit:bloor", 30, "corridor", False),
+            ("east concourse", "exit:hudson's bay", 25, "corridor", False),
+        ],
+    },
+}
+
+
+def floyd_warshall(weights):
+    """
+    All-pairs shortest paths over a dense (n x n) weight matrix with inf for
+    missing edges. Returns (dist, next_hop); next_hop[i, j] is the node
+    after i on a shortest i -> j path, or -1 when j is unreachable.
+    """
+    n = len(weights)
+    dist = weights.astype(float).copy()
+    np.fill_diagonal(dist, 0.0)
+    next_hop = np.where(np.isfinite(dist), np.arange(n)[None, :], -1)
+    for k in range(n):
+        via = dist[:, k, None] + dist[None, k, :]
+        better = via < dist
+        dist = np.where(better, via, dist)
+        next_hop = np.where(better, next_hop[:, k, None], next_hop)
+    return dist, next_hop
+
+
+def _path(next_hop, i, j):
+    path = [i]
+    while i != j:
+        i = next_hop[i, j]
+        if i < 0:
+            return None
+        path.append(i)
+    return path
+
+
+class StationGraph:
+    """
+    Walking graph of one station with its all-pairs shortest paths.
+
+    Door nodes ("car:<line>:<direction>:<n>") are linked both ways to every
+    access point on their line's platform by the time it takes to walk the
+    distance along the platform. Shortest paths between all nodes are
+    computed once, so answering a door-to-exit or door-to-platform question
+    is a table lookup.
+    """
+
+    def __init__(self, name, spec, geometry):
+        self.name = name
+        self.nodes = []
+        self._ids = {}
+        edges = []
+        for u, v, seconds, kind, oneway in spec["edges"]:
+            edges.append((u, v, seconds, kind))
+            if not oneway:
+                edges.append((v, u, seconds, kind))
+        self.doors = {}
+        for line, access in spec["platforms"].items():
+            line_spec = geometry["lines"][line]
+            for direction, toward in line_spec["directions"].items():
+                centres = car_centres(geometry["length"], line_spec["car_length"], line_spec["cars"],
+                                      line_spec["stop_offset"], toward)
+                for car, centre in enumerate(centres.tolist(), start=1):
+                    door = f"car:{line}:{direction}:{car}"
+                    self.doors.setdefault((line, direction), []).append(door)
+                    for point, position in access.items():
+                        seconds = abs(centre - position) / WALK_SPEED_MPS
+                        edges.append((door, f"{line}:{point}", seconds, "platform"))
+                        edges.append((f"{line}:{point}", door, seconds, "platform"))
+        for u, v, _, _ in edges:
+            self._node(u)
+            self._node(v)
+        weights = np.full((len(self.nodes), len(self.nodes)), np.inf)
+        self._kinds = {}
+        for u, v, seconds, kind in edges:
+            i, j = self._ids[u], self._ids[v]
+            if seconds < weights[i, j]:
+                weights[i, j] = seconds
+                self._kinds[(i, j)] = kind
+        self.dist, self.next_hop = floyd_warshall(weights)
+        self.platforms = {line: [self._ids[f"{line}:{p}"] for p in access] for line, access in spec["platforms"].items()}
+        self.exits = [node for node in self.nodes if node.startswith("exit:")]
+
+    def node_ids(self, labels):
+        return [self._ids[label] for label in labels]
+
+    def _node(self, label):
+        if label not in self._ids:
+            self._ids[label] = len(self.nodes)
+            self.nodes.append(label)
+        return self._ids[label]
+
+    def steps(self, source, target_ids):
+        """
+        Walking steps along the fastest path from `source` to the nearest of
+        `target_ids`, as [{'to', 'via', 'seconds'}].
+        """
+        i = self._ids[source]
+        j = min(target_ids, key=lambda t: self.dist[i, t])
+        path = _path(self.next_hop, i, j)
+        if path is None:
+            return []
+        return [
+            {"to": self.nodes[b], "via": self._kinds[(a, b)], "seconds": round(float(self.dist[a, b]), 1)}
+            for a, b in zip(path, path[1:])
+        ]
+
+    def targets(self):
+        """
+        Every destination a rider can ask for: exits and the other lines'
+        platforms, as {target key: node ids}.
+        """
+        targets = {node: [self._ids[node]] for node in self.exits}
+        for line, ids in self.platforms.items():
+            targets[f"transfer:{line}"] = ids
+        return targets
+
+    def best_doors(self, tolerance=TIE_TOLERANCE_S):
+        """
+        Precompute {(line, direction, target): (cars, seconds, steps)} for
+        every door group and target; cars within `tolerance` of the fastest
+        are listed together.
+        """
+        answers = {}
+        targets = self.targets()
+        for (line, direction), doors in self.doors.items():
+            door_ids = self.node_ids(doors)
+            for target, target_ids in targets.items():
+                if target == f"transfer:{line}":
+                    continue
+                times = self.dist[np.ix_(door_ids, target_ids)].min(axis=1)
+                best = times.min()
+                if not np.isfinite(best):
+                    continue
+                cars = tuple(int(c) + 1 for c in np.flatnonzero(times <= best + tolerance))
+                steps = self.steps(doors[cars[0] - 1], target_ids)
+                answers[(line, direction, target)] = (cars, float(best), steps)
+        return answers
+
+
+GRAPHS = {}
+ANSWERS = {}
+TARGET_LOOKUP = {}
+# Content hash of STATION_GRAPHS, used for HTTP validators
+GRAPH_VERSION = None
+
+
+def rebuild_graphs():
+    """
+    Rebuild every station graph and its precomputed answers. Runs at import;
+    call again after changing STATION_GRAPHS or the platform geometry.
+    """
+    global GRAPHS, ANSWERS, TARGET_LOOKUP, GRAPH_VERSION
+    graphs, answers, lookup = {}, {}, {}
+    for station, spec in STATION_GRAPHS.items():
+        graph = StationGraph(station, spec, PLATFORM_GEOMETRY[station])
+        graphs[station] = graph
+        for (line, direction, target), answer in graph.best_doors().items():
+            answers[(station, line, direction, target)] = answer
+        for target in graph.targets():
+            kind, _, name = target.partition(":")
+            spellings = [name] if kind == "exit" else [f"line {name}", *PLATFORM_GEOMETRY[station]["lines"][name].get("names", ())]
+            # Exits come first, so "bloor" stays the exit rather than the line
+            for spelling in spellings:
+                lookup.setdefault((station, _clean(spelling)), target)
+    GRAPHS, ANSWERS, TARGET_LOOKUP = graphs, answers, lookup
+    blob = json.dumps([STATION_GRAPHS, WALK_SPEED_MPS, TIE_TOLERANCE_S], sort_keys=True)
+    GRAPH_VERSION = hashlib.sha1(blob.encode()).hexdigest()[:12]
+
+
+def has_graph(station):
+    return station in GRAPHS
+
+
+def route(station, destination, line=None, direction=None):
+    """
+    Best car(s) to board for the fastest walk from the train to an exit or,
+    when `destination` names another line, to that line's platform.
+    Returns (result, None) on success or (None, error message).
+    """
+    graph = GRAPHS.get(station)
+    if graph is None:
+        return None, f"No station graph for '{station}'"
+    target = TARGET_LOOKUP.get((station, _clean(destination or '')))
+    if target is None:
+        return None, "Please specify a valid exit or exit is ambiguous/missing."
+    lines = PLATFORM_GEOMETRY[station]["lines"]
+    if line:
+        line_key = platform_geometry.LINE_LOOKUP.get((station, _clean(line)))
+        if line_key is None:
+            return None, f"Line '{line}' does not serve {station}."
+    elif len(lines) == 1:
+        line_key = next(iter(lines))
+    else:
+        return None, f"Please clarify which line you are on at {station}."
+    if direction not in lines[line_key]["directions"]:
+        return None, f"Please specify direction ({' or '.join(lines[line_key]['directions'])})."
+    if target == f"transfer:{line_key}":
+        return None, f"You are already on line {line_key}."
+    found = ANSWERS.get((station, line_key, direction, target))
+    if found is None:
+        return None, f"No walking route to {destination} from line {line_key}."
+    cars, seconds, steps = found
+    kind, _, name = target.partition(":")
+    result = {
+        "station": station,
+        "line": line_key,
+        "direction": direction,
+        "car": cars[0] if len(cars) == 1 else list(cars),
+        "walk_s": round(seconds, 1),
+        "path": steps,
+    }
+    choice = " or ".join(str(c) for c in cars)
+    if kind == "transfer":
+        result["transfer_to"] = name
+        result["notes"] = f"Board car {choice} travelling {direction} for the quickest transfer to line {name}."
+    else:
+        result["exit"] = name
+        result["notes"] = f"Board car {choice} travelling {direction} for the quickest walk to the {name} exit."
+    return result, None
+
+
+rebuild_graphs()
@@ -0,0 +1,213 @@
+import threading
+import time
+from backend import scraping
+
+
+def normalize_system_key(system_name):
+    """
+    Normalize a system name into the key used by the stop cache: the
+    scraper id, so "GO", "go transit" and " Go Transit " share one entry.
+    Returns None for systems without a scraper, which are never cached.
+    """
+    return scraping.scraper_key(system_name)
+
+
+def _scrape(system_name):
+    # Looked up at call time so tests can monkeypatch the scraper.
+    return scraping.scrape_stops_for_system(system_name)
+
+
+class _Entry:
+    __slots__ = ("stops", "loaded_at", "fallback")
+
+    def __init__(self, stops, loaded_at, fallback=False):
+        self.stops = stops
+        self.loaded_at = loaded_at
+        self.fallback = fallback
+
+
+class StopCache:
+    """
+    Process-wide cache of scraped stops, keyed by scraper id. Systems without
+    a scraper get an empty list and never reach the cache, and at most
+    `max_entries` entries are kept.
+
+    Entries younger than `ttl` seconds are served as-is. Older entries are
+    still served immediately (stale-while-revalidate) while a background
+    thread refreshes them, as long as they are younger than `ttl + stale_ttl`.
+    Concurrent misses for the same system share a single scrape.
+
+    A scrape that fell back to the static placeholder stops never replaces a
+    real entry: the last good stops keep being served and the failure is
+    counted as an error. Placeholders are cached only when nothing else is,
+    and then only for `fallback_ttl` seconds.
+    """
+
+    def __init__(self, loader=_scrape, ttl=300, stale_ttl=3600, fallback_ttl=30, max_entries=64,
+                 clock=time.monotonic):
+        self.loader = loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fallback_ttl = fallback_ttl
+        self.clock = clock
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def configure(self, ttl=None, stale_ttl=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if stale_ttl is not None:
+            self.stale_ttl = stale_ttl
+
+    def get(self, system_name):
+        """
+        Return the cached stop list for a system, loading it on a miss.
+        The returned list is shared; callers must not mutate it.
+        """
+        key = normalize_system_key(system_name)
+        if key is None:
+            return []
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.loaded_at
+                if age < self._ttl(entry):
+                    self.hits += 1
+                    return entry.stops
+                if not entry.fallback and age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._start_refresh(key, system_name)
+                    return entry.stops
+            self.misses += 1
+        return self._load(key, system_name)
+
+    def peek(self, system_name):
+        """
+        Return the cached stops while the entry may still be served (fresh
+        or stale), or None. Never loads and never blocks on a scrape.
+        """
+        key = normalize_system_key(system_name)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        servable = self._ttl(entry) if entry.fallback else self.ttl + self.stale_ttl
+        if self.clock() - entry.loaded_at >= servable:
+            return None
+        return entry.stops
+
+    def put(self, system_name, stops):
+        """
+        Store scraped stops; see _store for how fallback stops are handled.
+        """
+        key = normalize_system_key(system_name)
+        if key is None:
+            return
+        with self._lock:
+            self._store(key, stops)
+
+    def _ttl(self, entry):
+        return self.fallback_ttl if entry.fallback else self.ttl
+
+    def _store(self, key, stops):
+        """
+        Cache `stops` for `key` and return the stops to serve. Fallback stops
+        are counted as an error and only cached when no real entry exists.
+        Caller holds self._lock.
+        """
+        fallback = scraping.is_fallback(stops)
+        if fallback:
+            self.errors += 1
+            entry = self._entries.get(key)
+            if entry is not None and not entry.fallback:
+                return entry.stops
+        self._entries[key] = _Entry(stops, self.clock(), fallback)
+        if len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k].loaded_at)
+            del self._entries[oldest]
+        return stops
+
+    def invalidate(self, system_name=None):
+        with self._lock:
+            if system_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(normalize_system_key(system_name), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+            }
+
+    def _load(self, key, system_name):
+        """
+        Load a system synchronously, joining an in-flight load if one exists.
+        """
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry.stops
+            # The leader failed; fall through and try on our own.
+            return self._fetch(key, system_name)
+        try:
+            return self._fetch(key, system_name)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def _fetch(self, key, system_name):
+        try:
+            stops = self.loader(system_name)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            print(f"[StopCache] Error loading stops for {system_name}: {e}")
+            raise
+        with self._lock:
+            return self._store(key, stops)
+
+    def _start_refresh(self, key, system_name):
+        # Caller holds self._lock.
+        if key in self._inflight:
+            return
+        event = self._inflight[key] = threading.Event()
+        self.refreshes += 1
+
+        def run():
+            try:
+                self._fetch(key, system_name)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                event.set()
+
+        threading.Thread(target=run, name=f"stop-cache-refresh-{key}", daemon=True).start()
+
+
+stop_cache = StopCache()
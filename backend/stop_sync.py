@@ -0,0 +1,89 @@
+import time
+import click
+from backend import scraping
+from backend.ingest import bulk_upsert_stops
+from backend.models import db
+from backend.stop_cache import stop_cache
+
+# Reported for a system whose upstream could not be scraped; its stored and
+# cached stops are left as they were rather than replaced by the fallback
+SKIPPED = "skipped"
+
+
+def persist_stops(system_name, stops, region=None):
+    """
+    Upsert scraped stops for one system into the TransitSystem/Line/Stop tables.
+    Returns the number of distinct stops written.
+    """
+    return len(bulk_upsert_stops(system_name, stops, region=region))
+
+
+def sync_system(system_id):
+    """
+    Scrape one supported system and persist its stops. Returns the number
+    of stops written, or SKIPPED when only fallback stops were available.
+    """
+    info = scraping.SUPPORTED_SYSTEMS[system_id]
+    stops = scraping.scrape_stops_for_system(info["name"])
+    if scraping.is_fallback(stops):
+        print(f"[stop_sync] Skipping {system_id}: upstream unavailable")
+        return SKIPPED
+    count = persist_stops(info["name"], stops, region=info["region"])
+    # Keep the in-process cache in step with what was just written
+    stop_cache.put(info["name"], stops)
+    return count
+
+
+def sync_all():
+    """
+    Scrape every supported system concurrently and persist the results. A
+    failure in one system does not stop the others.
+    Returns {system_id: stop count, SKIPPED when the upstream was unavailable,
+    or None on error}.
+    """
+    names = {info["name"]: system_id for system_id, info in scraping.SUPPORTED_SYSTEMS.items()}
+    scraped = scraping.scrape_stops_for_systems(names)
+    results = {}
+    for name, stops in scraped.items():
+        system_id = names[name]
+        if scraping.is_fallback(stops):
+            print(f"[stop_sync] Skipping {system_id}: upstream unavailable")
+            results[system_id] = SKIPPED
+            continue
+        try:
+            results[system_id] = persist_stops(name, stops, region=scraping.SUPPORTED_SYSTEMS[system_id]["region"])
+            stop_cache.put(name, stops)
+        except Exception as e:
+            db.session.rollback()
+            print(f"[stop_sync] Error syncing {system_id}: {e}")
+            results[system_id] = None
+    return results
+
+
+def register_stop_sync(app):
+    """
+    Register the `flask sync-stops` command. Periodic syncs run as their own
+    process with `flask sync-stops --loop`, so web workers and other CLI
+    commands never start a scraper of their own.
+    """
+
+    @app.cli.command('sync-stops')
+    @click.option('--loop', is_flag=True, help='Keep running, syncing every --interval seconds.')
+    @click.option('--interval', type=int, default=None,
+                  help='Seconds between syncs with --loop [default: STOP_SYNC_INTERVAL].')
+    def sync_stops_command(loop, interval):
+        """Scrape every supported system and persist its stops."""
+        if interval is None:
+            interval = app.config.get('STOP_SYNC_INTERVAL') or 900
+        while True:
+            started = time.monotonic()
+            for system_id, count in sync_all().items():
+                if count is None:
+                    click.echo(f"{system_id}: failed")
+                elif count == SKIPPED:
+                    click.echo(f"{system_id}: skipped (upstream unavailable)")
+                else:
+                    click.echo(f"{system_id}: {count} stops")
+            if not loop:
+                break
+            time.sleep(max(0, interval - (time.monotonic() - started)))
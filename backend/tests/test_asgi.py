@@ -0,0 +1,118 @@
+# tests/test_asgi.py
+import asyncio
+import time
+import httpx
+import pytest
+from app import create_app
+from asgi import create_asgi_app, wsgi_environ
+from backend import circuit_breaker, scraping
+from backend.models import db, Stop
+from backend.stop_cache import stop_cache
+
+UPSTREAM_DELAY = 0.3
+
+
+@pytest.fixture
+def flask_app(monkeypatch):
+    monkeypatch.setattr(scraping, '_validators', {})
+    stop_cache.invalidate()
+    circuit_breaker.reset()
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+    yield app
+    stop_cache.invalidate()
+    circuit_breaker.reset()
+
+
+def slow_upstream(calls):
+    async def handler(request):
+        calls.append(request.url.host)
+        await asyncio.sleep(UPSTREAM_DELAY)
+        return httpx.Response(200, text='<a class="station">Embarcadero</a><a class="station">Powell St</a>')
+    return handler
+
+
+# The in-memory test database is one SQLite connection, which must not be
+# used from several threads at once, so views run on a single thread here
+def serve(flask_app, handler, max_threads=1):
+    scraper = scraping.AsyncScraper(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return create_asgi_app(flask_app, max_threads=max_threads, scraper=scraper)
+
+
+async def get_all(asgi_app, urls):
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        return await asyncio.gather(*(client.get(url) for url in urls))
+
+
+def test_concurrent_requests_share_one_upstream_scrape(flask_app):
+    calls = []
+    asgi_app = serve(flask_app, slow_upstream(calls))
+    start = time.monotonic()
+    responses = asyncio.run(get_all(asgi_app, ["/api/stops?system=bart"] * 200))
+    elapsed = time.monotonic() - start
+    assert calls == ["www.bart.gov"]
+    assert all(r.status_code == 200 for r in responses)
+    assert all([s['name'] for s in r.json()] == ["Embarcadero", "Powell St"] for r in responses)
+    assert responses[0].headers['Cache-Control'] == 'no-cache'
+    # One thread would need 200 upstream round trips if each request blocked it
+    assert elapsed < 20 * UPSTREAM_DELAY
+
+
+def test_slow_upstream_does_not_block_other_requests(flask_app):
+    asgi_app = serve(flask_app, slow_upstream([]))
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            slow = [asyncio.ensure_future(client.get(f"/api/stops?system={s}")) for s in ("bart", "ttc", "mta", "go")]
+            await asyncio.sleep(UPSTREAM_DELAY / 3)
+            health = await client.get("/api/health")
+            return health, [t.done() for t in slow], await asyncio.gather(*slow)
+
+    health, done, slow = asyncio.run(run())
+    assert health.json() == {"status": "ok"}
+    assert not any(done)
+    assert all(r.status_code == 200 for r in slow)
+
+
+def test_upstream_failure_falls_back_to_static_stops(flask_app):
+    asgi_app = serve(flask_app, lambda request: httpx.Response(500))
+    (response,) = asyncio.run(get_all(asgi_app, ["/api/stops?system=ttc"]))
+    assert any(s['name'] == 'Union Station' for s in response.json())
+
+
+def test_persisted_stops_skip_the_scraper(flask_app):
+    with flask_app.app_context():
+        db.session.add(Stop(name="Kipling", line="TTC", system="TTC", lat=43.636, lon=-79.535))
+        db.session.commit()
+    calls = []
+    asgi_app = serve(flask_app, slow_upstream(calls))
+    (response,) = asyncio.run(get_all(asgi_app, ["/api/stops?system=ttc"]))
+    assert calls == []
+    assert [s['name'] for s in response.json()] == ["Kipling"]
+
+
+def test_other_requests_pass_through_with_body_and_headers(flask_app):
+    asgi_app = serve(flask_app, slow_upstream([]))
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.post("/api/best_car/journey", json={"legs": []})
+
+    response = asyncio.run(run())
+    flask_response = flask_app.test_client().post("/api/best_car/journey", json={"legs": []})
+    assert response.status_code == flask_response.status_code
+    assert response.json() == flask_response.get_json()
+
+
+def test_wsgi_environ_maps_headers():
+    environ = wsgi_environ({
+        'type': 'http', 'method': 'GET', 'path': '/api/stops', 'query_string': b'system=go',
+        'headers': [(b'content-type', b'application/json'), (b'accept', b'a'), (b'accept', b'b')],
+    }, b'')
+    assert environ['QUERY_STRING'] == 'system=go'
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['HTTP_ACCEPT'] == 'a,b'
@@ -0,0 +1,45 @@
+# tests/test_benchmarks.py
+import json
+from backend import scraping
+from backend.benchmarks import api_bench
+from backend.benchmarks.network import fixture_upstreams, synthetic_stops
+
+def test_synthetic_stops_are_deterministic_and_unique():
+    stops = synthetic_stops(500)
+    assert stops == synthetic_stops(500)
+    assert len({s['name'] for s in stops}) == 500
+    assert stops != synthetic_stops(500, seed=1)
+    assert {s['system'] for s in stops} == {'TTC'}
+
+def test_fixture_upstreams_serve_fixture_pages():
+    with fixture_upstreams():
+        stops = scraping.scrape_stops_for_system("BART")
+    assert stops and stops != scraping.static_stops_for("bart")
+
+def test_measure_reports_per_call_times():
+    result = api_bench.measure(lambda: sum(range(100)), rounds=3)
+    assert result['rounds'] == 3
+    assert 0 < result['min_s'] <= result['median_s']
+    assert result['calls_per_round'] > 1
+
+def test_compare_flags_only_slowdowns_beyond_threshold():
+    baseline = {'benchmarks': {
+        'a': {'median_s': 1.0}, 'b': {'median_s': 1.0}, 'load[100]': {'p95_s': 0.1}, 'gone': {'median_s': 1.0},
+    }}
+    report = {'benchmarks': {
+        'a': {'median_s': 1.1}, 'b': {'median_s': 1.5}, 'load[100]': {'p95_s': 0.2}, 'new': {'median_s': 9.0},
+    }}
+    regressions = api_bench.compare(report, baseline, threshold=0.2)
+    assert [r['name'] for r in regressions] == ['b', 'load[100]']
+    assert round(regressions[0]['change'], 2) == 0.5
+
+def test_small_run_writes_a_comparable_report(tmp_path):
+    output = tmp_path / 'report.json'
+    args = ['--sizes', '100', '--rounds', '1', '--requests', '20', '--concurrency', '2', '--output', str(output)]
+    assert api_bench.main(args) == 0
+    report = json.loads(output.read_text())
+    assert {'best_car', 'normalize_station_name', 'add_transit_system_with_scrape',
+            'stops_system[100]', 'stops_search[100]', 'load[100]'} <= set(report['benchmarks'])
+    assert report['benchmarks']['load[100]']['errors'] == 0
+    # A report never regresses against itself
+    assert api_bench.main(args + ['--baseline', str(output), '--threshold', '10']) == 0
@@ -0,0 +1,55 @@
+# tests/test_best_car_batch.py
+import pytest
+from app import create_app
+
+@pytest.fixture
+def client():
+    app = create_app(testing=True)
+    return app.test_client()
+
+SINGLE_QUERIES = [
+    ("Union Station", "Front Street", None),
+    ("MultiOption", "Central", None),
+    ("Unknownville", "Main", None),
+    ("Union Station", "", None),
+    ("UnderConstruction", "Main", None),
+    ("Bloor-Yonge", "Yonge", None),
+    ("Bloor-Yonge", "Yonge", "Bloor"),
+    ("MainStreet", "Union", None),
+]
+
+def test_batch_matches_single_item_semantics(client):
+    trips = [{"origin": o, "destination": d, "line": l} for o, d, l in SINGLE_QUERIES]
+    response = client.post('/api/best_car/batch', json={"trips": trips})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert len(results) == len(SINGLE_QUERIES)
+    for (origin, destination, line), result in zip(SINGLE_QUERIES, results):
+        params = {"origin": origin, "destination": destination}
+        if line:
+            params["line"] = line
+        single = client.get('/api/best_car', query_string=params)
+        status = result.pop("status")
+        assert status == single.status_code
+        assert result == single.get_json()
+
+def test_batch_accepts_bare_list_of_tuples(client):
+    response = client.post('/api/best_car/batch', json=[
+        ["St. George", "Bedford"],
+        ["Bloor-Yonge", "Yonge", "Yonge"],
+    ])
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == [200, 200]
+    assert results[0]["car"] == 2
+
+def test_batch_reports_malformed_items_per_item(client):
+    response = client.post('/api/best_car/batch', json={"trips": [["only-one"], {"origin": 5, "destination": "x"},
+                                                                  {"station": "Union Station", "exit": "Front Street"}]})
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == [400, 400, 200]
+
+def test_batch_rejects_bad_bodies(client):
+    assert client.post('/api/best_car/batch', data="nope", content_type="application/json").status_code == 400
+    assert client.post('/api/best_car/batch', json={"trips": "x"}).status_code == 400
+    too_many = [["Union Station", "Front Street"]] * 101
+    assert client.post('/api/best_car/batch', json=too_many).status_code == 413
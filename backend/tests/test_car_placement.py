@@ -23,3 +23,37 @@ def test_car_placement_multioption():
     info = CAR_PLACEMENT['multioption']['central']
     assert isinstance(info['car'], list)
     assert info['explanation']
+
+def test_normalize_station_name_aliases():
+    assert normalize_station_name("St. George Station") == "st george"
+    assert normalize_station_name("st_george") == "st george"
+    assert normalize_station_name("Union") == "union station"
+    assert normalize_station_name("Under Construction") == "underconstruction"
+    assert normalize_station_name("bloor yonge station") == "bloor-yonge"
+    assert normalize_station_name("Front Street") == "front street"
+    assert normalize_station_name("") is None
+
+def test_station_lookup_covers_every_station():
+    from car_placement import STATION_LOOKUP
+    for station in CAR_PLACEMENT:
+        assert STATION_LOOKUP[station] == station
+        assert normalize_station_name(station.upper()) == station
+
+def test_lookup_placement_resolves_exit_aliases():
+    from car_placement import lookup_placement
+    exit_name, info = lookup_placement("union station", normalize_station_name("Front St."))
+    assert exit_name == "front street"
+    assert info is CAR_PLACEMENT["union station"]["front street"]
+    assert lookup_placement("union station", "nowhere") is None
+
+def test_rebuild_lookups_picks_up_new_data(monkeypatch):
+    import car_placement
+    monkeypatch.setitem(car_placement.CAR_PLACEMENT, "finch", {"north": {"car": 6, "explanation": "Use car 6."}})
+    monkeypatch.setitem(car_placement.STATION_ALIASES, "finch", ["finch station"])
+    car_placement.rebuild_lookups()
+    try:
+        assert normalize_station_name("Finch Station") == "finch"
+        assert car_placement.lookup_placement("finch", "north")[1]["car"] == 6
+    finally:
+        monkeypatch.undo()
+        car_placement.rebuild_lookups()
@@ -0,0 +1,156 @@
+# tests/test_circuit_breaker.py
+import asyncio
+import httpx
+import pytest
+from app import create_app
+from backend import circuit_breaker, scraping
+from backend.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from backend.models import db, Stop
+from backend.stop_cache import StopCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    circuit_breaker.reset()
+    yield
+    circuit_breaker.reset()
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("ttc", failure_threshold=3, clock=FakeClock())
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure("timeout")
+    assert breaker.state == CLOSED
+    breaker.record_failure("timeout")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("ttc", failure_threshold=2, clock=FakeClock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["last_success"] is not None
+
+def test_half_open_allows_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("ttc", failure_threshold=1, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    clock.now = 59
+    assert not breaker.allow()
+    clock.now = 60
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+def test_lost_probe_is_replaced_after_the_wait():
+    clock = FakeClock()
+    breaker = CircuitBreaker("ttc", failure_threshold=1, reset_timeout=60, clock=clock)
+    breaker.record_failure()
+    clock.now = 60
+    assert breaker.allow()
+    # The probe never reports back, e.g. its task was cancelled
+    clock.now = 119
+    assert not breaker.allow()
+    clock.now = 120
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+def test_failed_probe_doubles_the_wait():
+    clock = FakeClock()
+    breaker = CircuitBreaker("ttc", failure_threshold=1, reset_timeout=60, max_reset_timeout=100, clock=clock)
+    breaker.record_failure()
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_failure("still down")
+    assert breaker.stats()["retry_in"] == 100
+    clock.now = 159
+    assert not breaker.allow()
+    clock.now = 160
+    assert breaker.allow()
+
+def mock_upstream(monkeypatch, handler):
+    monkeypatch.setattr(scraping, '_client', httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(scraping, '_validators', {})
+
+def test_open_breaker_skips_the_upstream(monkeypatch):
+    calls = []
+    def failing_get(request):
+        calls.append(request.url)
+        raise httpx.ReadTimeout("timed out")
+    mock_upstream(monkeypatch, failing_get)
+    for _ in range(5):
+        stops = scraping.scrape_stops_for_system("TTC")
+        assert any(s['name'] == 'Union Station' for s in stops)
+    assert len(calls) == circuit_breaker.FAILURE_THRESHOLD
+    assert circuit_breaker.get_breaker("ttc").state == OPEN
+    assert circuit_breaker.get_breaker("ttc").stats()["last_error"] == "timed out"
+
+def open_breaker(key):
+    breaker = circuit_breaker.get_breaker(key)
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+        breaker.record_failure("503")
+    return breaker
+
+def test_open_breaker_keeps_serving_cached_stops(monkeypatch):
+    clock = FakeClock()
+    cache = StopCache(loader=scraping.scrape_stops_for_system, ttl=10, stale_ttl=10, clock=clock)
+    cache.put("TTC", [{"name": "Kipling", "line": "TTC", "system": "TTC"}])
+    open_breaker("ttc")
+    mock_upstream(monkeypatch, lambda request: pytest.fail("breaker is open"))
+    clock.now = 100
+    assert [s['name'] for s in cache.get("TTC")] == ["Kipling"]
+    assert cache.stats()["errors"] == 1
+
+def test_open_breaker_uses_static_stops_only_when_nothing_is_cached():
+    open_breaker("ttc")
+    stops = StopCache(loader=scraping.scrape_stops_for_system).get("TTC")
+    assert scraping.is_fallback(stops)
+    assert any(s['name'] == 'Union Station' for s in stops)
+
+def test_open_breaker_serves_persisted_stops(monkeypatch):
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Stop(name="Kipling", line="TTC", system="TTC", lat=43.636, lon=-79.535))
+        db.session.commit()
+    open_breaker("ttc")
+    response = app.test_client().get('/api/stops?system=ttc')
+    assert [s['name'] for s in response.get_json()] == ["Kipling"]
+
+def test_async_scraper_marks_open_breaker_results():
+    open_breaker("bart")
+    scraper = scraping.AsyncScraper(client=httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: pytest.fail("breaker is open"))))
+    assert scraping.is_fallback(asyncio.run(scraper.scrape("BART")))
+
+def test_upstream_health_endpoint(monkeypatch):
+    app = create_app(testing=True)
+    client = app.test_client()
+    response = client.get('/api/health/upstreams')
+    data = response.get_json()
+    assert data["status"] == "ok"
+    assert set(data["upstreams"]) == set(scraping.SUPPORTED_SYSTEMS)
+    assert data["upstreams"]["bart"]["state"] == CLOSED
+    assert response.headers['Cache-Control'] == 'no-store'
+    breaker = circuit_breaker.get_breaker("bart")
+    for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+        breaker.record_failure("503")
+    data = client.get('/api/health/upstreams').get_json()
+    assert data["status"] == "degraded"
+    assert data["upstreams"]["bart"]["state"] == OPEN
+    assert data["upstreams"]["bart"]["last_error"] == "503"
+    # The liveness check is unaffected by upstream outages
+    assert client.get('/api/health').get_json() == {"status": "ok"}
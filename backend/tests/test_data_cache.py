@@ -0,0 +1,55 @@
+# tests/test_data_cache.py
+import threading
+import time
+import pytest
+from app import create_app
+from backend.data_cache import VersionedCache
+from backend.models import db, bump_data_version
+from backend.signals import stops_changed
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_rebuilds_only_when_the_version_changes(app):
+    builds = []
+    cache = VersionedCache('stops', lambda version: builds.append(version) or len(builds))
+    assert cache.get() == cache.get() == 1
+    # A write from another process only shows up as a new version
+    bump_data_version('stops')
+    db.session.commit()
+    assert cache.get() == 2
+    assert builds == [0, 1]
+
+def test_signal_drops_the_value(app):
+    builds = []
+    cache = VersionedCache('stops', lambda version: builds.append(version) or len(builds), signal=stops_changed)
+    cache.get()
+    stops_changed.send(None)
+    assert cache.get() == 2
+
+def test_concurrent_callers_share_one_build(app, monkeypatch):
+    # The in-memory test database is one connection, unsafe across threads
+    monkeypatch.setattr('backend.models.get_data_version', lambda name: 7)
+    builds = []
+    def slow_build(version):
+        builds.append(version)
+        time.sleep(0.1)
+        return object()
+    cache = VersionedCache('stops', slow_build)
+    results = []
+    def worker():
+        with app.app_context():
+            results.append(cache.get())
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert len({id(r) for r in results}) == 1
@@ -0,0 +1,177 @@
+# tests/test_gtfs.py
+import io
+import zipfile
+import pytest
+from app import create_app
+from sqlalchemy import event
+from backend.models import db, Stop, TransitSystem, Line, GtfsManifest, get_data_version
+from backend.gtfs import import_gtfs, iter_rows, GtfsError
+from backend.signals import stops_changed
+
+FEED = {
+    "routes.txt": "route_id,route_short_name,route_long_name,route_type\nR1,1,Yonge-University,1\nR2,,Bloor-Danforth,1\n",
+    "trips.txt": "route_id,service_id,trip_id\nR1,WK,T1\nR1,WK,T2\nR2,WK,T3\n",
+    "stops.txt": (
+        "\ufeffstop_id,stop_name,stop_lat,stop_lon,location_type,parent_station\n"
+        "S1,Union Station,43.645,-79.380,1,\n"
+        "S1N,Union Station Platform 1,43.6451,-79.3801,0,S1\n"
+        "S1S,Union Station Platform 2,43.6452,-79.3802,0,S1\n"
+        "S2,Bloor-Yonge,43.671,-79.386,1,\n"
+        "S2A,Bloor-Yonge Line 1,43.671,-79.386,0,S2\n"
+        "S2B,Bloor-Yonge Line 2,43.671,-79.386,0,S2\n"
+        "S3,Broadview,43.676,-79.358,0,\n"
+        "S4,Unused,0,0,0,\n"
+    ),
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,S1N,1\n"
+        "T1,08:05:00,08:05:00,S2A,2\n"
+        "T2,09:00:00,09:00:00,S1S,1\n"
+        "T2,09:05:00,09:05:00,S2A,2\n"
+        "T3,08:10:00,08:10:00,S2B,1\n"
+        "T3,08:15:00,08:15:00,S3,2\n"
+        "T9,08:15:00,08:15:00,S3,1\n"
+    ),
+}
+
+def make_feed(files=FEED, folder=""):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, body in files.items():
+            zf.writestr(folder + name, body)
+    buf.seek(0)
+    return buf
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_iter_rows_streams_selected_columns():
+    with zipfile.ZipFile(make_feed()) as feed:
+        rows = list(iter_rows(feed, "stops.txt", ("stop_id", "parent_station", "missing")))
+    assert rows[0] == ("S1", "", None)
+    assert rows[1] == ("S1N", "S1", None)
+
+def test_import_folds_platforms_into_stations(app):
+    report = import_gtfs(make_feed(), "TTC", region="Toronto")
+    assert report.stop_times == 7
+    assert report.counts()["inserted"] == 4
+    assert TransitSystem.query.one().region == "Toronto"
+    assert sorted(l.name for l in Line.query.all()) == ["1", "Bloor-Danforth"]
+    stops = sorted((s.line, s.name) for s in Stop.query.all())
+    assert stops == [
+        ("1", "Bloor-Yonge"), ("1", "Union Station"),
+        ("Bloor-Danforth", "Bloor-Yonge"), ("Bloor-Danforth", "Broadview"),
+    ]
+    assert Stop.query.filter_by(name="Union Station").one().lat == 43.645
+
+def test_import_in_small_chunks_signals_once(app):
+    received = []
+    listener = lambda sender, **kw: received.append(sender)
+    stops_changed.connect(listener)
+    try:
+        report = import_gtfs(make_feed(folder="feed/"), "TTC", chunk_size=1)
+    finally:
+        stops_changed.disconnect(listener)
+    assert len(report) == 4
+    assert received == ["TTC"]
+    assert get_data_version("stops") >= 1
+
+def test_reimport_is_unchanged(app):
+    import_gtfs(make_feed(), "TTC")
+    version = get_data_version("stops")
+    report = import_gtfs(make_feed(), "TTC")
+    assert report.counts()["unchanged"] == 4
+    assert get_data_version("stops") == version
+    assert Stop.query.count() == 4
+
+def test_missing_file_raises_before_writing(app):
+    files = dict(FEED)
+    del files["trips.txt"]
+    with pytest.raises(GtfsError):
+        import_gtfs(make_feed(files), "TTC")
+    assert TransitSystem.query.count() == 0
+
+def test_import_gtfs_cli(app, tmp_path):
+    path = tmp_path / "feed.zip"
+    path.write_bytes(make_feed().getvalue())
+    result = app.test_cli_runner().invoke(args=["import-gtfs", str(path), "--system", "TTC"])
+    assert result.exit_code == 0, result.output
+    assert "4 inserted" in result.output
+
+def edited_feed():
+    files = dict(FEED)
+    # Broadview moves, Union Station drops off line 1's trips, Castle Frank is new
+    files["stops.txt"] = FEED["stops.txt"].replace("S3,Broadview,43.676", "S3,Broadview,43.677") + "S5,Castle Frank,43.673,-79.368,0,\n"
+    files["stop_times.txt"] = (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:05:00,08:05:00,S2A,2\n"
+        "T3,08:10:00,08:10:00,S2B,1\n"
+        "T3,08:15:00,08:15:00,S3,2\n"
+        "T3,08:18:00,08:18:00,S5,3\n"
+    )
+    return make_feed(files)
+
+def test_import_records_manifest(app):
+    import_gtfs(make_feed(), "TTC")
+    manifest = db.session.get(GtfsManifest, "TTC")
+    assert set(manifest.file_hashes) == {"stops.txt", "routes.txt", "trips.txt", "stop_times.txt"}
+    assert len(manifest.row_hashes) == 4
+    assert manifest.imported_at is not None
+
+def test_incremental_skips_unchanged_feed(app):
+    import_gtfs(make_feed(), "TTC")
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        report = import_gtfs(make_feed(), "TTC", incremental=True)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert report.skipped
+    assert not any(s.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")) for s in statements)
+
+def test_incremental_applies_only_the_diff(app):
+    import_gtfs(make_feed(), "TTC")
+    version = get_data_version("stops")
+    report = import_gtfs(edited_feed(), "TTC", incremental=True)
+    statuses = {(line, name): status for line, name, status in report.rows}
+    assert statuses == {
+        ("1", "Bloor-Yonge"): "unchanged",
+        ("1", "Union Station"): "deleted",
+        ("Bloor-Danforth", "Bloor-Yonge"): "unchanged",
+        ("Bloor-Danforth", "Broadview"): "updated",
+        ("Bloor-Danforth", "Castle Frank"): "inserted",
+    }
+    assert report.counts()["deleted"] == 1
+    assert get_data_version("stops") > version
+    assert Stop.query.filter_by(name="Union Station").count() == 0
+    assert Stop.query.filter_by(name="Broadview").one().lat == 43.677
+    assert len(db.session.get(GtfsManifest, "TTC").row_hashes) == 4
+
+def test_deleting_last_stop_on_a_line_drops_the_line(app):
+    import_gtfs(make_feed(), "TTC")
+    files = dict(FEED)
+    files["stop_times.txt"] = "trip_id,stop_id\nT3,S2B\nT3,S3\n"
+    import_gtfs(make_feed(files), "TTC", incremental=True)
+    assert [l.name for l in Line.query.all()] == ["Bloor-Danforth"]
+    assert Stop.query.count() == 2
+
+def test_full_import_also_removes_dropped_rows(app):
+    import_gtfs(make_feed(), "TTC")
+    report = import_gtfs(edited_feed(), "TTC")
+    assert report.counts() == {"inserted": 1, "updated": 1, "unchanged": 2, "deleted": 1}
+    assert Stop.query.count() == 4
+
+def test_incremental_cli_reports_skip(app, tmp_path):
+    path = tmp_path / "feed.zip"
+    path.write_bytes(make_feed().getvalue())
+    runner = app.test_cli_runner()
+    runner.invoke(args=["import-gtfs", str(path), "--system", "TTC"])
+    result = runner.invoke(args=["import-gtfs", str(path), "--system", "TTC", "--incremental"])
+    assert "unchanged since last import" in result.output
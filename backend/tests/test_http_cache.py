@@ -0,0 +1,82 @@
+# tests/test_http_cache.py
+import pytest
+from app import create_app
+from backend.models import db, get_data_version
+from backend.ingest import bulk_upsert_stops
+from backend import car_placement
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.mark.parametrize("url", [
+    '/api/supported_systems',
+    '/api/transit_systems',
+    '/api/stops',
+    '/api/best_car?station=Union%20Station&exit=Front%20Street',
+])
+def test_read_only_endpoints_send_validators_and_honor_if_none_match(client, url):
+    # The first /api/stops call seeds demo stops, which bumps the data version
+    client.get(url)
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+    assert 'max-age=' in first.headers['Cache-Control']
+    assert 'stale-while-revalidate=' in first.headers['Cache-Control']
+    second = client.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+
+def test_etag_depends_on_query(client):
+    a = client.get('/api/best_car?station=Union%20Station&exit=Front%20Street').headers['ETag']
+    b = client.get('/api/best_car?station=St.%20George&exit=Bedford').headers['ETag']
+    assert a != b
+
+def test_errors_are_not_cached(client):
+    response = client.get('/api/best_car?station=Unknownville&exit=Main')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+def test_stop_refresh_invalidates_etag(app, client):
+    bulk_upsert_stops("TTC", [{"name": "Kipling", "line": "Line 2"}])
+    first = client.get('/api/stops?system=ttc')
+    assert [s['name'] for s in first.get_json()] == ["Kipling"]
+    etag = first.headers['ETag']
+    assert client.get('/api/stops?system=ttc', headers={'If-None-Match': etag}).status_code == 304
+    version = get_data_version('stops')
+    bulk_upsert_stops("TTC", [{"name": "Finch", "line": "Line 1"}])
+    assert get_data_version('stops') == version + 1
+    refreshed = client.get('/api/stops?system=ttc', headers={'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    assert {s['name'] for s in refreshed.get_json()} == {"Kipling", "Finch"}
+
+def test_scrape_fallback_is_not_validated(client, monkeypatch):
+    monkeypatch.setattr('backend.stop_cache.stop_cache.get', lambda system: [{"name": "Embarcadero", "line": "BART"}])
+    response = client.get('/api/stops?system=bart')
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert 'no-cache' in response.headers['Cache-Control']
+
+def test_placement_change_invalidates_best_car_etag(client, monkeypatch):
+    url = '/api/best_car?station=St.%20George&exit=Bedford'
+    etag = client.get(url).headers['ETag']
+    monkeypatch.setitem(car_placement.CAR_PLACEMENT["st george"]["bedford"], "car", 3)
+    car_placement.rebuild_lookups()
+    try:
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['car'] == 3
+    finally:
+        monkeypatch.undo()
+        car_placement.rebuild_lookups()
@@ -0,0 +1,65 @@
+# tests/test_ingest.py
+import pytest
+from sqlalchemy import event
+from app import create_app
+from backend.models import db, Stop, TransitSystem, Line
+from backend.ingest import bulk_upsert_stops, INSERTED, UPDATED, UNCHANGED
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def make_stops(n, line="Line 1"):
+    return [{"name": f"Stop {i}", "line": line, "lat": float(i), "lon": -float(i)} for i in range(n)]
+
+def test_bulk_upsert_inserts_system_lines_and_stops(app):
+    stops = make_stops(3) + make_stops(2, line="Line 2")
+    report = bulk_upsert_stops("Metro", stops, region="Somewhere")
+    assert report.counts() == {INSERTED: 5, UPDATED: 0, UNCHANGED: 0}
+    assert TransitSystem.query.one().region == "Somewhere"
+    assert sorted(l.name for l in Line.query.all()) == ["Line 1", "Line 2"]
+    assert Stop.query.filter_by(system="Metro").count() == 5
+
+def test_bulk_upsert_reports_updated_and_unchanged(app):
+    bulk_upsert_stops("Metro", make_stops(3))
+    stops = make_stops(4)
+    stops[1]["lat"] = 99.0
+    report = bulk_upsert_stops("Metro", stops)
+    statuses = {name: status for _, name, status in report.rows}
+    assert statuses == {"Stop 0": UNCHANGED, "Stop 1": UPDATED, "Stop 2": UNCHANGED, "Stop 3": INSERTED}
+    assert Stop.query.filter_by(name="Stop 1").one().lat == 99.0
+    assert Line.query.count() == 1
+
+def test_bulk_upsert_collapses_duplicate_input(app):
+    stops = make_stops(2) + [{"name": "Stop 0", "line": "Line 1", "lat": 5.0, "lon": 5.0}]
+    report = bulk_upsert_stops("Metro", stops)
+    assert len(report) == 2
+    assert Stop.query.filter_by(name="Stop 0").one().lat == 5.0
+
+def test_bulk_upsert_query_count_is_independent_of_stop_count(app):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        bulk_upsert_stops("Metro", make_stops(400))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    inserts = [s for s in statements if s.startswith("INSERT INTO stop")]
+    # One executemany for all stops rather than one INSERT per row
+    assert len(inserts) <= 2
+    assert len(statements) < 15
+    assert Stop.query.count() == 400
+
+def test_add_transit_system_with_scrape_uses_bulk_path(app, monkeypatch):
+    monkeypatch.setattr('app.scrape_stops_for_system', lambda name: make_stops(3))
+    system = app.add_transit_system_with_scrape("Metro", region="R")
+    assert system.name == "Metro"
+    assert Stop.query.filter_by(system="Metro").count() == 3
+    # Re-running is an idempotent upsert rather than a unique-name error
+    app.add_transit_system_with_scrape("Metro", region="R")
+    assert Stop.query.filter_by(system="Metro").count() == 3
@@ -0,0 +1,129 @@
+# tests/test_journey.py
+import io
+import zipfile
+import pytest
+from app import create_app
+from journey import Timetable, parse_clock_time, parse_time, compass_direction, load_timetable
+
+FEED = {
+    "routes.txt": "route_id,route_short_name,route_long_name\nR1,1,Yonge-University\nR2,2,Bloor-Danforth\n",
+    "trips.txt": "route_id,service_id,trip_id\nR1,WK,T1\nR1,WK,T2\nR2,WK,T3\nR2,WK,T4\n",
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon,location_type,parent_station\n"
+        "UN,Union Station,43.645,-79.380,1,\n"
+        "UN1,Union Station Platform,43.645,-79.380,0,UN\n"
+        "KG,King,43.649,-79.378,0,\n"
+        "BY,Bloor-Yonge,43.671,-79.386,1,\n"
+        "BY1,Bloor-Yonge Line 1,43.671,-79.386,0,BY\n"
+        "BY2,Bloor-Yonge Line 2,43.671,-79.386,0,BY\n"
+        "BV,Broadview,43.676,-79.358,0,\n"
+    ),
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        # Rows deliberately out of order; sequence decides
+        "T1,08:10:00,08:10:30,BY1,3\n"
+        "T1,08:00:00,08:00:00,UN1,1\n"
+        "T1,08:03:00,08:03:30,KG,2\n"
+        "T2,08:20:00,08:20:00,UN1,1\n"
+        "T2,08:23:00,08:23:30,KG,2\n"
+        "T2,08:30:00,08:30:00,BY1,3\n"
+        # Leaves too soon after T1 arrives to make the connection
+        "T3,08:11:00,08:11:00,BY2,1\n"
+        "T3,08:14:00,08:14:00,BV,2\n"
+        "T4,08:13:00,08:13:00,BY2,1\n"
+        "T4,08:16:00,08:16:00,BV,2\n"
+    ),
+}
+
+def make_feed():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, body in FEED.items():
+            zf.writestr(name, body)
+    buf.seek(0)
+    return buf
+
+@pytest.fixture
+def timetable():
+    return Timetable.from_gtfs(make_feed())
+
+@pytest.fixture
+def client(timetable):
+    app = create_app(testing=True)
+    app.timetable = timetable
+    return app.test_client()
+
+def test_parse_time():
+    assert parse_time("08:10:30") == 8 * 3600 + 10 * 60 + 30
+    assert parse_time("25:00:00") == 25 * 3600
+    assert parse_time("") is None and parse_time("soon") is None
+
+def test_parse_clock_time():
+    assert parse_clock_time("07:55") == 7 * 3600 + 55 * 60
+    assert parse_clock_time("23:59:59") == 86399
+    for value in ("07:99", "24:00", "07:30:60", "+7:30", "7", "", None):
+        assert parse_clock_time(value) is None
+
+def test_compass_direction():
+    assert compass_direction((43.645, -79.380), (43.671, -79.386)) == "northbound"
+    assert compass_direction((43.671, -79.386), (43.676, -79.358)) == "eastbound"
+    assert compass_direction((None, 1.0), (2.0, 3.0)) is None
+
+def test_timetable_connections_sorted_by_departure(timetable):
+    assert len(timetable) == 6
+    assert list(timetable.dep_time) == sorted(timetable.dep_time)
+    assert timetable.stations_named("union") == timetable.stations_named("Union Station")
+
+def test_earliest_arrival_respects_transfer_time(timetable):
+    legs = timetable.earliest_arrival(timetable.stations_named("Union"), timetable.stations_named("Broadview"), parse_time("07:55:00"))
+    assert [(l["from"], l["to"], l["line"], l["depart"], l["arrive"]) for l in legs] == [
+        ("Union Station", "Bloor-Yonge", "1", "08:00:00", "08:10:00"),
+        ("Bloor-Yonge", "Broadview", "2", "08:13:00", "08:16:00"),
+    ]
+    assert legs[0]["heading"] == "northbound"
+
+def test_earliest_arrival_none_when_no_service(timetable):
+    assert timetable.earliest_arrival(timetable.stations_named("Union"), timetable.stations_named("Broadview"), parse_time("09:00:00")) is None
+
+def test_timetable_save_and_load(timetable, tmp_path):
+    path = str(tmp_path / "timetable.npz")
+    timetable.save(path)
+    loaded = load_timetable(path)
+    assert len(loaded) == len(timetable)
+    assert loaded.earliest_arrival(loaded.stations_named("Union"), loaded.stations_named("Broadview"), parse_time("07:55:00")) is not None
+    assert load_timetable(str(tmp_path / "missing.npz")) is None
+
+def test_journey_endpoint_gives_one_car_per_leg(client):
+    data = client.get("/api/journey?from=Union&to=Broadview&depart=07:55").get_json()
+    assert data["arrive"] == "08:16:00"
+    assert data["transfers"] == 1
+    for leg in data["legs"]:
+        assert "best_car" not in leg
+        assert set(leg) >= {"car", "walk_s"}
+
+def test_journey_endpoint_errors(client):
+    assert client.get("/api/journey?from=Union").status_code == 400
+    assert client.get("/api/journey?from=Union&to=Nowhere").status_code == 404
+    assert client.get("/api/journey?from=Union&to=Broadview&depart=late").status_code == 400
+    for depart in ("07:99", "24:00", "7:55:60", "-1:30", "07"):
+        assert client.get(f"/api/journey?from=Union&to=Broadview&depart={depart}").status_code == 400
+    assert client.get("/api/journey?from=Union&to=Broadview&depart=23:00").status_code == 404
+
+def test_journey_endpoint_without_timetable():
+    app = create_app(testing=True)
+    assert app.test_client().get("/api/journey?from=a&to=b").status_code == 503
+
+def test_build_timetable_cli(tmp_path):
+    feed = tmp_path / "feed.zip"
+    feed.write_bytes(make_feed().getvalue())
+    out = tmp_path / "tt.npz"
+    app = create_app(testing=True)
+    result = app.test_cli_runner().invoke(args=["build-timetable", str(feed), "--output", str(out)])
+    assert result.exit_code == 0, result.output
+    assert "6 connections" in result.output
+    assert out.exists()
+
+def test_journey_endpoint_plans_cars_across_legs(client):
+    data = client.get("/api/journey?from=Union&to=Broadview&depart=07:55").get_json()
+    assert data["legs"][0]["car"] in (3, 4)
+    assert data["walk_s"] == data["legs"][0]["walk_s"]
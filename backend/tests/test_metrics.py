@@ -0,0 +1,91 @@
+# tests/test_metrics.py
+import os
+import subprocess
+import sys
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+from app import create_app
+from backend import metrics
+from backend.models import db
+from backend.payloads import dumps_bytes
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def sample(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0
+
+def test_requests_are_timed_by_endpoint_and_status(client):
+    before = sample('transitnav_request_seconds_count', endpoint='health_check', method='GET', status='200')
+    client.get('/api/health')
+    client.get('/api/health')
+    after = sample('transitnav_request_seconds_count', endpoint='health_check', method='GET', status='200')
+    assert after - before == 2
+
+def test_errors_are_labelled_with_their_status(client):
+    before = sample('transitnav_request_seconds_count', endpoint='best_car', method='GET', status='400')
+    assert client.get('/api/best_car').status_code == 400
+    assert sample('transitnav_request_seconds_count', endpoint='best_car', method='GET', status='400') == before + 1
+
+def test_db_queries_are_timed(client):
+    before = sample('transitnav_db_query_seconds_count', operation='select')
+    client.get('/api/stops?system=ttc&name=kip')
+    assert sample('transitnav_db_query_seconds_count', operation='select') > before
+
+def test_json_serialization_is_timed():
+    before = sample('transitnav_json_serialize_seconds_count')
+    dumps_bytes({'a': 1})
+    assert sample('transitnav_json_serialize_seconds_count') == before + 1
+
+def test_json_response_fallback_is_timed_once(app):
+    class Label:
+        def __html__(self):
+            return "Union"
+    before = sample('transitnav_json_serialize_seconds_count')
+    with app.test_request_context():
+        response = app.json.response({'station': Label()})
+    assert response.get_json() == {'station': 'Union'}
+    assert sample('transitnav_json_serialize_seconds_count') == before + 1
+
+def test_scrape_phases_are_timed():
+    from backend.scraping import parse_stops
+    before = sample('transitnav_scrape_seconds_count', system='bart', phase='parse')
+    parse_stops('bart', '<a class="station">Embarcadero</a>')
+    assert sample('transitnav_scrape_seconds_count', system='bart', phase='parse') == before + 1
+
+def test_metrics_endpoint_exports_prometheus_text(client):
+    client.get('/api/health')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    families = {f.name for f in text_string_to_metric_families(response.get_data(as_text=True))}
+    assert {'transitnav_request_seconds', 'transitnav_db_query_seconds',
+            'transitnav_scrape_seconds', 'transitnav_json_serialize_seconds'} <= families
+
+def test_metrics_can_be_disabled(monkeypatch):
+    monkeypatch.setenv('METRICS_ENABLED', '0')
+    app = create_app(testing=True)
+    assert app.test_client().get('/metrics').status_code == 404
+
+def test_multiprocess_export_sums_every_worker(tmp_path):
+    # Each worker is a separate interpreter sharing the metrics directory
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path), PYTHONPATH=os.pathsep.join(sys.path))
+    worker = "from backend.app import create_app; create_app(testing=True).test_client().get('/api/health')"
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], env=env, check=True)
+    scrape = ("from backend.app import create_app; "
+              "print(create_app(testing=True).test_client().get('/metrics').get_data(as_text=True))")
+    output = subprocess.run([sys.executable, '-c', scrape], env=env, check=True, capture_output=True, text=True).stdout
+    counts = [s.value for family in text_string_to_metric_families(output) for s in family.samples
+              if s.name == 'transitnav_request_seconds_count' and s.labels.get('endpoint') == 'health_check']
+    assert counts == [2.0]
@@ -0,0 +1,71 @@
+# tests/test_models_indexes.py
+import os
+import pytest
+import sqlalchemy as sa
+from flask_migrate import upgrade, downgrade
+from app import create_app
+from backend.models import db, Stop, normalize_stop_name
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            Stop(name="St. George", line="Line 1", system="TTC", lat=43.668, lon=-79.399),
+            Stop(name="Union Station", line="Line 1", system="TTC", lat=43.645, lon=-79.380),
+            Stop(name="Union Station", line="GO", system="GO Transit", lat=43.645, lon=-79.380),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def query_plan(statement):
+    compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(sa.text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+def test_normalize_stop_name():
+    assert normalize_stop_name("St. George Station") == "st george station"
+    assert normalize_stop_name("  12th St/Oakland City Center ") == "12th st oakland city center"
+    assert normalize_stop_name(None) == ''
+
+def test_name_normalized_set_by_orm_and_bulk_insert(app):
+    assert Stop.query.filter_by(name="St. George").one().name_normalized == "st george"
+    db.session.execute(sa.insert(Stop), [{"name": "Bloor-Yonge", "line": "Line 2", "system": "TTC"}])
+    db.session.commit()
+    assert Stop.query.filter_by(name="Bloor-Yonge").one().name_normalized == "bloor yonge"
+
+def test_system_line_lookup_uses_index(app):
+    plan = query_plan(sa.select(Stop).where(Stop.system == "TTC", Stop.line == "Line 1"))
+    assert "ix_stop_system_line" in plan
+    assert "SCAN stop" not in plan
+
+def test_system_lookup_uses_index(app):
+    plan = query_plan(sa.select(Stop).where(Stop.system == "TTC"))
+    assert "ix_stop_system_line" in plan
+
+def test_normalized_name_lookup_uses_index(app):
+    plan = query_plan(sa.select(Stop).where(Stop.name_normalized == "union station"))
+    assert "ix_stop_name_normalized" in plan
+
+def test_stops_name_filter_matches_normalized_name(app):
+    response = app.test_client().get('/api/stops?name=st%20george')
+    assert [s['name'] for s in response.get_json()] == ["St. George"]
+
+def test_migrations_upgrade_and_downgrade(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'migrated.db'}")
+    app = create_app()
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR, revision='0001')
+        db.session.execute(sa.text("INSERT INTO stop (name, line, system) VALUES ('St. George', 'Line 1', 'TTC')"))
+        db.session.commit()
+        upgrade(directory=MIGRATIONS_DIR)
+        inspector = sa.inspect(db.engine)
+        assert {ix['name'] for ix in inspector.get_indexes('stop')} >= {'ix_stop_system_line', 'ix_stop_name_normalized'}
+        assert db.session.execute(sa.text("SELECT name_normalized FROM stop")).scalar() == "st george"
+        downgrade(directory=MIGRATIONS_DIR, revision='base')
+        db.session.remove()
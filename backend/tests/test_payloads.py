@@ -0,0 +1,92 @@
+# tests/test_payloads.py
+import gzip
+import json
+import pytest
+from app import create_app
+from backend.models import db
+from backend.ingest import bulk_upsert_stops
+from backend import payloads
+from payloads import Payload, PayloadStore, dumps_bytes
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        payloads.stop_payloads.clear()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def many_stops(n=200):
+    return [{"name": f"Station {i}", "line": "Line 1" if i % 2 else "Line 2", "lat": 43.0 + i / 1000, "lon": -79.0}
+            for i in range(n)]
+
+def test_dumps_bytes_is_compact_and_sorted():
+    assert dumps_bytes({"b": 1, "a": [1, 2]}) == b'{"a":[1,2],"b":1}'
+
+def test_payload_precompresses_large_bodies():
+    raw = dumps_bytes(many_stops())
+    payload = Payload(raw)
+    assert gzip.decompress(payload.encoded['gzip']) == raw
+    if payloads.brotli is not None:
+        assert payloads.brotli.decompress(payload.encoded['br']) == raw
+    assert Payload(b'[]').encoded == {}
+
+def test_payload_store_builds_once_per_version():
+    store = PayloadStore()
+    calls = []
+    build = lambda: calls.append(1) or [1, 2, 3]
+    first = store.get_or_build(1, "k", build)
+    assert store.get_or_build(1, "k", build) is first
+    assert len(calls) == 1
+    store.get_or_build(2, "k", build)
+    assert len(calls) == 2
+    assert store.get_or_build(1, "none", lambda: None) is None
+
+def test_payload_store_is_bounded():
+    store = PayloadStore(max_entries=2)
+    for i in range(5):
+        store.get_or_build(1, i, lambda: [i])
+    assert len(store._entries) == 2
+
+@pytest.mark.parametrize("accept, expected", [("gzip", "gzip"), ("br, gzip", "br"), ("identity", None)])
+def test_stops_served_precompressed(client, accept, expected):
+    if expected == "br" and payloads.brotli is None:
+        pytest.skip("brotli not installed")
+    bulk_upsert_stops("TTC", many_stops())
+    response = client.get('/api/stops?system=ttc', headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == expected
+    assert 'Accept-Encoding' in response.headers['Vary']
+    body = response.get_data()
+    if expected == "gzip":
+        body = gzip.decompress(body)
+    elif expected == "br":
+        body = payloads.brotli.decompress(body)
+    data = json.loads(body)
+    assert len(data) == 200
+    assert data[0]['id'].startswith('ttc:')
+
+def test_compressed_and_plain_etags_differ(client):
+    bulk_upsert_stops("TTC", many_stops())
+    plain = client.get('/api/stops?system=ttc', headers={'Accept-Encoding': 'identity'})
+    zipped = client.get('/api/stops?system=ttc', headers={'Accept-Encoding': 'gzip'})
+    assert plain.headers['ETag'] != zipped.headers['ETag']
+
+def test_line_slice_and_refresh(client):
+    bulk_upsert_stops("TTC", many_stops(10))
+    data = client.get('/api/stops?system=ttc&line=line%201', headers={'Accept-Encoding': 'identity'}).get_json()
+    assert len(data) == 5 and all(s['line'] == "Line 1" for s in data)
+    bulk_upsert_stops("TTC", [{"name": "New Stop", "line": "Line 1"}])
+    data = client.get('/api/stops?system=ttc&line=line%201', headers={'Accept-Encoding': 'identity'}).get_json()
+    assert len(data) == 6
+
+def test_fast_json_provider_used_for_dynamic_responses(client):
+    response = client.get('/api/health')
+    assert response.get_json() == {"status": "ok"}
+    assert response.mimetype == 'application/json'
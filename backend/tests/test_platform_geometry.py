@@ -0,0 +1,75 @@
+# tests/test_platform_geometry.py
+import numpy as np
+import pytest
+from app import create_app
+from platform_geometry import car_centres, walk_distances, compute_placements, place
+
+GEOMETRY = {
+    "test station": {
+        "length": 100.0,
+        "exits": {"north": 0.0, "middle": 50.0, "south": 100.0},
+        "lines": {
+            "a": {
+                "car_length": 20.0, "cars": 4, "consists": [2, 4], "stop_offset": 10.0,
+                "directions": {"northbound": "start", "southbound": "end"},
+            },
+        },
+    },
+}
+
+@pytest.fixture
+def client():
+    return create_app(testing=True).test_client()
+
+def test_car_centres_follow_direction():
+    assert car_centres(100.0, 20.0, 4, 10.0, "start").tolist() == [20.0, 40.0, 60.0, 80.0]
+    assert car_centres(100.0, 20.0, 4, 10.0, "end").tolist() == [80.0, 60.0, 40.0, 20.0]
+
+def test_walk_distance_is_zero_alongside_a_car():
+    dist = walk_distances(np.array([20.0, 40.0]), np.array([25.0, 55.0]), 20.0)
+    assert dist.tolist() == [[0.0, 5.0], [25.0, 5.0]]
+
+def test_compute_placements_per_direction_and_length():
+    table = compute_placements(GEOMETRY)
+    # Trains stop 10 m short of the platform end
+    assert table[("test station", "a", "northbound", 4, "north")] == ((1,), 10.0)
+    assert table[("test station", "a", "southbound", 4, "north")] == ((4,), 10.0)
+    # The middle exit sits between cars 2 and 3: both are optimal
+    assert table[("test station", "a", "northbound", 4, "middle")] == ((2, 3), 0.0)
+    # A two-car train stops at the front, so its rear car is closest to the south end
+    assert table[("test station", "a", "northbound", 2, "south")] == ((2,), 50.0)
+    assert len(table) == 2 * 2 * 3
+
+def test_place_resolves_aliases_and_validates():
+    result, error = place("union station", "Front St.", direction="southbound")
+    assert error is None
+    assert result["line"] == "1" and result["train_cars"] == 6
+    assert place("union station", "front street")[1].startswith("Please specify direction")
+    assert place("st george", "bedford", direction="northbound")[1].startswith("Please clarify which line")
+    assert place("st george", "bedford", line="Line 2", direction="westbound")[0]["line"] == "2"
+    assert place("union station", "front street", direction="northbound", cars=5)[1] == "Trains on line 1 run with 4, 6 cars."
+    assert place("union station", "nowhere", direction="northbound")[0] is None
+
+def test_best_car_endpoint_uses_geometry_for_direction(client):
+    data = client.get('/api/best_car?station=King%20Station&exit=King%20Street%20East&direction=Southbound').get_json()
+    assert data["direction"] == "southbound"
+    assert data["car"] == 1
+    shorter = client.get('/api/best_car?station=King&exit=King%20Street%20West&direction=northbound&cars=4').get_json()
+    assert shorter["car"] == 1 and shorter["train_cars"] == 4
+
+def test_best_car_endpoint_keeps_curated_answers(client):
+    data = client.get('/api/best_car?station=Union%20Station&exit=Front%20Street').get_json()
+    assert data["car"] == 3 and "explanation" in data
+
+def test_best_car_endpoint_rejects_bad_input(client):
+    assert client.get('/api/best_car?station=King&exit=King%20Street%20West&cars=x').status_code == 400
+    assert client.get('/api/best_car?station=King&exit=King%20Street%20West').status_code == 400
+
+def test_batch_accepts_direction(client):
+    response = client.post('/api/best_car/batch', json=[
+        {"origin": "King", "destination": "King Street East", "direction": "southbound"},
+        {"origin": "King", "destination": "King Street East", "direction": "southbound", "cars": "6"},
+    ])
+    first, second = response.get_json()["results"]
+    assert first["status"] == 200 and first["car"] == 1
+    assert second["status"] == 400
@@ -0,0 +1,68 @@
+# tests/test_profiling.py
+import os
+import time
+import pytest
+from app import create_app
+from backend.models import db
+from backend.profiling import SamplingProfiler, register_profiling, should_profile, write_profile
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_sampling_profiler_collects_collapsed_stacks():
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy_wait(0.1)
+    profiler.stop()
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    assert any('busy_wait (test_profiling.py:' in line for line in lines)
+    stack, count = lines[0].rsplit(' ', 1)
+    assert int(count) > 0 and ';' in stack
+
+def test_should_profile():
+    assert should_profile('s3cret', 0.0, 's3cret')
+    assert not should_profile('s3cret', 0.0, 'guess')
+    assert not should_profile(None, 0.0, None)
+    assert should_profile(None, 1.0, None)
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(testing=True)
+    app.config['PROFILE_TOKEN'] = 's3cret'
+    app.config['PROFILE_DIR'] = str(tmp_path)
+    register_profiling(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_token_header_writes_a_profile(app, tmp_path):
+    client = app.test_client()
+    response = client.get('/api/best_car?origin=union&destination=king', headers={'X-Profile-Token': 's3cret'})
+    name = response.headers['X-Profile']
+    assert name.endswith('-best_car.collapsed')
+    assert os.listdir(tmp_path) == [name]
+
+def test_requests_without_the_token_are_not_profiled(app, tmp_path):
+    client = app.test_client()
+    response = client.get('/api/health', headers={'X-Profile-Token': 'wrong'})
+    assert 'X-Profile' not in response.headers
+    assert os.listdir(tmp_path) == []
+
+def test_disabled_profiling_registers_no_hooks():
+    app = create_app(testing=True)
+    hooks = [f.__name__ for f in app.before_request_funcs.get(None, [])]
+    assert 'start_profiler' not in hooks
+
+def test_write_profile_keeps_only_the_newest_files(tmp_path):
+    profiler = SamplingProfiler()
+    paths = []
+    for i in range(5):
+        path = write_profile(profiler, str(tmp_path), f"view{i}", max_files=3)
+        os.utime(path, ns=(i * 10**9, i * 10**9))
+        paths.append(path)
+    (tmp_path / "notes.txt").write_text("kept")
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(p) for p in paths[2:]] + ["notes.txt"])
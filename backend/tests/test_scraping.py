@@ -1,33 +1,104 @@
 # tests/test_scraping.py
+import os
+import httpx
 import pytest
+import scraping
 from scraping import scrape_stops_for_system
 
-class DummyResponse:
-    def __init__(self, text, status_code=200):
-        self.text = text
-        self.status_code = status_code
-    def raise_for_status(self):
-        if self.status_code != 200:
-            raise Exception("HTTP error")
-
-# Patch requests.get to simulate network failures and edge cases
-def test_scrape_stops_returns_static_on_failure(monkeypatch):
-    monkeypatch.setattr('scraping.requests.get', lambda *a, **kw: (_ for _ in ()).throw(Exception("fail")))
+from backend import circuit_breaker
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    # Failures from one test must not open a breaker for the next
+    circuit_breaker.reset()
+    yield
+    circuit_breaker.reset()
+
+@pytest.fixture
+def mock_upstream(monkeypatch):
+    """Route the shared client through an httpx.MockTransport handler."""
+    def install(handler):
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(scraping, '_client', client)
+        monkeypatch.setattr(scraping, '_validators', {})
+        return client
+    return install
+
+def test_scrape_stops_returns_static_on_failure(mock_upstream):
+    def handler(request):
+        raise httpx.ConnectError("fail")
+    mock_upstream(handler)
     stops = scrape_stops_for_system("TTC")
     assert isinstance(stops, list)
     assert any(s['name'] == 'Union Station' for s in stops)
 
-def test_scrape_stops_returns_static_on_empty(monkeypatch):
-    class FakeResp:
-        def __init__(self): self.text = ''
-        def raise_for_status(self): pass
-    monkeypatch.setattr('scraping.requests.get', lambda *a, **kw: FakeResp())
+def test_scrape_stops_returns_static_on_empty(mock_upstream):
+    mock_upstream(lambda request: httpx.Response(200, text=''))
     stops = scrape_stops_for_system("TTC")
     assert isinstance(stops, list)
     assert any(s['name'] == 'Union Station' for s in stops)
 
+def test_scrape_stops_for_system_uses_conditional_requests(mock_upstream):
+    seen = []
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text='<a class="station-link">Finch</a>', headers={"ETag": '"v1"'})
+    mock_upstream(handler)
+    assert scrape_stops_for_system("TTC") == scrape_stops_for_system("TTC")
+    assert seen == [None, '"v1"']
+
 def test_scrape_stops_supported_systems():
     for sys in ["TTC", "GO Transit", "MTA", "BART"]:
         stops = scrape_stops_for_system(sys)
         assert isinstance(stops, list)
         assert all('name' in s for s in stops)
+
+# --- Batch scraping over the shared httpx client ---
+
+def test_scrape_stops_for_systems_returns_each_system(mock_upstream):
+    pages = {
+        "www.ttc.ca": '<a class="station-link">Kipling</a><a class="station-link">Finch</a>',
+        "www.bart.gov": '<a class="station">Embarcadero</a>',
+    }
+    mock_upstream(lambda request: httpx.Response(200, text=pages[request.url.host]))
+    result = scraping.scrape_stops_for_systems(["TTC", "BART"])
+    assert [s['name'] for s in result["TTC"]] == ["Kipling", "Finch"]
+    assert [s['name'] for s in result["BART"]] == ["Embarcadero"]
+
+def test_scrape_stops_for_systems_falls_back_per_system(mock_upstream):
+    mock_upstream(lambda request: httpx.Response(500))
+    result = scraping.scrape_stops_for_systems(["MTA", "GO Transit"])
+    assert any(s['name'] == 'Fulton St' for s in result["MTA"])
+    assert any(s['name'] == 'Union Station' for s in result["GO Transit"])
+
+def test_scrape_stops_for_systems_uses_conditional_requests(mock_upstream):
+    seen = []
+    def handler(request):
+        seen.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, text='<a class="station">Powell St</a>', headers={"ETag": '"v1"'})
+    mock_upstream(handler)
+    first = scraping.scrape_stops_for_systems(["bart"])
+    second = scraping.scrape_stops_for_systems(["bart"])
+    assert seen == [None, '"v1"']
+    assert first == second == {"bart": [{"name": "Powell St", "line": "BART", "system": "BART"}]}
+
+# --- Parser backends ---
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+@pytest.mark.parametrize("key", ["ttc", "go", "mta", "bart"])
+def test_strained_parse_matches_full_tree(key):
+    with open(os.path.join(FIXTURES_DIR, f"{key}.html"), encoding="utf-8") as f:
+        html = f.read()
+    full = scraping.parse_stops(key, html, parser="html.parser", strained=False)
+    assert full
+    assert scraping.parse_stops(key, html) == full
+    assert scraping.parse_stops(key, html, parser="html.parser") == full
+
+def test_strainer_skips_unrelated_links():
+    html = '<a class="nav">Home</a><a class="station-link">Finch</a><div><a>Other</a></div>'
+    assert [s['name'] for s in scraping.parse_stops("ttc", html)] == ["Finch"]
@@ -0,0 +1,87 @@
+# tests/test_search_index.py
+import pytest
+from app import create_app
+from backend.models import db, Stop
+from backend.ingest import bulk_upsert_stops
+from backend import search_index
+from search_index import StopSearchIndex
+
+STOPS = [
+    {"name": "Union Station", "system": "TTC"},
+    {"name": "Union", "system": "MTA"},
+    {"name": "Union Square", "system": "MTA"},
+    {"name": "Spadina", "system": "TTC"},
+    {"name": "St. George", "system": "TTC"},
+    {"name": "Bloor-Yonge", "system": "TTC"},
+    {"name": "Powell St", "system": "BART"},
+]
+
+@pytest.fixture
+def index():
+    return StopSearchIndex(STOPS)
+
+def names(results):
+    return [stop["name"] for stop, _ in results]
+
+def test_exact_match_ranks_first(index):
+    results = index.search("union")
+    assert names(results)[0] == "Union"
+    assert results[0][1] == 1.0
+    assert set(names(results)) >= {"Union Station", "Union Square"}
+
+def test_prefix_match_is_normalized(index):
+    assert names(index.search("st geo")) == ["St. George"]
+    assert names(index.search("BLOOR YONGE")) == ["Bloor-Yonge"]
+
+def test_word_prefix_match(index):
+    assert "Bloor-Yonge" in names(index.search("yon"))
+    assert "Union Square" in names(index.search("squ"))
+
+def test_fuzzy_match_tolerates_typos(index):
+    results = index.search("spadena")
+    assert names(results)[:1] == ["Spadina"]
+    assert results[0][1] < 0.8
+
+def test_top_k_and_system_filter(index):
+    assert len(index.search("union", k=2)) == 2
+    assert names(index.search("union", system="TTC")) == ["Union Station"]
+
+def test_no_match_returns_empty(index):
+    assert index.search("zzzzzz") == []
+    assert index.search("   ") == []
+
+@pytest.fixture
+def client():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        search_index.invalidate()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+    search_index.invalidate()
+
+def test_search_endpoint(client):
+    bulk_upsert_stops("TTC", [{"name": "Kipling", "line": "Line 2", "lat": 43.6, "lon": -79.5},
+                              {"name": "King", "line": "Line 1"}])
+    response = client.get('/api/stops/search?q=kip')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [s['name'] for s in data] == ["Kipling"]
+    assert data[0]['location'] == {'lat': 43.6, 'lon': -79.5}
+    assert data[0]['system'] == "TTC"
+
+def test_search_endpoint_rebuilds_after_ingest(client):
+    assert client.get('/api/stops/search?q=finch').get_json() == []
+    bulk_upsert_stops("TTC", [{"name": "Finch", "line": "Line 1"}])
+    assert [s['name'] for s in client.get('/api/stops/search?q=finch').get_json()] == ["Finch"]
+
+def test_search_endpoint_filters_by_system_id(client):
+    bulk_upsert_stops("TTC", [{"name": "Union Station", "line": "Line 1"}])
+    bulk_upsert_stops("GO Transit", [{"name": "Union Station", "line": "GO"}])
+    data = client.get('/api/stops/search?q=union&system=go').get_json()
+    assert [s['system'] for s in data] == ["GO Transit"]
+
+def test_search_endpoint_requires_query(client):
+    assert client.get('/api/stops/search').status_code == 400
+    assert client.get('/api/stops/search?q=a&k=x').status_code == 400
@@ -0,0 +1,25 @@
+# tests/test_signals.py
+import pytest
+from app import create_app
+from backend.models import db
+from backend.ingest import bulk_upsert_stops
+from backend.signals import stops_changed
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_bulk_upsert_sends_stops_changed(app):
+    received = []
+    def receiver(sender, **kw):
+        received.append(sender)
+    with stops_changed.connected_to(receiver):
+        bulk_upsert_stops("Metro", [{"name": "A", "line": "L"}])
+        # A no-op upsert changes nothing and stays quiet
+        bulk_upsert_stops("Metro", [{"name": "A", "line": "L"}])
+    assert received == ["Metro"]
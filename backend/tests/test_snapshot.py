@@ -0,0 +1,86 @@
+# tests/test_snapshot.py
+import pytest
+from app import create_app
+from backend.models import db, Stop
+from backend.ingest import bulk_upsert_stops
+from backend import search_index, spatial_index, routes
+from backend.payloads import stop_payloads
+from backend.search_index import StopSearchIndex
+from backend.snapshot import Snapshot, build_snapshot, load_snapshot
+
+STOPS = [
+    {"name": "Union Station", "line": "Line 1", "lat": 43.645, "lon": -79.380},
+    {"name": "St. George", "line": "Line 1", "lat": 43.668, "lon": -79.399},
+    {"name": "St. George", "line": "Line 2", "lat": 43.668, "lon": -79.399},
+    {"name": "Bloor-Yonge", "line": "Line 2", "lat": 43.671, "lon": -79.386},
+    {"name": "Spadina", "line": "Line 2"},
+]
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        bulk_upsert_stops("TTC", STOPS, region="Toronto")
+        bulk_upsert_stops("GO Transit", [{"name": "Union Station", "line": "Lakeshore West", "lat": 43.645, "lon": -79.380}])
+        yield app
+        db.session.remove()
+        db.drop_all()
+    search_index.invalidate()
+    spatial_index.invalidate()
+    stop_payloads.clear()
+
+@pytest.fixture
+def snapshot(app, tmp_path):
+    path = str(tmp_path / "network.snapshot")
+    assert build_snapshot(path) == 6
+    return Snapshot(path)
+
+def test_snapshot_round_trips_stops(app, snapshot):
+    expected = sorted(
+        (s.id, s.name, s.line, s.system, s.lat, s.lon) for s in Stop.query.all()
+    )
+    got = sorted(tuple(s.values()) for s in snapshot.stops())
+    assert got == expected
+    assert [s["name"] for s in snapshot.stops("TTC")] == [s["name"] for s in STOPS]
+    assert snapshot.stops("Nowhere") == []
+
+def test_snapshot_search_matches_in_memory_index(app, snapshot):
+    memory = StopSearchIndex(search_index._load_stops())
+    mapped = snapshot.search_index()
+    for query in ["union", "st george", "george", "spadena", "bloor", "zzz"]:
+        for system in (None, "TTC"):
+            # Ties may come back in a different order; the snapshot groups rows by system
+            expected = sorted((s["id"], score) for s, score in memory.search(query, system=system))
+            assert sorted((s["id"], score) for s, score in mapped.search(query, system=system)) == expected
+
+def test_load_snapshot_rejects_missing_and_corrupt_files(tmp_path):
+    assert load_snapshot(None) is None
+    assert load_snapshot(str(tmp_path / "missing")) is None
+    bad = tmp_path / "bad.snapshot"
+    bad.write_bytes(b"not a snapshot at all")
+    assert load_snapshot(str(bad)) is None
+
+def test_routes_read_current_snapshot(app, snapshot, monkeypatch):
+    app.snapshot = snapshot
+    def no_orm(system_name):
+        raise AssertionError("stops should come from the snapshot")
+    monkeypatch.setattr(routes, "_system_stops_from_db", no_orm)
+    monkeypatch.setattr(search_index, "_load_stops", no_orm)
+    client = app.test_client()
+    stops = client.get("/api/stops?system=ttc").get_json()
+    assert [s["name"] for s in stops] == [s["name"] for s in STOPS]
+    assert client.get("/api/stops/search?q=union").get_json()[0]["name"] == "Union Station"
+
+def test_stale_snapshot_is_ignored(app, snapshot):
+    app.snapshot = snapshot
+    bulk_upsert_stops("TTC", [{"name": "Dundas", "line": "Line 1"}])
+    stops = app.test_client().get("/api/stops?system=ttc").get_json()
+    assert "Dundas" in [s["name"] for s in stops]
+
+def test_build_snapshot_cli(app, tmp_path):
+    path = tmp_path / "cli.snapshot"
+    result = app.test_cli_runner().invoke(args=["build-snapshot", "--output", str(path)])
+    assert result.exit_code == 0, result.output
+    assert "Wrote 6 stops" in result.output
+    assert len(Snapshot(str(path))) == 6
@@ -0,0 +1,78 @@
+# tests/test_spatial_index.py
+import math
+import pytest
+from app import create_app
+from backend.models import db
+from backend.ingest import bulk_upsert_stops
+from backend import spatial_index
+from spatial_index import StopSpatialIndex
+
+STOPS = [
+    {"name": "Union Station", "system": "TTC", "lat": 43.6453, "lon": -79.3806},
+    {"name": "King", "system": "TTC", "lat": 43.6490, "lon": -79.3779},
+    {"name": "St Andrew", "system": "TTC", "lat": 43.6476, "lon": -79.3848},
+    {"name": "Kipling", "system": "TTC", "lat": 43.6372, "lon": -79.5361},
+    {"name": "Embarcadero", "system": "BART", "lat": 37.7929, "lon": -122.3971},
+    {"name": "No Coordinates", "system": "TTC", "lat": None, "lon": None},
+]
+
+def haversine(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * spatial_index.EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+@pytest.fixture(params=["kdtree", "scan"])
+def index(request, monkeypatch):
+    if request.param == "scan":
+        monkeypatch.setattr(spatial_index, 'cKDTree', None)
+    elif spatial_index.cKDTree is None:
+        pytest.skip("scipy not installed")
+    return spatial_index.StopSpatialIndex(STOPS)
+
+def test_nearest_orders_by_haversine_distance(index):
+    results = index.nearest(43.6470, -79.3810, k=3)
+    assert [s['name'] for s, _ in results] == ["Union Station", "St Andrew", "King"]
+    for stop, meters in results:
+        assert meters == pytest.approx(haversine(43.6470, -79.3810, stop['lat'], stop['lon']), rel=1e-6)
+
+def test_radius_limits_results(index):
+    results = index.nearest(43.6453, -79.3806, k=10, radius=500)
+    assert {s['name'] for s, _ in results} == {"Union Station", "King", "St Andrew"}
+    assert all(m <= 500 for _, m in results)
+
+def test_nearest_spans_systems_and_skips_missing_coordinates(index):
+    assert len(index) == 5
+    results = index.nearest(37.79, -122.40, k=1)
+    assert results[0][0]['name'] == "Embarcadero"
+
+def test_empty_index():
+    assert StopSpatialIndex([]).nearest(0, 0) == []
+
+@pytest.fixture
+def client():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        spatial_index.invalidate()
+        bulk_upsert_stops("TTC", [dict(s, line="Line 1") for s in STOPS if s['system'] == "TTC"])
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+    spatial_index.invalidate()
+
+def test_nearby_stops_endpoint(client):
+    response = client.get('/api/nearby_stops?lat=43.6470&lon=-79.3810&radius=1000&k=2')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [s['name'] for s in data] == ["Union Station", "St Andrew"]
+    assert data[0]['distance_m'] < data[1]['distance_m']
+    assert data[0]['location'] == {'lat': 43.6453, 'lon': -79.3806}
+
+def test_nearby_stops_validates_params(client):
+    assert client.get('/api/nearby_stops').status_code == 400
+    assert client.get('/api/nearby_stops?lat=abc&lon=1').status_code == 400
+    assert client.get('/api/nearby_stops?lat=95&lon=1').status_code == 400
+    assert client.get('/api/nearby_stops?lat=1&lon=1&radius=-5').status_code == 400
+    assert client.get('/api/nearby_stops?lat=43.6&lon=-79.4&radius=nan').status_code == 400
+    assert client.get('/api/nearby_stops?lat=nan&lon=-79.4').status_code == 400
@@ -0,0 +1,75 @@
+# tests/test_static_files.py
+import gzip
+import pytest
+from flask import Flask
+from static_files import StaticIndex, register_static, IMMUTABLE, REVALIDATE
+
+@pytest.fixture
+def build_dir(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html>app</html>")
+    (tmp_path / "favicon.ico").write_bytes(b"icon")
+    (tmp_path / "android-chrome-192x192.png").write_bytes(b"png")
+    js = b"console.log('hello');" * 100
+    (tmp_path / "assets" / "index-BzQ3kD_1.js").write_bytes(js)
+    (tmp_path / "assets" / "index-BzQ3kD_1.js.gz").write_bytes(gzip.compress(js))
+    return tmp_path
+
+@pytest.fixture
+def client(build_dir):
+    app = Flask(__name__, static_folder=None)
+    register_static(app, str(build_dir))
+    return app.test_client()
+
+def test_index_built_once(build_dir):
+    index = StaticIndex(str(build_dir))
+    assert set(index.assets) == {"index.html", "favicon.ico", "android-chrome-192x192.png", "assets/index-BzQ3kD_1.js"}
+    assert "gzip" in index.get("assets/index-BzQ3kD_1.js").variants
+    assert index.get("assets/index-BzQ3kD_1.js").cache_control == IMMUTABLE
+    assert index.get("favicon.ico").cache_control == REVALIDATE
+    assert index.get("android-chrome-192x192.png").cache_control == REVALIDATE
+    assert index.get("index.html").cache_control == REVALIDATE
+
+def test_missing_build_dir_serves_404(tmp_path):
+    app = Flask(__name__, static_folder=None)
+    register_static(app, str(tmp_path / "nope"))
+    assert app.test_client().get('/').status_code == 404
+
+def test_hashed_asset_is_immutable(client):
+    response = client.get('/assets/index-BzQ3kD_1.js', headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE
+    assert response.mimetype in ('text/javascript', 'application/javascript')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+def test_precompressed_variant_served(client):
+    response = client.get('/assets/index-BzQ3kD_1.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()).startswith(b"console.log")
+
+def test_spa_fallback_served_from_memory(client, build_dir):
+    (build_dir / "index.html").unlink()
+    response = client.get('/trips/recent')
+    assert response.status_code == 200
+    assert response.get_data() == b"<html>app</html>"
+    assert response.headers['Cache-Control'] == REVALIDATE
+
+def test_conditional_get(client):
+    etag = client.get('/favicon.ico').headers['ETag']
+    assert client.get('/favicon.ico', headers={'If-None-Match': etag}).status_code == 304
+
+def test_traversal_and_api_paths(client):
+    assert client.get('/../../etc/passwd').get_data() == b"<html>app</html>"
+    assert client.get('/api/nope').status_code == 404
+
+def test_large_files_streamed_from_disk(build_dir):
+    (build_dir / "big.bin").write_bytes(b"x" * 2048)
+    app = Flask(__name__, static_folder=None)
+    app.static_index = None
+    register_static(app, str(build_dir))
+    app.static_index = StaticIndex(str(build_dir), max_inline_bytes=1024)
+    assert app.static_index.get("big.bin").body is None
+    response = app.test_client().get('/big.bin')
+    assert response.status_code == 200
+    assert len(response.get_data()) == 2048
@@ -0,0 +1,71 @@
+# tests/test_station_graph.py
+import numpy as np
+import pytest
+from app import create_app
+from station_graph import floyd_warshall, _path, StationGraph, route
+
+INF = np.inf
+
+@pytest.fixture
+def client():
+    return create_app(testing=True).test_client()
+
+def test_floyd_warshall_distances_and_paths():
+    weights = np.array([
+        [INF, 4.0, 1.0, INF],
+        [INF, INF, INF, 1.0],
+        [INF, 2.0, INF, 6.0],
+        [INF, INF, INF, INF],
+    ])
+    dist, next_hop = floyd_warshall(weights)
+    assert dist[0].tolist() == [0.0, 3.0, 1.0, 4.0]
+    assert _path(next_hop, 0, 3) == [0, 2, 1, 3]
+    assert _path(next_hop, 3, 0) is None
+
+GEOMETRY = {
+    "length": 100.0,
+    "exits": {},
+    "lines": {
+        "a": {"car_length": 20.0, "cars": 4, "stop_offset": 10.0, "directions": {"up": "start", "down": "end"}},
+        "b": {"car_length": 20.0, "cars": 4, "stop_offset": 10.0, "directions": {"up": "start", "down": "end"}},
+    },
+}
+SPEC = {
+    "platforms": {"a": {"stairs": 90.0, "lift": 10.0}, "b": {"stairs": 50.0}},
+    "edges": [
+        ("a:stairs", "exit:street", 20, "stairs", False),
+        # Up-only escalator between the platforms
+        ("a:lift", "b:stairs", 5, "escalator", True),
+    ],
+}
+
+def test_station_graph_prefers_cars_near_the_fastest_route():
+    answers = StationGraph("test", SPEC, GEOMETRY).best_doors()
+    cars, seconds, steps = answers[("a", "up", "exit:street")]
+    assert cars == (4,)
+    assert [s["to"] for s in steps] == ["a:stairs", "exit:street"]
+    # Transfers from a use the escalator near the lift
+    assert answers[("a", "up", "transfer:b")][0] == (1,)
+    # The escalator is one-way, so line b riders can not reach line a's platform
+    assert ("b", "up", "transfer:a") not in answers
+
+def test_route_transfer_and_exit_at_bloor_yonge():
+    transfer, error = route("bloor-yonge", "Line 2", line="1", direction="southbound")
+    assert error is None
+    assert transfer["transfer_to"] == "2"
+    assert transfer["path"][-1]["to"] == "2:centre stairs"
+    exit_, _ = route("bloor-yonge", "bloor", line="Yonge-University", direction="northbound")
+    assert exit_["exit"] == "bloor"
+    assert route("bloor-yonge", "Line 1", line="1", direction="southbound")[1] == "You are already on line 1."
+    assert route("bloor-yonge", "yonge", line="1")[1].startswith("Please specify direction")
+
+def test_best_car_endpoint_serves_transfers(client):
+    data = client.get('/api/best_car?station=Bloor-Yonge&exit=Line%202&line=1&direction=southbound').get_json()
+    assert data["transfer_to"] == "2"
+    assert data["car"] == [3, 4]
+    assert "walk_s" in data and data["path"]
+
+def test_best_car_endpoint_keeps_legacy_bloor_yonge_answers(client):
+    assert client.get('/api/best_car?station=Bloor-Yonge&exit=Yonge').status_code == 400
+    data = client.get('/api/best_car?station=Bloor-Yonge&exit=Yonge&line=Yonge').get_json()
+    assert data["car"] == 4
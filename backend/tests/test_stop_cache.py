@@ -0,0 +1,149 @@
+# tests/test_stop_cache.py
+import threading
+import time
+import pytest
+from stop_cache import StopCache, normalize_system_key
+from backend.scraping import static_stops_for
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_normalize_system_key():
+    assert normalize_system_key("TTC") == "ttc"
+    assert normalize_system_key(" GO  Transit ") == "go"
+    assert normalize_system_key("go") == "go"
+    assert normalize_system_key("") is None
+
+def test_hit_after_miss():
+    calls = []
+    cache = StopCache(loader=lambda name: calls.append(name) or [{"name": "Kipling"}])
+    assert cache.get("TTC") == [{"name": "Kipling"}]
+    assert cache.get("ttc") == [{"name": "Kipling"}]
+    assert calls == ["TTC"]
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+def test_stale_entry_served_while_refreshing():
+    clock = FakeClock()
+    versions = iter([[{"name": "Old"}], [{"name": "New"}]])
+    cache = StopCache(loader=lambda name: next(versions), ttl=10, stale_ttl=100, clock=clock)
+    assert cache.get("bart") == [{"name": "Old"}]
+    clock.now = 20
+    # Stale: the old list comes back immediately and a refresh starts
+    assert cache.get("bart") == [{"name": "Old"}]
+    assert wait_for(lambda: cache.get("bart") == [{"name": "New"}])
+    assert cache.stats()["refreshes"] == 1
+
+def test_expired_entry_reloads_synchronously():
+    clock = FakeClock()
+    versions = iter([[{"name": "Old"}], [{"name": "New"}]])
+    cache = StopCache(loader=lambda name: next(versions), ttl=10, stale_ttl=5, clock=clock)
+    cache.get("mta")
+    clock.now = 100
+    assert cache.get("mta") == [{"name": "New"}]
+    assert cache.stats()["misses"] == 2
+
+def test_concurrent_misses_share_one_load():
+    release = threading.Event()
+    calls = []
+    def slow_loader(name):
+        calls.append(name)
+        release.wait(2)
+        return [{"name": "Union Station"}]
+    cache = StopCache(loader=slow_loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("go"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    assert wait_for(lambda: len(calls) == 1)
+    release.set()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [[{"name": "Union Station"}]] * 8
+
+def test_loader_error_is_counted_and_raised():
+    def failing_loader(name):
+        raise RuntimeError("upstream down")
+    cache = StopCache(loader=failing_loader)
+    with pytest.raises(RuntimeError):
+        cache.get("ttc")
+    assert cache.stats()["errors"] == 1
+
+def test_invalidate():
+    calls = []
+    cache = StopCache(loader=lambda name: calls.append(name) or [])
+    cache.get("ttc")
+    cache.invalidate("TTC")
+    cache.get("ttc")
+    assert len(calls) == 2
+
+def test_peek_never_loads():
+    clock = FakeClock()
+    calls = []
+    cache = StopCache(loader=lambda name: calls.append(name) or [], ttl=10, stale_ttl=100, clock=clock)
+    assert cache.peek("TTC") is None
+    cache.put("ttc", [{"name": "Kipling"}])
+    clock.now = 50
+    assert cache.peek("TTC") == [{"name": "Kipling"}]
+    clock.now = 200
+    assert cache.peek("TTC") is None
+    assert calls == []
+
+def test_failed_refresh_keeps_the_stale_entry():
+    clock = FakeClock()
+    versions = iter([[{"name": "Kipling"}, {"name": "Finch"}], static_stops_for("ttc")])
+    cache = StopCache(loader=lambda name: next(versions), ttl=10, stale_ttl=100, clock=clock)
+    cache.get("ttc")
+    clock.now = 20
+    assert cache.get("ttc") == [{"name": "Kipling"}, {"name": "Finch"}]
+    assert wait_for(lambda: cache.stats()["errors"] == 1)
+    assert cache.get("ttc") == [{"name": "Kipling"}, {"name": "Finch"}]
+
+def test_fallback_cached_briefly_when_nothing_else_is():
+    clock = FakeClock()
+    versions = iter([static_stops_for("ttc"), [{"name": "Kipling"}]])
+    cache = StopCache(loader=lambda name: next(versions), ttl=300, fallback_ttl=30, clock=clock)
+    assert any(s["name"] == "Union Station" for s in cache.get("ttc"))
+    assert cache.stats()["errors"] == 1
+    clock.now = 31
+    # An expired fallback is reloaded synchronously rather than served stale
+    assert cache.peek("ttc") is None
+    assert cache.get("ttc") == [{"name": "Kipling"}]
+
+def test_put_never_replaces_real_stops_with_fallback():
+    cache = StopCache(loader=lambda name: [])
+    cache.put("ttc", [{"name": "Kipling"}])
+    cache.put("ttc", static_stops_for("ttc"))
+    assert cache.peek("ttc") == [{"name": "Kipling"}]
+
+def test_unknown_systems_are_not_cached():
+    calls = []
+    cache = StopCache(loader=lambda name: calls.append(name) or [{"name": "X"}])
+    for i in range(100):
+        assert cache.get(f"junk {i}") == []
+    cache.put("junk", [{"name": "X"}])
+    assert calls == []
+    assert cache.stats()["entries"] == 0
+
+def test_entries_are_bounded():
+    clock = FakeClock()
+    cache = StopCache(loader=lambda name: [{"name": name}], max_entries=2, clock=clock)
+    for t, system in enumerate(["ttc", "go", "bart"]):
+        clock.now = t
+        cache.get(system)
+    assert cache.stats()["entries"] == 2
+    assert cache.peek("ttc") is None
+    assert cache.peek("bart") == [{"name": "bart"}]
@@ -0,0 +1,112 @@
+# tests/test_stop_sync.py
+import threading
+import pytest
+from app import create_app
+from backend.models import db, Stop, TransitSystem, Line
+from backend import scraping, stop_sync
+from backend.stop_cache import stop_cache
+
+@pytest.fixture
+def app():
+    app = create_app(testing=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    stop_cache.invalidate()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def fake_scrape(system_name):
+    return [
+        {"name": f"{system_name} Central", "line": system_name, "system": system_name, "lat": 1.0, "lon": 2.0},
+        {"name": f"{system_name} North", "line": system_name, "system": system_name},
+    ]
+
+def test_persist_stops_creates_system_lines_and_stops(app):
+    stop_sync.persist_stops("TTC", fake_scrape("TTC"), region="Toronto")
+    assert TransitSystem.query.filter_by(name="TTC").one().region == "Toronto"
+    assert [l.name for l in Line.query.all()] == ["TTC"]
+    assert Stop.query.filter_by(system="TTC").count() == 2
+
+def test_persist_stops_is_idempotent(app):
+    stop_sync.persist_stops("TTC", fake_scrape("TTC"))
+    moved = fake_scrape("TTC")
+    moved[1]["lat"] = 5.0
+    stop_sync.persist_stops("TTC", moved)
+    assert TransitSystem.query.count() == 1
+    assert Line.query.count() == 1
+    assert Stop.query.count() == 2
+    assert Stop.query.filter_by(name="TTC North").one().lat == 5.0
+
+def fake_batch_scrape(system_names):
+    return {name: fake_scrape(name) for name in system_names}
+
+def test_sync_all_persists_every_system(app, monkeypatch):
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_systems', fake_batch_scrape)
+    results = stop_sync.sync_all()
+    assert set(results) == {"go", "ttc", "mta", "bart"}
+    assert all(count == 2 for count in results.values())
+    assert TransitSystem.query.count() == 4
+
+def test_sync_all_survives_one_failing_system(app, monkeypatch):
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_systems', fake_batch_scrape)
+    real_persist = stop_sync.persist_stops
+    def flaky_persist(system_name, stops, region=None):
+        if system_name == "MTA":
+            raise RuntimeError("boom")
+        return real_persist(system_name, stops, region=region)
+    monkeypatch.setattr(stop_sync, 'persist_stops', flaky_persist)
+    results = stop_sync.sync_all()
+    assert results["mta"] is None
+    assert results["ttc"] == 2
+
+def test_stops_endpoint_reads_synced_stops(client, monkeypatch):
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_system', fake_scrape)
+    stop_sync.sync_system("bart")
+    # Once synced, the request path must not scrape
+    def no_scrape(system_name):
+        raise AssertionError("request path scraped upstream")
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_system', no_scrape)
+    response = client.get('/api/stops?system=bart')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert {s['name'] for s in data} == {"BART Central", "BART North"}
+    assert all(s['id'].startswith('bart:') and 'location' in s for s in data)
+
+def test_sync_stops_cli(app, monkeypatch):
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_systems', fake_batch_scrape)
+    result = app.test_cli_runner().invoke(args=['sync-stops'])
+    assert result.exit_code == 0
+    assert "ttc: 2 stops" in result.output
+
+def test_fallback_stops_are_not_persisted(app, monkeypatch):
+    def batch_scrape(system_names):
+        return {name: scraping.static_stops_for(scraping.scraper_key(name)) if name == "TTC" else fake_scrape(name)
+                for name in system_names}
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_systems', batch_scrape)
+    stop_cache.put("TTC", fake_scrape("TTC"))
+    results = stop_sync.sync_all()
+    assert results["ttc"] == stop_sync.SKIPPED
+    assert results["go"] == 2
+    assert Stop.query.filter_by(system="TTC").count() == 0
+    assert [s['name'] for s in stop_cache.peek("TTC")] == ["TTC Central", "TTC North"]
+    result = app.test_cli_runner().invoke(args=['sync-stops'])
+    assert "ttc: skipped (upstream unavailable)" in result.output
+
+def test_sync_system_skips_fallback_stops(app, monkeypatch):
+    monkeypatch.setattr('backend.scraping.scrape_stops_for_system',
+                        lambda name: scraping.static_stops_for(scraping.scraper_key(name)))
+    assert stop_sync.sync_system("bart") == stop_sync.SKIPPED
+    assert Stop.query.count() == 0
+    assert stop_cache.peek("BART") is None
+
+def test_creating_an_app_starts_no_sync_thread(monkeypatch):
+    monkeypatch.setenv('STOP_SYNC_INTERVAL', '60')
+    before = set(threading.enumerate())
+    app = create_app(testing=True)
+    assert app.config['STOP_SYNC_INTERVAL'] == 60
+    assert set(threading.enumerate()) - before == set()
@@ -0,0 +1,99 @@
+# tests/test_transfer_matrix.py
+import itertools
+import numpy as np
+import pytest
+from app import create_app
+import transfer_matrix
+from transfer_matrix import plan_cars, TRANSFER_MATRICES, EXIT_VECTORS
+
+@pytest.fixture
+def client():
+    return create_app(testing=True).test_client()
+
+def brute_force(matrix):
+    # Try every pair of cars to check the dynamic programme
+    return min((matrix[a, b], (a + 1, b + 1)) for a, b in itertools.product(range(6), range(6)))
+
+def test_matrices_cover_each_interchange_direction_pair():
+    keys = [k for k in TRANSFER_MATRICES if k[0] == "bloor-yonge"]
+    assert len(keys) == 8
+    matrix = TRANSFER_MATRICES[("bloor-yonge", "1", "southbound", "2", "eastbound")]
+    assert matrix.shape == (6, 6)
+    assert np.isfinite(matrix).all()
+
+def test_exit_vectors_from_graph_and_geometry():
+    graph = EXIT_VECTORS[("bloor-yonge", "2", "eastbound", "hudson's bay")]
+    assert len(graph) == 6 and graph.argmin() == 0
+    geometry = EXIT_VECTORS[("king", "1", "southbound", "king street east")]
+    assert geometry.argmin() == 0
+
+def test_plan_matches_brute_force_over_transfer():
+    legs = [
+        {"station": "Bloor-Yonge", "line": "1", "direction": "southbound"},
+        {"station": "Broadview", "line": "2", "direction": "eastbound"},
+    ]
+    plan = plan_cars(legs)
+    walk, cars = brute_force(TRANSFER_MATRICES[("bloor-yonge", "1", "southbound", "2", "eastbound")])
+    assert plan["walk_s"] == round(walk, 1)
+    assert plan["legs"][0]["car"] == cars[0]
+    assert plan["legs"][0]["modelled"] and not plan["legs"][1]["modelled"]
+    # Car count of line 2 is known from where the leg was boarded
+    assert plan["legs"][1]["car"] is not None
+
+def test_final_exit_changes_the_transfer_choice():
+    legs = [
+        {"station": "Bloor-Yonge", "line": "1", "direction": "northbound"},
+        {"station": "Bloor-Yonge", "line": "2", "direction": "eastbound"},
+    ]
+    to_bay = plan_cars(legs, "hudson's bay")
+    to_yonge = plan_cars(legs, "yonge")
+    assert to_bay["legs"][1]["car"] == 1
+    assert to_yonge["legs"][1]["car"] == 6
+    # Total is the transfer plus the exit walk
+    assert to_bay["walk_s"] == pytest.approx(sum(l["walk_s"] for l in to_bay["legs"]), abs=0.2)
+
+def test_unknown_lines_plan_without_cars():
+    plan = plan_cars([{"station": "Nowhere", "line": "Z", "direction": "up"}])
+    assert plan["legs"][0]["car"] is None
+    assert plan["walk_s"] == 0.0
+
+def test_legs_without_a_model_get_no_car():
+    # No direction, so no exit vector applies
+    plan = plan_cars([{"station": "union station", "line": "1"}], "front street")
+    assert plan["legs"][0]["car"] is None and plan["legs"][0]["walk_s"] is None
+    # Staying on one line is not a modelled transfer, and there is no exit
+    plan = plan_cars([
+        {"station": "union", "line": "1", "direction": "northbound"},
+        {"station": "finch", "line": "1", "direction": "northbound"},
+    ])
+    assert [leg["car"] for leg in plan["legs"]] == [None, None]
+    # An unknown exit leaves the last leg unmodelled
+    plan = plan_cars([{"station": "union", "line": "1", "direction": "northbound"}], "nowhere")
+    assert plan["legs"][0]["car"] is None
+
+def test_exit_aliases_match_the_best_car_endpoint(client):
+    expected = client.get("/api/best_car?origin=union&destination=Front St.&direction=northbound").get_json()
+    plan = plan_cars([{"station": "union", "line": "1", "direction": "northbound"}], "Front St.")
+    assert plan["legs"][0]["modelled"]
+    assert plan["legs"][0]["car"] == expected["car"] == 3
+
+def test_best_car_journey_endpoint(client):
+    response = client.post("/api/best_car/journey", json={
+        "legs": [
+            {"station": "Bloor-Yonge", "line": "Line 1", "direction": "Southbound"},
+            {"station": "Broadview", "line": "2", "direction": "eastbound"},
+        ],
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [leg["line"] for leg in data["legs"]] == ["1", "2"]
+    assert data["legs"][0]["car"] in (3, 4)
+
+def test_best_car_journey_endpoint_validates(client):
+    assert client.post("/api/best_car/journey", json={"legs": []}).status_code == 400
+    assert client.post("/api/best_car/journey", json={"legs": [{"line": "1"}]}).status_code == 400
+    for field, value in (("direction", 5), ("heading", ["north"])):
+        leg = {"station": "union", "line": "1", field: value}
+        assert client.post("/api/best_car/journey", json={"legs": [leg]}).status_code == 400
+    too_many = {"legs": [{"station": "King", "line": "1"}] * (transfer_matrix.MAX_JOURNEY_LEGS + 1)}
+    assert client.post("/api/best_car/journey", json=too_many).status_code == 413
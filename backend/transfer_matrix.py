@@ -0,0 +1,162 @@
+# Whole-journey car choice from precomputed interchange transfer matrices
+import numpy as np
+from backend import platform_geometry, station_graph
+from backend.car_placement import _clean, normalize_station_name
+from backend.platform_geometry import car_centres, walk_distances
+
+# Longest journey /api/best_car/journey will plan
+MAX_JOURNEY_LEGS = 10
+
+
+def build_transfer_matrices(graphs):
+    """
+    {(station, from line, from direction, to line, to direction): matrix}
+    where matrix[i, j] is the walk in seconds from car i+1 of the arriving
+    train to car j+1 of the departing one, read off each station graph's
+    all-pairs table.
+    """
+    matrices = {}
+    for station, graph in graphs.items():
+        for (line_a, dir_a), doors_a in graph.doors.items():
+            ids_a = graph.node_ids(doors_a)
+            for (line_b, dir_b), doors_b in graph.doors.items():
+                if line_a != line_b:
+                    matrices[(station, line_a, dir_a, line_b, dir_b)] = graph.dist[np.ix_(ids_a, graph.node_ids(doors_b))]
+    return matrices
+
+
+def build_exit_vectors(graphs, geometry):
+    """
+    {(station, line, direction, exit): seconds per car} to leave the
+    station. Station graphs include stairs and corridors; elsewhere the
+    walk along the platform from the platform geometry is used.
+    """
+    vectors = {}
+    for station, platform in geometry.items():
+        names = list(platform["exits"])
+        exits = np.array([platform["exits"][name] for name in names], dtype=float)
+        for line, spec in platform["lines"].items():
+            for direction, toward in spec["directions"].items():
+                centres = car_centres(platform["length"], spec["car_length"], spec["cars"], spec["stop_offset"], toward)
+                seconds = walk_distances(centres, exits, spec["car_length"]) / station_graph.WALK_SPEED_MPS
+                for e, name in enumerate(names):
+                    vectors[(station, line, direction, name)] = seconds[e]
+    for station, graph in graphs.items():
+        for (line, direction), doors in graph.doors.items():
+            ids = graph.node_ids(doors)
+            for node in graph.exits:
+                vectors[(station, line, direction, node[len("exit:"):])] = graph.dist[ids, graph.node_ids([node])[0]]
+    return vectors
+
+
+TRANSFER_MATRICES = {}
+EXIT_VECTORS = {}
+
+
+def rebuild_matrices():
+    """
+    Recompute the transfer matrices and exit vectors. Runs at import; call
+    again after rebuilding the station graphs or platform geometry.
+    """
+    global TRANSFER_MATRICES, EXIT_VECTORS
+    TRANSFER_MATRICES = build_transfer_matrices(station_graph.GRAPHS)
+    EXIT_VECTORS = build_exit_vectors(station_graph.GRAPHS, platform_geometry.PLATFORM_GEOMETRY)
+
+
+def _resolve_leg(leg):
+    """
+    (station, line key, direction, car count) for a leg; line key and car
+    count are None when the platform geometry does not know the line.
+    """
+    station = normalize_station_name(leg.get("station") or leg.get("to"))
+    direction = (leg.get("direction") or leg.get("heading") or "").strip().lower()
+    line = platform_geometry.LINE_LOOKUP.get((station, _clean(leg.get("line") or "")))
+    if line is None:
+        return station, None, direction, None
+    spec = platform_geometry.PLATFORM_GEOMETRY[station]["lines"][line]
+    return station, line, direction, spec["cars"]
+
+
+def _resolve_exit(station, exit_name):
+    """
+    The exit vector name for any spelling of an exit, resolved the way
+    /api/best_car does: station graph exits first, then the platform
+    geometry exits and their aliases.
+    """
+    cleaned = _clean(exit_name or "")
+    kind, _, name = station_graph.TARGET_LOOKUP.get((station, cleaned), "").partition(":")
+    if kind == "exit":
+        return name
+    return platform_geometry.EXIT_LOOKUP.get((station, cleaned))
+
+
+def plan_cars(legs, exit_name=None):
+    """
+    Choose the car for every leg of a journey so the total walk is smallest.
+
+    `legs` are dicts with the station the leg ends at ("station" or "to"),
+    "line" and "direction" (or "heading"). A transfer's cost is a lookup in
+    its interchange's matrix and the final walk one in the exit vectors, so
+    planning is a min-plus product of a few small matrices. Interchanges
+    and exits without a model cost nothing. A leg gets car None unless a
+    modelled transfer or exit walk touches it, and walk_s None unless the
+    walk that ends it is modelled.
+    Returns {"walk_s": total, "legs": [...]} with one car per leg.
+    """
+    resolved = [_resolve_leg(leg) for leg in legs]
+    for k in range(1, len(resolved)):
+        # A line unknown where the leg ends may be known where it began
+        station, line, direction, count = resolved[k]
+        if count is None:
+            boarded_line = platform_geometry.LINE_LOOKUP.get((resolved[k - 1][0], _clean(legs[k].get("line") or "")))
+            if boarded_line is not None:
+                count = platform_geometry.PLATFORM_GEOMETRY[resolved[k - 1][0]]["lines"][boarded_line]["cars"]
+                resolved[k] = (station, line, direction, count)
+    sizes = [cars or 1 for _, _, _, cars in resolved]
+    steps = []
+    for k in range(len(resolved) - 1):
+        station, line_a, dir_a, _ = resolved[k]
+        # The next line as named at this interchange
+        line_b = platform_geometry.LINE_LOOKUP.get((station, _clean(legs[k + 1].get("line") or "")))
+        key = (station, line_a, dir_a, line_b, resolved[k + 1][2])
+        matrix = TRANSFER_MATRICES.get(key)
+        modelled = matrix is not None and matrix.shape == (sizes[k], sizes[k + 1])
+        if not modelled:
+            matrix = np.zeros((sizes[k], sizes[k + 1]))
+        steps.append((matrix, modelled))
+    station, line, direction, _ = resolved[-1]
+    last = EXIT_VECTORS.get((station, line, direction, _resolve_exit(station, exit_name)))
+    exit_modelled = last is not None and len(last) == sizes[-1]
+    if not exit_modelled:
+        last = np.zeros(sizes[-1])
+
+    # Backward pass: best[k][i] is the least walk from car i+1 of leg k on
+    best = [None] * len(resolved)
+    best[-1] = np.asarray(last, dtype=float)
+    for k in range(len(steps) - 1, -1, -1):
+        best[k] = (steps[k][0] + best[k + 1][None, :]).min(axis=1)
+    # Forward pass picks the cars
+    cars = [int(np.argmin(best[0]))]
+    for k, (matrix, _) in enumerate(steps):
+        cars.append(int(np.argmin(matrix[cars[k]] + best[k + 1])))
+
+    planned = []
+    for k, (station, line, direction, count) in enumerate(resolved):
+        if k < len(steps):
+            walk, modelled = steps[k][0][cars[k], cars[k + 1]], steps[k][1]
+        else:
+            walk, modelled = last[cars[k]], exit_modelled
+        # The transfer onto this leg constrains its car as much as the walk off it
+        driven = modelled or (k > 0 and steps[k - 1][1])
+        planned.append({
+            "station": station,
+            "line": line or legs[k].get("line"),
+            "direction": direction or None,
+            "car": cars[k] + 1 if count and driven else None,
+            "walk_s": round(float(walk), 1) if modelled else None,
+            "modelled": bool(modelled),
+        })
+    return {"walk_s": round(float(best[0][cars[0]]), 1), "legs": planned}
+
+
+rebuild_matrices()